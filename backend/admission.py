@@ -0,0 +1,321 @@
+import asyncio
+import ipaddress
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+from auth import scope_user
+
+# Admission control configuration
+READ_MIN_LIMIT = int(os.environ.get("ADMISSION_READ_MIN_LIMIT", "4"))
+READ_INITIAL_LIMIT = int(os.environ.get("ADMISSION_READ_INITIAL_LIMIT", "64"))
+READ_MAX_LIMIT = int(os.environ.get("ADMISSION_READ_MAX_LIMIT", "256"))
+READ_QUEUE_SIZE = int(os.environ.get("ADMISSION_READ_QUEUE_SIZE", "512"))
+READ_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_READ_QUEUE_TIMEOUT", "1.0"))
+WRITE_MIN_LIMIT = int(os.environ.get("ADMISSION_WRITE_MIN_LIMIT", "2"))
+WRITE_INITIAL_LIMIT = int(os.environ.get("ADMISSION_WRITE_INITIAL_LIMIT", "16"))
+WRITE_MAX_LIMIT = int(os.environ.get("ADMISSION_WRITE_MAX_LIMIT", "64"))
+WRITE_QUEUE_SIZE = int(os.environ.get("ADMISSION_WRITE_QUEUE_SIZE", "128"))
+WRITE_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_WRITE_QUEUE_TIMEOUT", "0.5"))
+TARGET_LATENCY_MS = float(os.environ.get("ADMISSION_TARGET_LATENCY_MS", "250"))
+LATENCY_TOLERANCE = float(os.environ.get("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+USER_RATE = float(os.environ.get("ADMISSION_USER_RATE", "20"))
+USER_BURST = float(os.environ.get("ADMISSION_USER_BURST", "40"))
+MAX_TRACKED_CLIENTS = int(os.environ.get("ADMISSION_MAX_TRACKED_CLIENTS", "50000"))
+# Reverse proxies whose X-Forwarded-For is trusted, e.g. "10.0.0.0/8,127.0.0.1"
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.environ.get("TRUSTED_PROXIES", "").split(",") if entry.strip()
+]
+
+# Paths that bypass admission control entirely; batch sub-requests are admitted one by one
+EXEMPT_PATHS = {"/api/", "/api/batch", "/docs", "/openapi.json"}
+# Long-lived streams would otherwise hold a concurrency slot for their lifetime
+EXEMPT_PREFIXES = ("/api/live/", "/api/admin/export/")
+
+READ_METHODS = {"GET", "HEAD"}
+
+
+class Rejected(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AIMDLimiter:
+    """
+    Concurrency limiter that learns the sustainable number of in-flight
+    requests. The limit grows additively while latency stays under the
+    threshold and shrinks multiplicatively when it does not. Requests above
+    the limit wait in a bounded FIFO queue for at most queue_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        min_limit: int,
+        max_limit: int,
+        queue_size: int,
+        queue_timeout: float,
+        initial_limit: Optional[int] = None,
+        target_latency_ms: float = TARGET_LATENCY_MS,
+        tolerance: float = LATENCY_TOLERANCE,
+        backoff: float = 0.9,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.target_latency_ms = target_latency_ms
+        self.tolerance = tolerance
+        self.backoff = backoff
+
+        # Start from a working guess and let latency move it, not from the floor
+        initial = min_limit if initial_limit is None else initial_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.inflight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.min_latency_ms: Optional[float] = None
+        self._window_min_ms: Optional[float] = None
+        self._window_samples = 0
+        self._last_decrease = 0.0
+
+        self.admitted = 0
+        self.rejected = 0
+
+    def _grant_waiters(self):
+        while self.waiters and self.inflight < int(self.limit):
+            fut = self.waiters.popleft()
+            if fut.done():
+                continue
+            self.inflight += 1
+            fut.set_result(None)
+
+    async def acquire(self):
+        """Take a concurrency slot or raise Rejected"""
+        while self.waiters and self.waiters[0].done():
+            self.waiters.popleft()
+        if self.inflight < int(self.limit) and not self.waiters:
+            self.inflight += 1
+            self.admitted += 1
+            return
+
+        if len(self.waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Rejected(f"{self.name} queue full", self.queue_timeout)
+
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                fut.cancel()
+                self.waiters.remove(fut)
+                self.rejected += 1
+                raise Rejected(f"{self.name} queueing budget exceeded", self.queue_timeout)
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the client went away
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                fut.cancel()
+                if fut in self.waiters:
+                    self.waiters.remove(fut)
+            raise
+        self.admitted += 1
+
+    def release(self, latency_ms: Optional[float] = None):
+        """Return a slot and feed the observed latency into the limit"""
+        self.inflight -= 1
+        if latency_ms is not None:
+            self._on_sample(latency_ms)
+        self._grant_waiters()
+
+    def _on_sample(self, latency_ms: float):
+        # Track the no-load latency as a windowed minimum so the baseline
+        # can recover after the database gets faster again
+        if self._window_min_ms is None or latency_ms < self._window_min_ms:
+            self._window_min_ms = latency_ms
+        self._window_samples += 1
+        if self.min_latency_ms is None or self._window_samples >= 500:
+            self.min_latency_ms = self._window_min_ms
+            self._window_min_ms = None
+            self._window_samples = 0
+
+        threshold = max(self.target_latency_ms, (self.min_latency_ms or 0) * self.tolerance)
+        if latency_ms > threshold:
+            now = time.monotonic()
+            # Decrease at most once per observed latency so a single slow
+            # burst does not collapse the limit to the floor
+            if now - self._last_decrease > latency_ms / 1000.0:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                self._last_decrease = now
+        elif self.inflight + 1 >= int(self.limit):
+            # Only grow when the limit is actually the constraint
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "queued": len(self.waiters),
+            "minLatencyMs": round(self.min_latency_ms, 2) if self.min_latency_ms else None,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class TokenBucketRegistry:
+    """Per-client token buckets kept in a size-bounded LRU map"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.throttled = 0
+
+    def take(self, key: str, cost: float = 1.0) -> float:
+        """Consume tokens; returns 0 when allowed, otherwise seconds to wait"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= cost:
+            self.buckets[key] = (tokens - cost, now)
+            wait = 0.0
+        else:
+            self.buckets[key] = (tokens, now)
+            self.throttled += 1
+            wait = (cost - tokens) / self.rate
+        while len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_address(scope) -> str:
+    """
+    The client's address: the peer, or behind trusted proxies the nearest
+    X-Forwarded-For hop that is not one of them
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if not is_trusted_proxy(address):
+        return address
+    forwarded = [
+        hop.strip()
+        for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+        for hop in value.decode("latin-1").split(",") if hop.strip()
+    ]
+    # Hops to the left of an untrusted one could have been written by the client
+    for hop in reversed(forwarded):
+        address = hop
+        if not is_trusted_proxy(hop):
+            break
+    return address
+
+
+def client_key(scope) -> str:
+    """
+    Identify the caller by verified user id, falling back to the client
+    address. Tokens that do not verify count against the address, so made-up
+    tokens cannot each get a fresh bucket.
+    """
+    user_id = scope_user(scope)
+    if user_id is not None:
+        return "u:" + user_id
+    return "ip:" + client_address(scope)
+
+
+def request_class(method: str) -> str:
+    if method in READ_METHODS:
+        return "read"
+    return "write"
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI admission control: per-client token buckets, then separate adaptive
+    concurrency limits for reads and writes. Requests that cannot be admitted
+    within the queueing budget get an immediate 503 with Retry-After instead
+    of piling up in the Mongo connection pool.
+    """
+
+    def __init__(self, app, enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+        self.limiters: Dict[str, AIMDLimiter] = {
+            "read": AIMDLimiter(
+                "read", READ_MIN_LIMIT, READ_MAX_LIMIT, READ_QUEUE_SIZE, READ_QUEUE_TIMEOUT, READ_INITIAL_LIMIT
+            ),
+            "write": AIMDLimiter(
+                "write", WRITE_MIN_LIMIT, WRITE_MAX_LIMIT, WRITE_QUEUE_SIZE, WRITE_QUEUE_TIMEOUT, WRITE_INITIAL_LIMIT
+            ),
+        }
+        self.buckets = TokenBucketRegistry(USER_RATE, USER_BURST, MAX_TRACKED_CLIENTS)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.enabled
+            or scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in EXEMPT_PATHS
+            or scope["path"].startswith(EXEMPT_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        wait = self.buckets.take(client_key(scope))
+        if wait > 0:
+            await self._reject(send, 429, "Too many requests", wait)
+            return
+
+        limiter = self.limiters[request_class(scope["method"])]
+        try:
+            await limiter.acquire()
+        except Rejected as e:
+            await self._reject(send, 503, "Server is busy, please retry", e.retry_after)
+            return
+
+        start = time.perf_counter()
+        latency_ms = None
+        try:
+            await self.app(scope, receive, send)
+            latency_ms = (time.perf_counter() - start) * 1000
+        finally:
+            # Failed or cancelled requests free the slot without a sample
+            limiter.release(latency_ms)
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def snapshot(self) -> dict:
+        return {
+            "limiters": {name: limiter.snapshot() for name, limiter in self.limiters.items()},
+            "throttledClients": self.buckets.throttled,
+            "trackedClients": len(self.buckets.buckets),
+        }
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent / '.env')
+
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from database import (
+    posts_collection,
+    votes_collection,
+    posts_archive_collection,
+    votes_archive_collection,
+    user_stats,
+    db_manager,
+)
+
+logger = logging.getLogger(__name__)
+
+# Archive configuration: posts older than ARCHIVE_AFTER_DAYS that have not been
+# voted on or commented on for ARCHIVE_IDLE_DAYS move to the cold tier
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_IDLE_DAYS = float(os.environ.get("ARCHIVE_IDLE_DAYS", "30"))
+ARCHIVE_INTERVAL = float(os.environ.get("ARCHIVE_INTERVAL", str(6 * 60 * 60)))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "200"))
+# Pause between batches so archiving never saturates the primary
+ARCHIVE_BATCH_DELAY = float(os.environ.get("ARCHIVE_BATCH_DELAY", "0.1"))
+# Keep individual vote rows in votes_archive; otherwise only the per-post counters remain
+ARCHIVE_KEEP_VOTES = os.environ.get("ARCHIVE_KEEP_VOTES", "true").lower() == "true"
+VOTE_BATCH_SIZE = 1000
+
+ARCHIVE_ONLY_FIELDS = ("archivedAt", "votesArchived", "votesSummarized")
+
+
+def archive_cutoffs(now: datetime) -> dict:
+    """Posts older than createdAt and untouched since updatedAt are archived"""
+    return {
+        "createdAt": now - timedelta(days=ARCHIVE_AFTER_DAYS),
+        "updatedAt": now - timedelta(days=ARCHIVE_IDLE_DAYS),
+    }
+
+
+class Archiver:
+    """
+    Moves cold posts out of the posts collection so the feed indexes only
+    cover the hot working set. Each batch is copied to posts_archive, removed
+    from posts with a guard on the idle threshold (posts touched meanwhile
+    stay hot), and then has its votes moved to votes_archive or dropped. The
+    archived copy keeps upvotes/downvotes/score recomputed from those votes,
+    so it doubles as the compacted vote summary. votesArchived marks posts
+    whose votes are done, which lets an interrupted run resume.
+    """
+
+    def __init__(self, interval: float = ARCHIVE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Archive run failed")
+
+    async def run_once(self, dry_run: bool = False, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+        cutoffs = archive_cutoffs(datetime.utcnow())
+        query = {
+            "deleted": False,
+            "createdAt": {"$lt": cutoffs["createdAt"]},
+            "updatedAt": {"$lt": cutoffs["updatedAt"]},
+        }
+        report = {"candidates": 0, "archived": 0, "skipped": 0, "votesMoved": 0, "votesDropped": 0}
+        if dry_run:
+            report["candidates"] = await posts_collection.count_documents(query)
+            return report
+
+        # Finish batches an earlier run left half done
+        await self._finish_pending(report)
+
+        while True:
+            posts = await posts_collection.find(query).sort("createdAt", ASCENDING).limit(batch_size).to_list(batch_size)
+            if not posts:
+                break
+            report["candidates"] += len(posts)
+            archived_ids = await self._archive_batch(posts, cutoffs["updatedAt"])
+            report["archived"] += len(archived_ids)
+            report["skipped"] += len(posts) - len(archived_ids)
+            await self._archive_votes(archived_ids, report)
+            if len(posts) < batch_size:
+                break
+            await asyncio.sleep(ARCHIVE_BATCH_DELAY)
+
+        logger.info("Archive run: %s", report)
+        return report
+
+    async def _archive_batch(self, posts: List[dict], idle_cutoff: datetime) -> list:
+        """Copy posts to the archive and remove the ones still idle from posts"""
+        now = datetime.utcnow()
+        ids = [p["_id"] for p in posts]
+        await posts_archive_collection.bulk_write([
+            ReplaceOne({"_id": p["_id"]}, {**p, "archivedAt": now, "votesArchived": False}, upsert=True)
+            for p in posts
+        ], ordered=False)
+        await posts_collection.delete_many({"_id": {"$in": ids}, "updatedAt": {"$lt": idle_cutoff}})
+
+        # Posts voted on or commented on since they were read stay hot
+        still_hot = [p["_id"] async for p in posts_collection.find({"_id": {"$in": ids}}, {"_id": 1})]
+        if still_hot:
+            await posts_archive_collection.delete_many({"_id": {"$in": still_hot}})
+        still_hot = set(still_hot)
+        archived = [post_id for post_id in ids if post_id not in still_hot]
+        for post_id in archived:
+            db_manager.forget_post(post_id)
+        if archived:
+            # The posts left their feeds without touching any updatedAt there
+            archived_set = set(archived)
+            categories = {p.get("category") for p in posts if p["_id"] in archived_set} - {None}
+            await db_manager.bump_feed_versions(categories)
+        return archived
+
+    async def _finish_pending(self, report: dict):
+        while True:
+            pending = await posts_archive_collection.find(
+                {"votesArchived": False}, {"_id": 1}
+            ).limit(ARCHIVE_BATCH_SIZE).to_list(ARCHIVE_BATCH_SIZE)
+            if not pending:
+                return
+            await self._archive_votes([p["_id"] for p in pending], report)
+
+    async def _archive_votes(self, post_ids: list, report: dict):
+        """Move or drop the votes of archived posts and store the resulting counters"""
+        if not post_ids:
+            return
+        if ARCHIVE_KEEP_VOTES:
+            report["votesMoved"] += await self._move_votes(votes_collection, votes_archive_collection, post_ids)
+            await self._apply_summary(post_ids, votes_archive_collection)
+        else:
+            # Counters must be recorded before the rows they are computed from go away
+            unsummarized = [
+                p["_id"] async for p in posts_archive_collection.find(
+                    {"_id": {"$in": post_ids}, "votesSummarized": {"$ne": True}}, {"_id": 1}
+                )
+            ]
+            await self._apply_summary(unsummarized, votes_collection, extra={"votesSummarized": True})
+            result = await votes_collection.delete_many({"postId": {"$in": post_ids}})
+            report["votesDropped"] += result.deleted_count
+        await posts_archive_collection.update_many(
+            {"_id": {"$in": post_ids}}, {"$set": {"votesArchived": True}}
+        )
+
+    async def _apply_summary(self, post_ids: list, source, extra: Optional[dict] = None):
+        """Recompute archived post counters from their votes and adjust author stats"""
+        if not post_ids:
+            return
+        summaries = await source.aggregate([
+            {"$match": {"postId": {"$in": post_ids}}},
+            {"$group": {
+                "_id": "$postId",
+                "upvotes": {"$sum": {"$cond": [{"$eq": ["$voteType", "up"]}, 1, 0]}},
+                "downvotes": {"$sum": {"$cond": [{"$eq": ["$voteType", "down"]}, 1, 0]}}
+            }}
+        ]).to_list(None)
+        by_post = {s["_id"]: s for s in summaries}
+        posts = await posts_archive_collection.find(
+            {"_id": {"$in": post_ids}}, {"authorId": 1, "upvotes": 1, "score": 1}
+        ).to_list(None)
+
+        updates = []
+        for post in posts:
+            summary = by_post.get(post["_id"], {})
+            upvotes = summary.get("upvotes", 0)
+            downvotes = summary.get("downvotes", 0)
+            score = upvotes - downvotes
+            updates.append(UpdateOne(
+                {"_id": post["_id"]},
+                {"$set": {"upvotes": upvotes, "downvotes": downvotes, "score": score, **(extra or {})}}
+            ))
+            # Votes that raced the move would otherwise be lost from the author's karma
+            karma_delta = score - post.get("score", 0)
+            upvotes_delta = upvotes - post.get("upvotes", 0)
+            if karma_delta or upvotes_delta:
+                await user_stats.add(post["authorId"], karma=karma_delta, upvotesReceived=upvotes_delta)
+        if updates:
+            await posts_archive_collection.bulk_write(updates, ordered=False)
+
+    async def _move_votes(self, source, target, post_ids: list) -> int:
+        """Copy vote rows between tiers in batches, deleting each batch once copied"""
+        moved = 0
+        while True:
+            votes = await source.find({"postId": {"$in": post_ids}}).limit(VOTE_BATCH_SIZE).to_list(VOTE_BATCH_SIZE)
+            if not votes:
+                return moved
+            await target.bulk_write([ReplaceOne({"_id": v["_id"]}, v, upsert=True) for v in votes], ordered=False)
+            await source.delete_many({"_id": {"$in": [v["_id"] for v in votes]}})
+            moved += len(votes)
+
+    async def restore(self, post_id) -> bool:
+        """Move an archived post and its votes back to the hot tier"""
+        post = await posts_archive_collection.find_one({"_id": post_id})
+        if post is None:
+            return False
+        await self._move_votes(votes_archive_collection, votes_collection, [post_id])
+        for field in ARCHIVE_ONLY_FIELDS:
+            post.pop(field, None)
+        # A fresh updatedAt keeps the next run from archiving it straight away
+        post["updatedAt"] = datetime.utcnow()
+        post["version"] = post.get("version", 0) + 1
+        await posts_collection.replace_one({"_id": post_id}, post, upsert=True)
+        await posts_archive_collection.delete_one({"_id": post_id})
+        db_manager.forget_post(post_id)
+        await db_manager.bump_feed_versions([post["category"]] if post.get("category") else [])
+        return True
+
+
+# Create archiver instance
+archiver = Archiver()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Move cold posts and their votes to the archive tier")
+    parser.add_argument("--dry-run", action="store_true", help="Count candidates without moving anything")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    async def run():
+        report = await archiver.run_once(dry_run=args.dry_run, batch_size=args.batch_size)
+        await user_stats.flush()
+        return report
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(run()), indent=2))
@@ -1,7 +1,7 @@
 import jwt
 import bcrypt
 from datetime import datetime, timedelta
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 import os
@@ -11,6 +11,9 @@ SECRET_KEY = os.environ.get("JWT_SECRET", "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 24 * 60  # 24 hours
 
+# Users allowed to call admin endpoints (comma-separated user IDs)
+ADMIN_USER_IDS = {uid.strip() for uid in os.environ.get("ADMIN_USER_IDS", "").split(",") if uid.strip()}
+
 security = HTTPBearer()
 
 def hash_password(password: str) -> str:
@@ -47,9 +50,42 @@ def verify_token(token: str) -> dict:
             detail="Could not validate credentials"
         )
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def resolved_user(request: Request, token: str) -> Optional[str]:
+    """User id already resolved for this token by an enclosing batch request"""
+    resolved = request.scope.get("state", {}).get("resolved_auth")
+    if resolved and resolved[0] == token:
+        return resolved[1]
+    return None
+
+def scope_user(scope) -> Optional[str]:
+    """
+    User id of a raw ASGI request's bearer token, for middleware running
+    before the auth dependencies. None when there is no valid token.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            break
+    else:
+        return None
+    if scheme.lower() != "bearer" or not token:
+        return None
+    resolved = scope.get("state", {}).get("resolved_auth")
+    if resolved and resolved[0] == token:
+        return resolved[1]
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+    user_id = payload.get("sub")
+    return user_id if isinstance(user_id, str) else None
+
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependency to get current user from JWT token"""
     token = credentials.credentials
+    user_id = resolved_user(request, token)
+    if user_id is not None:
+        return user_id
     payload = verify_token(token)
     user_id = payload.get("sub")
     if user_id is None:
@@ -59,13 +95,28 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     return user_id
 
-async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
+async def get_optional_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
+):
     """Optional user dependency - returns None if no token"""
     if credentials is None:
         return None
+    user_id = resolved_user(request, credentials.credentials)
+    if user_id is not None:
+        return user_id
     try:
         token = credentials.credentials
         payload = verify_token(token)
         return payload.get("sub")
     except HTTPException:
-        return None
\ No newline at end of file
+        return None
+
+async def get_admin_user(current_user_id: str = Depends(get_current_user)):
+    """Dependency that only admits configured admin users"""
+    if current_user_id not in ADMIN_USER_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user_id
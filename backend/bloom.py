@@ -0,0 +1,72 @@
+import hashlib
+import math
+import struct
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over a bytearray. Uses double hashing of one
+    blake2b digest to derive the k bit positions, and serializes to a
+    compact byte string so it can be stored in a binary Mongo field.
+    """
+
+    __slots__ = ("num_bits", "num_hashes", "bits", "count")
+
+    HEADER = struct.Struct("<IBI")
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: bytearray = None, count: int = 0):
+        self.num_bits = max(8, num_bits)
+        self.num_hashes = max(1, num_hashes)
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.01) -> "BloomFilter":
+        """Size a filter to hold capacity items at the given false-positive rate"""
+        capacity = max(1, capacity)
+        num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_hashes = int(round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    @classmethod
+    def for_size(cls, num_bytes: int, capacity: int) -> "BloomFilter":
+        """Best filter for a fixed memory budget and expected item count"""
+        num_bits = max(8, num_bytes * 8)
+        num_hashes = int(round(num_bits / max(1, capacity) * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def union(self, other: "BloomFilter"):
+        """Add every item of a filter with the same size and hash count"""
+        if (other.num_bits, other.num_hashes) != (self.num_bits, self.num_hashes):
+            raise ValueError("Bloom filters of different shapes cannot be merged")
+        merged = int.from_bytes(self.bits, "little") | int.from_bytes(other.bits, "little")
+        self.bits = bytearray(merged.to_bytes(len(self.bits), "little"))
+        # Items in both are counted once at best; the larger count is the safe lower bound
+        self.count = max(self.count, other.count)
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate at the current fill"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def to_bytes(self) -> bytes:
+        return self.HEADER.pack(self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        num_bits, num_hashes, count = cls.HEADER.unpack_from(data)
+        return cls(num_bits, num_hashes, bytearray(data[cls.HEADER.size:]), count)
@@ -0,0 +1,64 @@
+from fastapi import Request, Response
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from version components"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+def to_millis(dt: Optional[datetime]) -> int:
+    """Datetime to epoch milliseconds (naive datetimes are UTC, as stored by Mongo)"""
+    if dt is None:
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def http_date(dt: datetime) -> str:
+    """Format a datetime as an HTTP-date"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (RFC 9110 weak comparison)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        wanted = _strip_weak(etag)
+        return any(_strip_weak(tag) == wanted for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have second precision
+        return to_millis(last_modified) // 1000 <= int(since.timestamp())
+    return False
+
+def set_validators(response: Response, etag: Optional[str], last_modified: Optional[datetime]):
+    """Attach ETag / Last-Modified headers to a response"""
+    if etag:
+        response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Cache-Control"] = "no-cache"
+
+def not_modified(etag: Optional[str], last_modified: Optional[datetime]) -> Response:
+    """Empty 304 response carrying the current validators"""
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
@@ -1,8 +1,26 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Tuple
 from datetime import datetime
 import os
+import time
+from realtime import hub
+from user_stats import UserStatsBuffer
+from notifications import NotificationQueue
+from tasks import task_runner
+from trending import trending_tags
+from ttlcache import TTLCache
+from records import UserRecord, PostRecord, CommentRecord
+from deadlines import TIMEOUT_ERRORS, max_time_ms, query_options
+from fieldsets import (
+    AUTHOR_PROJECTION,
+    COMPACT_AUTHOR_PROJECTION,
+    POST_PROJECTION,
+    COMMENT_PROJECTION,
+    projection_for,
+)
 
 # Database connection (using existing setup)
 mongo_url = os.environ['MONGO_URL']
@@ -14,9 +32,95 @@ users_collection = db.users
 posts_collection = db.posts
 votes_collection = db.votes
 comments_collection = db.comments
+follows_collection = db.follows
+timelines_collection = db.timelines
+deletion_jobs_collection = db.deletion_jobs
+# Cold tier: old, idle posts and their votes are moved here by archive.py
+posts_archive_collection = db.posts_archive
+votes_archive_collection = db.votes_archive
+seen_posts_collection = db.seen_posts
+# Live post count per category, maintained with $inc on create and delete
+category_counts_collection = db.category_counts
+# Per-category feed versions plus ALL_FEEDS, bumped when posts leave or enter a feed
+feed_versions_collection = db.feed_versions
+# One document per board, rewritten by leaderboard.py
+leaderboards_collection = db.leaderboards
+notifications_collection = db.notifications
+# Last change stream position per watched collection, written by invalidation.py
+change_stream_tokens_collection = db.change_stream_tokens
+idempotency_keys_collection = db.idempotency_keys
+# Files uploaded through /api/upload, keyed by publicId, with the hash computed on upload
+uploads_collection = db.uploads
+
+# Feed queries always include this so the partial feed indexes apply
+LIVE_POSTS = {"deleted": False}
+# Collections holding post documents, hot and archived
+POST_COLLECTIONS = ("posts", "posts_archive")
+# Version shared by every feed; bumped with each category and on author profile edits
+ALL_FEEDS = "*"
+# Profile fields embedded in post and comment responses
+PROFILE_FIELDS = {"username", "avatar"}
+
+# Home timeline configuration
+TIMELINE_SIZE = int(os.environ.get("TIMELINE_SIZE", "800"))
+# Authors at or above this follower count are pulled at read time instead of fanned out
+HOT_AUTHOR_FOLLOWERS = int(os.environ.get("HOT_AUTHOR_FOLLOWERS", "10000"))
+FANOUT_BATCH_SIZE = 1000
+FOLLOW_BACKFILL_POSTS = 20
+HOT_AUTHORS_TTL = 60.0
+
+# Stored Idempotency-Key responses are replayable this long (TTL index on createdAt)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", str(24 * 60 * 60)))
+# Upload records only need to outlive the gap between uploading and posting
+UPLOAD_RECORD_TTL = int(os.environ.get("UPLOAD_RECORD_TTL", str(7 * 24 * 60 * 60)))
+
+# Write paths check existence against short-lived in-process caches
+EXISTENCE_CACHE_TTL = float(os.environ.get("EXISTENCE_CACHE_TTL", "10"))
+EXISTENCE_CACHE_SIZE = int(os.environ.get("EXISTENCE_CACHE_SIZE", "50000"))
+AUTHOR_CACHE_TTL = float(os.environ.get("AUTHOR_CACHE_TTL", "30"))
+AUTHOR_CACHE_SIZE = int(os.environ.get("AUTHOR_CACHE_SIZE", "10000"))
+
+# Share of a comment request's budget held back for the degraded fallback query
+COMMENTS_FALLBACK_RESERVE = 0.3
+COMMENTS_FALLBACK_LIMIT = 50
+
+# Unseen-only feeds read this many candidates per requested post, for at most SEEN_MAX_ROUNDS windows
+SEEN_OVERFETCH = int(os.environ.get("SEEN_OVERFETCH", "3"))
+SEEN_MAX_ROUNDS = 3
+
+# Author stats deltas are flushed every this many seconds (0 writes them immediately)
+USER_STATS_FLUSH_INTERVAL = float(os.environ.get("USER_STATS_FLUSH_INTERVAL", "1.0"))
+user_stats = UserStatsBuffer(users_collection, USER_STATS_FLUSH_INTERVAL)
+
+# Reply and mention notifications are written in batches every this many seconds (0 writes them immediately)
+NOTIFICATION_FLUSH_INTERVAL = float(os.environ.get("NOTIFICATION_FLUSH_INTERVAL", "1.0"))
+notification_queue = NotificationQueue(
+    notifications_collection, users_collection, comments_collection, NOTIFICATION_FLUSH_INTERVAL
+)
+
+def normalize_tags(tags: List[str]) -> List[str]:
+    """Lowercase, trim and de-duplicate tags so feeds and trends match them exactly"""
+    return list(dict.fromkeys(tag.strip().lower().lstrip("#") for tag in tags if tag.strip().lstrip("#")))
+
+class DuplicateUserError(Exception):
+    """Raised when a unique user field (email or username) is already taken"""
+
+    def __init__(self, field: str):
+        super().__init__(field)
+        self.field = field
 
 class DatabaseManager:
     """Database operations manager"""
+
+    def __init__(self):
+        # Cached ids of authors whose posts are pulled at read time
+        self._hot_authors: set = set()
+        self._hot_authors_loaded_at = 0.0
+        # post id -> "live" / "archived", and comment ids known to exist
+        self._post_states = TTLCache(EXISTENCE_CACHE_SIZE, EXISTENCE_CACHE_TTL)
+        self._comment_ids = TTLCache(EXISTENCE_CACHE_SIZE, EXISTENCE_CACHE_TTL)
+        # Embedded author documents (AUTHOR_PROJECTION), serialized
+        self._authors = TTLCache(AUTHOR_CACHE_SIZE, AUTHOR_CACHE_TTL)
     
     @staticmethod
     def serialize_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
@@ -33,6 +137,107 @@ class DatabaseManager:
         """Convert list of MongoDB documents to JSON serializable format"""
         return [DatabaseManager.serialize_doc(doc) for doc in docs]
 
+    @staticmethod
+    def serialize_comment(comment: Dict[str, Any]) -> Dict[str, Any]:
+        """Serialize a comment including its reference fields"""
+        comment = DatabaseManager.serialize_doc(comment)
+        for field in ("postId", "userId", "parentId"):
+            if comment.get(field) is not None:
+                comment[field] = str(comment[field])
+        if 'user' in comment:
+            comment['user'] = DatabaseManager.serialize_doc(comment['user'])
+        return comment
+
+    @staticmethod
+    def post_records(posts: List[Dict[str, Any]]) -> List[PostRecord]:
+        """Records for raw posts with an embedded author; each author is built once per page"""
+        authors: Dict[ObjectId, UserRecord] = {}
+        records = []
+        for post in posts:
+            author = authors.get(post["authorId"])
+            if author is None:
+                author = authors[post["authorId"]] = UserRecord.from_doc(post["author"])
+            records.append(PostRecord.from_doc(post, author))
+        return records
+
+    @staticmethod
+    def user_lookup(local_field: str, as_field: str, projection: Dict[str, int] = AUTHOR_PROJECTION) -> dict:
+        """$lookup stage that only pulls the projected user fields"""
+        return {"$lookup": {
+            "from": "users",
+            "localField": local_field,
+            "foreignField": "_id",
+            "pipeline": [{"$project": projection}],
+            "as": as_field
+        }}
+
+    async def create_indexes(self):
+        """Create the indexes the query paths rely on"""
+        # Version lookups for conditional GETs on feeds
+        await posts_collection.create_index([("updatedAt", DESCENDING)])
+        # Registration relies on these to reject duplicates in a single insert
+        await users_collection.create_index([("email", ASCENDING)], unique=True)
+        await users_collection.create_index([("username", ASCENDING)], unique=True)
+        await posts_collection.create_index([("category", ASCENDING), ("updatedAt", DESCENDING)])
+        # Follow graph and home timelines
+        await follows_collection.create_index(
+            [("followerId", ASCENDING), ("followeeId", ASCENDING)], unique=True
+        )
+        await follows_collection.create_index([("followeeId", ASCENDING), ("_id", ASCENDING)])
+        await posts_collection.create_index([("authorId", ASCENDING), ("createdAt", DESCENDING)])
+        await users_collection.create_index([("followers", DESCENDING)])
+        # Posts created before soft-delete existed have no flag; idempotent backfill
+        await posts_collection.update_many({"deleted": {"$exists": False}}, {"$set": {"deleted": False}})
+        # Feed indexes only cover live posts
+        live_only = {"partialFilterExpression": LIVE_POSTS}
+        await posts_collection.create_index([("score", DESCENDING), ("createdAt", DESCENDING)], **live_only)
+        await posts_collection.create_index([("createdAt", DESCENDING), ("score", DESCENDING)], **live_only)
+        await posts_collection.create_index(
+            [("category", ASCENDING), ("score", DESCENDING), ("createdAt", DESCENDING)], **live_only
+        )
+        await posts_collection.create_index(
+            [("category", ASCENDING), ("createdAt", DESCENDING), ("score", DESCENDING)], **live_only
+        )
+        # Tag feeds (multikey on the tags array)
+        await posts_collection.create_index(
+            [("tags", ASCENDING), ("score", DESCENDING), ("createdAt", DESCENDING)], **live_only
+        )
+        await posts_collection.create_index(
+            [("tags", ASCENDING), ("createdAt", DESCENDING), ("score", DESCENDING)], **live_only
+        )
+        # Deletion cascade
+        await deletion_jobs_collection.create_index([("status", ASCENDING), ("createdAt", ASCENDING)])
+        await votes_collection.create_index([("postId", ASCENDING)])
+        await comments_collection.create_index([("postId", ASCENDING), ("createdAt", DESCENDING)])
+        # Author stats reconciliation
+        await comments_collection.create_index([("userId", ASCENDING)])
+        # Archive tier
+        await posts_archive_collection.create_index([("authorId", ASCENDING), ("createdAt", DESCENDING)])
+        await posts_archive_collection.create_index([("votesArchived", ASCENDING)])
+        await votes_archive_collection.create_index([("postId", ASCENDING)])
+        await votes_archive_collection.create_index([("userId", ASCENDING), ("postId", ASCENDING)])
+        # Idempotency records expire on their own
+        await idempotency_keys_collection.create_index([("createdAt", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_KEY_TTL)
+        await uploads_collection.create_index([("createdAt", ASCENDING)], expireAfterSeconds=UPLOAD_RECORD_TTL)
+        # Notification inbox pages
+        await notifications_collection.create_index(
+            [("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)]
+        )
+        # Unread count reconciliation walks only the unread entries
+        await notifications_collection.create_index(
+            [("userId", ASCENDING)], name="userId_unread", partialFilterExpression={"read": False}
+        )
+        # Leaderboard vote windows
+        await votes_collection.create_index([("createdAt", DESCENDING)])
+        # Category counters start from a full count once; $inc keeps them current after that
+        if not await category_counts_collection.estimated_document_count():
+            counts = await self.count_posts_by_category()
+            if counts:
+                await category_counts_collection.bulk_write([
+                    UpdateOne({"_id": category}, {"$setOnInsert": {"count": count}}, upsert=True)
+                    for category, count in counts.items()
+                ], ordered=False)
+
     # User operations
     async def create_user(self, user_data: dict) -> dict:
         """Create a new user"""
@@ -41,24 +246,36 @@ class DatabaseManager:
         user_data['followers'] = 0
         user_data['following'] = 0
         user_data['upvotesReceived'] = 0
+        user_data['karma'] = 0
+        user_data['postCount'] = 0
+        user_data['commentCount'] = 0
+        user_data['unreadNotifications'] = 0
         user_data['isActive'] = True
         
-        result = await users_collection.insert_one(user_data)
-        return await self.get_user_by_id(str(result.inserted_id))
+        try:
+            await users_collection.insert_one(user_data)
+        except DuplicateKeyError as e:
+            details = e.details or {}
+            key_pattern = details.get("keyPattern") or {}
+            index_name = details.get("errmsg", "").partition("index: ")[2].split(" ")[0]
+            field = "email" if "email" in key_pattern or index_name == "email_1" else "username"
+            raise DuplicateUserError(field)
+        # The inserted document is the user; no need to read it back
+        return self.serialize_doc(user_data)
 
     async def get_user_by_email(self, email: str) -> Optional[dict]:
         """Get user by email"""
-        user = await users_collection.find_one({"email": email})
+        user = await users_collection.find_one({"email": email}, max_time_ms=max_time_ms())
         return self.serialize_doc(user)
 
     async def get_user_by_username(self, username: str) -> Optional[dict]:
         """Get user by username"""
-        user = await users_collection.find_one({"username": username})
+        user = await users_collection.find_one({"username": username}, {"passwordHash": 0}, max_time_ms=max_time_ms())
         return self.serialize_doc(user)
 
     async def get_user_by_id(self, user_id: str) -> Optional[dict]:
         """Get user by ID"""
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"passwordHash": 0}, max_time_ms=max_time_ms())
         return self.serialize_doc(user)
 
     async def update_user(self, user_id: str, update_data: dict) -> Optional[dict]:
@@ -67,8 +284,86 @@ class DatabaseManager:
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        self.forget_author(user_id)
+        if PROFILE_FIELDS & set(update_data):
+            await task_runner.enqueue(
+                "author_validators", self.invalidate_author_content, user_id, key=f"author:{user_id}"
+            )
         return await self.get_user_by_id(user_id)
 
+    async def invalidate_author_content(self, user_id: str):
+        """
+        Bump the validators of every post and comment thread that embeds a
+        user's profile, and of the feeds, so conditional GETs stop answering
+        304 with the old username or avatar
+        """
+        now = datetime.utcnow()
+        user_id = ObjectId(user_id)
+        commented = await comments_collection.distinct("postId", {"userId": user_id})
+        for collection in (posts_collection, posts_archive_collection):
+            await collection.update_many(
+                {"authorId": user_id}, {"$inc": {"version": 1}, "$set": {"updatedAt": now}}
+            )
+            if commented:
+                await collection.update_many(
+                    {"_id": {"$in": commented}}, {"$inc": {"commentsVersion": 1}, "$set": {"updatedAt": now}}
+                )
+        await self.bump_feed_versions()
+
+    def forget_author(self, user_id: str):
+        """Drop a user from the author cache after their profile or stats changed"""
+        self._authors.pop(str(user_id))
+
+    async def get_author(self, user_id: str) -> Optional[dict]:
+        """Get the embedded author shape of a user, cached for AUTHOR_CACHE_TTL seconds"""
+        user_id = str(user_id)
+        author = self._authors.get(user_id)
+        if author is None:
+            author = self.serialize_doc(await users_collection.find_one(
+                {"_id": ObjectId(user_id)}, AUTHOR_PROJECTION, max_time_ms=max_time_ms()
+            ))
+            if author is None:
+                return None
+            self._authors.set(user_id, author)
+        # Callers embed it in responses; keep the cached copy untouched
+        return dict(author)
+
+    async def get_authors(self, user_ids: Iterable[ObjectId]) -> Dict[ObjectId, dict]:
+        """Embedded author shapes by user id: cache hits first, the misses with one $in query"""
+        authors = {}
+        missing = []
+        for user_id in set(user_ids):
+            author = self._authors.get(str(user_id))
+            if author is None:
+                missing.append(user_id)
+            else:
+                authors[user_id] = dict(author)
+        if missing:
+            docs = await users_collection.find(
+                {"_id": {"$in": missing}}, AUTHOR_PROJECTION, max_time_ms=max_time_ms()
+            ).to_list(len(missing))
+            for doc in docs:
+                user_id = doc["_id"]
+                author = self.serialize_doc(doc)
+                self._authors.set(author["id"], author)
+                authors[user_id] = dict(author)
+        return authors
+
+    # Upload operations
+    async def record_upload(self, public_id: str, user_id: str, media_type: str, media_hash: Optional[str]):
+        """Remember who uploaded a file and its perceptual hash until a post uses it"""
+        await uploads_collection.replace_one(
+            {"_id": public_id},
+            {"userId": ObjectId(user_id), "mediaType": media_type, "mediaHash": media_hash, "createdAt": datetime.utcnow()},
+            upsert=True
+        )
+
+    async def get_upload(self, public_id: str, user_id: str) -> Optional[dict]:
+        """The upload record for public_id if user_id uploaded it"""
+        return await uploads_collection.find_one(
+            {"_id": public_id, "userId": ObjectId(user_id)}, max_time_ms=max_time_ms()
+        )
+
     # Post operations
     async def create_post(self, post_data: dict) -> dict:
         """Create a new post"""
@@ -78,79 +373,317 @@ class DatabaseManager:
         post_data['score'] = 0
         post_data['commentCount'] = 0
         post_data['views'] = 0
+        post_data['deleted'] = False
+        post_data['tags'] = normalize_tags(post_data.get('tags', []))
         post_data['createdAt'] = datetime.utcnow()
+        # Versions back conditional GETs; views deliberately do not bump them
+        post_data['version'] = 1
+        post_data['commentsVersion'] = 0
+        post_data['updatedAt'] = post_data['createdAt']
         
-        result = await posts_collection.insert_one(post_data)
-        return await self.get_post_by_id(str(result.inserted_id))
+        await posts_collection.insert_one(post_data)
+        await user_stats.add(post_data['authorId'], postCount=1)
+        await self._count_category(post_data['category'], 1)
+        trending_tags.record_post(post_data['tags'])
+        self._post_states.set(str(post_data['_id']), "live")
+
+        # The inserted document already holds every response field
+        author = await self.get_author(post_data['authorId'])
+        if author is None:
+            return await self.get_post_by_id(str(post_data['_id']))
+        post = self.serialize_doc({field: post_data[field] for field in ("_id", *POST_PROJECTION) if field in post_data})
+        post['author'] = author
+        post['archived'] = False
+        return post
+
+    async def get_post_state(self, post_id: str) -> Optional[str]:
+        """
+        "live", "archived" or None for a missing or deleted post, using
+        _id-only probes and a short-lived cache instead of the author join
+        """
+        state = self._post_states.get(post_id)
+        if state is not None:
+            return state
+        query = {"_id": ObjectId(post_id), "deleted": {"$ne": True}}
+        if await posts_collection.find_one(query, {"_id": 1}, max_time_ms=max_time_ms()):
+            state = "live"
+        elif await posts_archive_collection.find_one(query, {"_id": 1}, max_time_ms=max_time_ms()):
+            state = "archived"
+        else:
+            return None
+        self._post_states.set(post_id, state)
+        return state
+
+    def forget_post(self, post_id: str):
+        """Drop a post from the existence cache after it was deleted or moved"""
+        self._post_states.pop(str(post_id))
+
+    def clear_caches(self):
+        """Empty every in-process cache, for when changes may have been missed"""
+        self._post_states.clear()
+        self._comment_ids.clear()
+        self._authors.clear()
+        self._hot_authors_loaded_at = 0.0
 
     async def get_post_by_id(self, post_id: str) -> Optional[dict]:
-        """Get post by ID with author info"""
+        """Get post by ID with author info, falling back to the archive"""
         pipeline = [
-            {"$match": {"_id": ObjectId(post_id)}},
-            {"$lookup": {
-                "from": "users",
-                "localField": "authorId",
-                "foreignField": "_id",
-                "as": "author"
-            }},
+            {"$match": {"_id": ObjectId(post_id), "deleted": {"$ne": True}}},
+            {"$project": POST_PROJECTION},
+            self.user_lookup("authorId", "author"),
             {"$unwind": "$author"}
         ]
         
-        result = await posts_collection.aggregate(pipeline).to_list(1)
+        result = await posts_collection.aggregate(pipeline, **query_options()).to_list(1)
+        archived = False
+        if not result:
+            result = await posts_archive_collection.aggregate(pipeline, **query_options()).to_list(1)
+            archived = True
         if result:
             post = result[0]
             post = self.serialize_doc(post)
             post['author'] = self.serialize_doc(post['author'])
+            post['archived'] = archived
             return post
         return None
 
-    async def get_posts(self, skip: int = 0, limit: int = 10, section: str = "hot", category: Optional[str] = None) -> tuple:
-        """Get posts with pagination and filtering"""
-        match_query = {}
+    @staticmethod
+    def feed_query(category: Optional[str] = None, tag: Optional[str] = None) -> dict:
+        """Match stage for a feed; a tag is matched against the multikey tags index"""
+        match_query = dict(LIVE_POSTS)
         if category:
             match_query["category"] = category
+        if tag:
+            match_query["tags"] = tag
+        return match_query
 
-        # Sort based on section
-        sort_criteria = {}
-        if section == "hot":
-            sort_criteria = {"score": -1, "createdAt": -1}
-        elif section == "trending":
-            sort_criteria = {"createdAt": -1, "score": -1}  # Recent posts with good scores
-        elif section == "fresh":
-            sort_criteria = {"createdAt": -1}
-        else:
-            sort_criteria = {"score": -1, "createdAt": -1}
+    @staticmethod
+    def feed_sort(section: str) -> dict:
+        """Sort order for a feed section"""
+        if section == "trending":
+            return {"createdAt": -1, "score": -1}  # Recent posts with good scores
+        if section == "fresh":
+            return {"createdAt": -1}
+        return {"score": -1, "createdAt": -1}
 
+    async def get_posts(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        section: str = "hot",
+        category: Optional[str] = None,
+        fields: Optional[set] = None,
+        tag: Optional[str] = None
+    ) -> tuple:
+        """
+        Get posts with pagination and filtering. Full pages are PostRecords;
+        pages limited to a sparse fieldset are serialized dicts.
+        """
+        match_query = self.feed_query(category, tag)
+
+        # Sort and page before the join so the feed indexes drive the query
         pipeline = [
             {"$match": match_query},
-            {"$lookup": {
-                "from": "users",
-                "localField": "authorId",
-                "foreignField": "_id",
-                "as": "author"
-            }},
-            {"$unwind": "$author"},
-            {"$sort": sort_criteria},
+            {"$sort": self.feed_sort(section)},
             {"$skip": skip},
             {"$limit": limit + 1}  # Get one extra to check if there are more
         ]
+        if fields is None:
+            pipeline += [
+                {"$project": POST_PROJECTION},
+                self.user_lookup("authorId", "author"),
+                {"$unwind": "$author"}
+            ]
+        else:
+            pipeline.append({"$project": projection_for(fields, required=["authorId"])})
+            if "author" in fields:
+                pipeline += [
+                    self.user_lookup("authorId", "author", COMPACT_AUTHOR_PROJECTION),
+                    {"$unwind": "$author"}
+                ]
 
-        posts = await posts_collection.aggregate(pipeline).to_list(limit + 1)
+        posts = await posts_collection.aggregate(pipeline, **query_options()).to_list(limit + 1)
         has_more = len(posts) > limit
         if has_more:
             posts = posts[:-1]  # Remove the extra post
 
-        # Get total count
-        total = await posts_collection.count_documents(match_query)
+        total = await self.count_feed(match_query)
 
+        if fields is None:
+            return self.post_records(posts), has_more, total
         serialized_posts = []
         for post in posts:
             post = self.serialize_doc(post)
-            post['author'] = self.serialize_doc(post['author'])
+            if 'author' in post:
+                post['author'] = self.serialize_doc(post['author'])
             serialized_posts.append(post)
 
         return serialized_posts, has_more, total
 
+    async def get_unseen_posts(
+        self,
+        seen,
+        skip: int = 0,
+        limit: int = 10,
+        section: str = "hot",
+        category: Optional[str] = None,
+        tag: Optional[str] = None
+    ) -> tuple:
+        """
+        Get a feed page without the posts in `seen` (anything supporting `in`
+        on post ids). Over-fetches ids only, filters them in memory and
+        hydrates just the survivors.
+        """
+        match_query = self.feed_query(category, tag)
+        window = (limit + 1) * SEEN_OVERFETCH
+
+        unseen = []
+        exhausted = False
+        for _ in range(SEEN_MAX_ROUNDS):
+            candidates = await posts_collection.find(
+                match_query, {"_id": 1}, max_time_ms=max_time_ms()
+            ).sort(list(self.feed_sort(section).items())).skip(skip).limit(window).to_list(window)
+            skip += len(candidates)
+            unseen += [c["_id"] for c in candidates if str(c["_id"]) not in seen]
+            if len(candidates) < window:
+                exhausted = True
+            if exhausted or len(unseen) > limit:
+                break
+
+        has_more = len(unseen) > limit or not exhausted
+        posts = await self.get_posts_by_ids(unseen[:limit])
+        total = await self.count_feed(match_query)
+        return posts, has_more, total
+
+    async def count_feed(self, match_query: dict) -> Optional[int]:
+        """Total for a feed page, or None when the request has no budget left for it"""
+        try:
+            return await posts_collection.count_documents(match_query, **query_options())
+        except TIMEOUT_ERRORS:
+            # The page itself is still useful without a total
+            return None
+
+    async def _count_category(self, category: str, delta: int):
+        await category_counts_collection.update_one({"_id": category}, {"$inc": {"count": delta}}, upsert=True)
+        # A post entered or left the category's feeds
+        await self.bump_feed_versions([category])
+
+    async def bump_feed_versions(self, categories: Iterable[str] = ()):
+        """
+        Change the validators of these categories' feeds and of every feed
+        that includes them, for changes that do not move a post's updatedAt
+        (archiving, deletion, author edits)
+        """
+        now = datetime.utcnow()
+        await feed_versions_collection.bulk_write([
+            UpdateOne({"_id": feed}, {"$inc": {"version": 1}, "$set": {"updatedAt": now}}, upsert=True)
+            for feed in {*categories, ALL_FEEDS}
+        ], ordered=False)
+
+    async def get_category_counts(self) -> List[dict]:
+        """Live post count per category from the counters, largest first"""
+        counts = await category_counts_collection.find(
+            {"count": {"$gt": 0}}, max_time_ms=max_time_ms()
+        ).sort("count", DESCENDING).to_list(None)
+        return [{"category": c["_id"], "count": c["count"]} for c in counts]
+
+    async def count_posts_by_category(self) -> Dict[str, int]:
+        """Full recount of live and archived posts per category (for seeding and reconciliation)"""
+        counts = await posts_collection.aggregate([
+            {"$match": LIVE_POSTS},
+            {"$project": {"category": 1}},
+            {"$unionWith": {"coll": posts_archive_collection.name, "pipeline": [
+                {"$match": {"deleted": {"$ne": True}}},
+                {"$project": {"category": 1}}
+            ]}},
+            {"$group": {"_id": "$category", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        return {c["_id"]: c["count"] for c in counts}
+
+    async def get_leaderboard(self, board: str) -> Optional[dict]:
+        """A precomputed leaderboard document (entries and computedAt)"""
+        return await leaderboards_collection.find_one({"_id": board}, {"_id": 0}, max_time_ms=max_time_ms())
+
+    async def get_post_version(self, post_id: str) -> Optional[dict]:
+        """Get only the version fields of a post (indexed _id lookup, no join)"""
+        query = {"_id": ObjectId(post_id), "deleted": {"$ne": True}}
+        projection = {"version": 1, "commentsVersion": 1, "updatedAt": 1, "createdAt": 1}
+        post = await posts_collection.find_one(query, projection, max_time_ms=max_time_ms())
+        if post is None:
+            post = await posts_archive_collection.find_one(query, projection, max_time_ms=max_time_ms())
+        if post is None:
+            return None
+        return {
+            "version": post.get("version", 0),
+            "commentsVersion": post.get("commentsVersion", 0),
+            "updatedAt": post.get("updatedAt") or post.get("createdAt"),
+        }
+
+    async def get_feed_validators(self, category: Optional[str] = None) -> Tuple[Optional[datetime], int]:
+        """
+        (last modified, version) for a feed: the newest post or feed version
+        change, and the sum of the category's and the shared feed version,
+        which grows whenever either is bumped
+        """
+        last_modified = await self.get_feed_last_modified(category)
+        feeds = [ALL_FEEDS, category] if category else [ALL_FEEDS]
+        version = 0
+        async for feed in feed_versions_collection.find({"_id": {"$in": feeds}}, max_time_ms=max_time_ms()):
+            version += feed["version"]
+            if last_modified is None or feed["updatedAt"] > last_modified:
+                last_modified = feed["updatedAt"]
+        return last_modified, version
+
+    async def get_feed_last_modified(self, category: Optional[str] = None) -> Optional[datetime]:
+        """Get the most recent post modification time for a feed"""
+        match_query = {"updatedAt": {"$exists": True}}
+        if category:
+            match_query["category"] = category
+        post = await posts_collection.find_one(
+            match_query,
+            {"updatedAt": 1, "_id": 0},
+            sort=[("updatedAt", DESCENDING)],
+            max_time_ms=max_time_ms()
+        )
+        return post["updatedAt"] if post else None
+
+    async def soft_delete_post(self, post_id: str) -> bool:
+        """Hide a post immediately and queue its cascade; returns False if already deleted"""
+        now = datetime.utcnow()
+        post = await posts_collection.find_one_and_update(
+            {"_id": ObjectId(post_id), "deleted": {"$ne": True}},
+            {"$set": {"deleted": True, "deletedAt": now, "updatedAt": now}, "$inc": {"version": 1}},
+            projection={"authorId": 1, "upvotes": 1, "score": 1, "category": 1}
+        )
+        if post is None:
+            return False
+        self.forget_post(post_id)
+        await self._count_category(post["category"], -1)
+        # Deleted posts stop counting towards the author's stats
+        await user_stats.add(
+            post["authorId"],
+            postCount=-1,
+            karma=-post.get("score", 0),
+            upvotesReceived=-post.get("upvotes", 0)
+        )
+        await deletion_jobs_collection.update_one(
+            {"_id": ObjectId(post_id)},
+            {"$setOnInsert": {
+                "status": "pending",
+                "stage": "votes",
+                "deleted": {"votes": 0, "comments": 0, "media": 0},
+                "createdAt": now,
+                "updatedAt": now
+            }},
+            upsert=True
+        )
+        return True
+
+    async def get_deletion_job(self, post_id: str) -> Optional[dict]:
+        """Get cascade progress for a deleted post"""
+        job = await deletion_jobs_collection.find_one({"_id": ObjectId(post_id)})
+        return self.serialize_doc(job)
+
     async def increment_post_views(self, post_id: str):
         """Increment post view count"""
         await posts_collection.update_one(
@@ -184,8 +717,8 @@ class DatabaseManager:
             # Create new vote
             await votes_collection.insert_one(vote_data)
 
-        # Update post score
-        await self.update_post_score(post_id)
+        # Recompute the post score after the response; queued recomputes coalesce
+        await task_runner.enqueue("post_score", self.update_post_score, post_id, key=f"score:{post_id}")
         return {"success": True}
 
     async def remove_vote(self, user_id: str, post_id: str) -> dict:
@@ -194,15 +727,15 @@ class DatabaseManager:
             "userId": ObjectId(user_id),
             "postId": ObjectId(post_id)
         })
-        await self.update_post_score(post_id)
+        await task_runner.enqueue("post_score", self.update_post_score, post_id, key=f"score:{post_id}")
         return {"success": True}
 
     async def get_user_vote(self, user_id: str, post_id: str) -> Optional[dict]:
-        """Get user's vote on a post"""
-        vote = await votes_collection.find_one({
-            "userId": ObjectId(user_id),
-            "postId": ObjectId(post_id)
-        })
+        """Get user's vote on a post, falling back to archived votes"""
+        query = {"userId": ObjectId(user_id), "postId": ObjectId(post_id)}
+        vote = await votes_collection.find_one(query, max_time_ms=max_time_ms())
+        if vote is None:
+            vote = await votes_archive_collection.find_one(query, max_time_ms=max_time_ms())
         return self.serialize_doc(vote)
 
     async def update_post_score(self, post_id: str):
@@ -224,14 +757,34 @@ class DatabaseManager:
         else:
             upvotes = downvotes = score = 0
 
-        await posts_collection.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$set": {
-                "upvotes": upvotes,
-                "downvotes": downvotes,
-                "score": score
-            }}
+        previous = await posts_collection.find_one_and_update(
+            {"_id": ObjectId(post_id), "deleted": {"$ne": True}},
+            {
+                "$set": {
+                    "upvotes": upvotes,
+                    "downvotes": downvotes,
+                    "score": score,
+                    "updatedAt": datetime.utcnow()
+                },
+                "$inc": {"version": 1}
+            },
+            projection={"authorId": 1, "upvotes": 1, "downvotes": 1, "score": 1, "tags": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous is None:
+            return
+        # Recomputes are coalesced, so weigh the tags by every vote added since the last one
+        trending_tags.record(
+            previous.get("tags", []),
+            upvotes + downvotes - previous.get("upvotes", 0) - previous.get("downvotes", 0)
         )
+        # Propagate the change in the post's counters to its author
+        await user_stats.add(
+            previous["authorId"],
+            karma=score - previous.get("score", 0),
+            upvotesReceived=upvotes - previous.get("upvotes", 0)
+        )
+        hub.publish_score(post_id, upvotes, downvotes, score)
 
     # Comment operations
     async def create_comment(self, comment_data: dict) -> dict:
@@ -242,63 +795,132 @@ class DatabaseManager:
         comment_data['score'] = 0
         comment_data['createdAt'] = datetime.utcnow()
         
-        result = await comments_collection.insert_one(comment_data)
+        await comments_collection.insert_one(comment_data)
+        # Inline rather than queued: a raw $inc cannot be retried safely, and the
+        # shorter the gap after the insert, the less reconciliation has to skip
+        await self.increment_comment_count(comment_data['postId'], comment_data['createdAt'])
+        await user_stats.add(comment_data['userId'], commentCount=1)
+        self._comment_ids.set(str(comment_data['_id']), True)
+        
+        # Notify after the response
+        await task_runner.enqueue("comment_notifications", notification_queue.comment_created, dict(comment_data))
         
-        # Increment post comment count
+        # Build the response from the inserted document instead of reading it back
+        user = await self.get_author(comment_data['userId'])
+        if user is None:
+            comment = await self.get_comment_by_id(str(comment_data['_id']))
+        else:
+            comment = self.serialize_comment({
+                field: comment_data[field] for field in ("_id", *COMMENT_PROJECTION) if field in comment_data
+            })
+            comment['user'] = user
+        if comment:
+            hub.publish_comment(str(comment_data['postId']), comment)
+        return comment
+
+    async def comment_exists(self, comment_id: str) -> bool:
+        """_id-only existence probe for comments, cached briefly"""
+        if self._comment_ids.get(comment_id):
+            return True
+        found = await comments_collection.find_one(
+            {"_id": ObjectId(comment_id)}, {"_id": 1}, max_time_ms=max_time_ms()
+        )
+        if found:
+            self._comment_ids.set(comment_id, True)
+        return found is not None
+
+    def remember_comment(self, comment_id: str) -> bool:
+        """Cache a comment as existing; False if it was already known here"""
+        comment_id = str(comment_id)
+        if self._comment_ids.get(comment_id):
+            return False
+        self._comment_ids.set(comment_id, True)
+        return True
+
+    def forget_comment(self, comment_id: str):
+        self._comment_ids.pop(str(comment_id))
+
+    async def increment_comment_count(self, post_id, updated_at: datetime):
+        """Bump a post's comment counter and the versions conditional GETs use"""
         await posts_collection.update_one(
-            {"_id": ObjectId(comment_data['postId'])},
-            {"$inc": {"commentCount": 1}}
+            {"_id": ObjectId(post_id)},
+            {
+                "$inc": {"commentCount": 1, "version": 1, "commentsVersion": 1},
+                "$set": {"updatedAt": updated_at}
+            }
         )
-        
-        return await self.get_comment_by_id(str(result.inserted_id))
 
     async def get_comment_by_id(self, comment_id: str) -> Optional[dict]:
         """Get comment by ID with user info"""
         pipeline = [
             {"$match": {"_id": ObjectId(comment_id)}},
-            {"$lookup": {
-                "from": "users",
-                "localField": "userId",
-                "foreignField": "_id",
-                "as": "user"
-            }},
+            {"$project": COMMENT_PROJECTION},
+            self.user_lookup("userId", "user"),
             {"$unwind": "$user"}
         ]
         
-        result = await comments_collection.aggregate(pipeline).to_list(1)
+        result = await comments_collection.aggregate(pipeline, **query_options()).to_list(1)
         if result:
-            comment = result[0]
-            comment = self.serialize_doc(comment)
-            comment['user'] = self.serialize_doc(comment['user'])
-            return comment
+            return self.serialize_comment(result[0])
         return None
 
-    async def get_comments_for_post(self, post_id: str) -> List[dict]:
-        """Get all comments for a post with replies"""
+    async def get_comments_for_post(self, post_id: str, fields: Optional[set] = None) -> tuple:
+        """
+        Get all comments for a post with replies, as CommentRecords or, for
+        a sparse fieldset, serialized dicts. Returns (comments, partial): if
+        the full thread does not fit the request budget, the newest comments
+        are returned instead with partial=True.
+        """
         pipeline = [
             {"$match": {"postId": ObjectId(post_id)}},
-            {"$lookup": {
-                "from": "users",
-                "localField": "userId",
-                "foreignField": "_id",
-                "as": "user"
-            }},
-            {"$unwind": "$user"},
             {"$sort": {"createdAt": -1}}
         ]
+        tail = []
+        if fields is None:
+            tail = [
+                {"$project": COMMENT_PROJECTION},
+                self.user_lookup("userId", "user"),
+                {"$unwind": "$user"}
+            ]
+        else:
+            # parentId is needed to thread replies even when not returned
+            tail = [{"$project": projection_for(fields, required=["parentId", "userId"])}]
+            if "user" in fields:
+                tail += [
+                    self.user_lookup("userId", "user", COMPACT_AUTHOR_PROJECTION),
+                    {"$unwind": "$user"}
+                ]
 
-        comments = await comments_collection.aggregate(pipeline).to_list(1000)
-        serialized_comments = []
+        partial = False
+        try:
+            comments = await comments_collection.aggregate(
+                pipeline + tail, **query_options(reserve=COMMENTS_FALLBACK_RESERVE)
+            ).to_list(1000)
+        except TIMEOUT_ERRORS:
+            # Degrade to the newest comments, which the (postId, createdAt) index serves directly
+            partial = True
+            comments = await comments_collection.aggregate(
+                pipeline + [{"$limit": COMMENTS_FALLBACK_LIMIT}] + tail, **query_options()
+            ).to_list(COMMENTS_FALLBACK_LIMIT)
+        if fields is None:
+            users: Dict[ObjectId, UserRecord] = {}
+            records = []
+            for comment in comments:
+                user = users.get(comment["userId"])
+                if user is None:
+                    user = users[comment["userId"]] = UserRecord.from_doc(comment["user"])
+                records.append(CommentRecord.from_doc(comment, user))
+            comments = records
+        else:
+            comments = [self.serialize_comment(comment) for comment in comments]
+            for comment in comments:
+                comment['replies'] = []
         
         # Organize comments with replies
         top_level_comments = []
         replies_map = {}
         
         for comment in comments:
-            comment = self.serialize_doc(comment)
-            comment['user'] = self.serialize_doc(comment['user'])
-            comment['replies'] = []
-            
             if comment.get('parentId'):
                 # This is a reply
                 parent_id = comment['parentId']
@@ -312,9 +934,311 @@ class DatabaseManager:
         # Attach replies to their parent comments
         for comment in top_level_comments:
             if comment['id'] in replies_map:
-                comment['replies'] = replies_map[comment['id']]
+                comment['replies'].extend(replies_map[comment['id']])
+
+        return top_level_comments, partial
+
+    # Notification operations
+    async def get_notifications(
+        self,
+        user_id: str,
+        limit: int = 20,
+        before: Optional[tuple] = None
+    ) -> tuple:
+        """
+        A page of a user's notifications, newest first, with their actors.
+        `before` is the (createdAt, _id) of the last notification already
+        seen; returns (notifications, has_more).
+        """
+        query: Dict[str, Any] = {"userId": ObjectId(user_id)}
+        if before is not None:
+            created_at, last_id = before
+            query["$or"] = [
+                {"createdAt": {"$lt": created_at}},
+                {"createdAt": created_at, "_id": {"$lt": last_id}},
+            ]
+        notifications = await notifications_collection.find(
+            query, {"userId": 0}, max_time_ms=max_time_ms()
+        ).sort([("createdAt", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1).to_list(limit + 1)
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+
+        actors = await self.get_authors(n["actorId"] for n in notifications)
+        result = []
+        for notification in notifications:
+            actor = actors.get(notification.pop("actorId"))
+            if actor is None:
+                continue
+            notification = self.serialize_doc(notification)
+            notification["actor"] = {field: actor.get(field) for field in ("id", "username", "avatar")}
+            notification["postId"] = str(notification["postId"])
+            notification["commentId"] = str(notification["commentId"])
+            result.append(notification)
+        return result, has_more
+
+    async def get_unread_notification_count(self, user_id: str) -> int:
+        user = await users_collection.find_one(
+            {"_id": ObjectId(user_id)}, {"unreadNotifications": 1}, max_time_ms=max_time_ms()
+        )
+        return max(0, (user or {}).get("unreadNotifications", 0))
+
+    async def mark_notifications_read(self, user_id: str, notification_ids: Optional[List[str]] = None) -> int:
+        """Mark some or all of a user's notifications read; returns how many changed"""
+        query: Dict[str, Any] = {"userId": ObjectId(user_id), "read": False}
+        if notification_ids is not None:
+            query["_id"] = {"$in": [ObjectId(n) for n in notification_ids]}
+        result = await notifications_collection.update_many(query, {"$set": {"read": True}})
+        if result.modified_count:
+            # Only what this call flipped, so notifications stored concurrently stay counted;
+            # clamped at 0 in case the counter had already drifted low
+            remaining = {"$subtract": [{"$ifNull": ["$unreadNotifications", 0]}, result.modified_count]}
+            await users_collection.update_one(
+                {"_id": ObjectId(user_id)}, [{"$set": {"unreadNotifications": {"$max": [0, remaining]}}}]
+            )
+        return result.modified_count
+
+    # Follow operations
+    async def follow_user(self, follower_id: str, followee_id: str) -> bool:
+        """Create a follow edge; returns False if it already existed"""
+        try:
+            await follows_collection.insert_one({
+                "followerId": ObjectId(follower_id),
+                "followeeId": ObjectId(followee_id),
+                "createdAt": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            return False
+
+        # The unique edge insert guards the counters, so each applies exactly once
+        await users_collection.update_one({"_id": ObjectId(follower_id)}, {"$inc": {"following": 1}})
+        followee = await users_collection.find_one_and_update(
+            {"_id": ObjectId(followee_id)},
+            {"$inc": {"followers": 1}},
+            projection={"followers": 1}
+        )
+        if followee and followee.get("followers", 0) < HOT_AUTHOR_FOLLOWERS:
+            await self._backfill_timeline(follower_id, followee_id)
+        return True
+
+    async def unfollow_user(self, follower_id: str, followee_id: str) -> bool:
+        """Remove a follow edge; returns False if there was none"""
+        result = await follows_collection.delete_one({
+            "followerId": ObjectId(follower_id),
+            "followeeId": ObjectId(followee_id)
+        })
+        if not result.deleted_count:
+            return False
+
+        await users_collection.update_one({"_id": ObjectId(follower_id)}, {"$inc": {"following": -1}})
+        await users_collection.update_one({"_id": ObjectId(followee_id)}, {"$inc": {"followers": -1}})
+        await timelines_collection.update_one(
+            {"_id": ObjectId(follower_id)},
+            {"$pull": {"entries": {"authorId": ObjectId(followee_id)}}}
+        )
+        return True
+
+    async def is_following(self, follower_id: str, followee_id: str) -> bool:
+        """Check whether a follow edge exists"""
+        edge = await follows_collection.find_one(
+            {"followerId": ObjectId(follower_id), "followeeId": ObjectId(followee_id)},
+            {"_id": 1},
+            max_time_ms=max_time_ms()
+        )
+        return edge is not None
+
+    # Timeline operations
+    async def _push_timeline_entries(self, follower_ids: List[ObjectId], entries: List[dict]):
+        """Push entries into capped per-user timelines, newest first"""
+        update = {"$push": {"entries": {
+            "$each": entries,
+            # Same order as the (createdAt, postId) page cursor
+            "$sort": {"createdAt": -1, "postId": -1},
+            "$slice": TIMELINE_SIZE
+        }}}
+        requests = [UpdateOne({"_id": follower_id}, update, upsert=True) for follower_id in follower_ids]
+        if requests:
+            await timelines_collection.bulk_write(requests, ordered=False)
+
+    async def _backfill_timeline(self, follower_id: str, followee_id: str):
+        """Seed a new follower's timeline with the author's recent posts"""
+        posts = await posts_collection.find(
+            {"authorId": ObjectId(followee_id), **LIVE_POSTS},
+            {"_id": 1, "authorId": 1, "createdAt": 1}
+        ).sort("createdAt", DESCENDING).limit(FOLLOW_BACKFILL_POSTS).to_list(FOLLOW_BACKFILL_POSTS)
+        entries = [
+            {"postId": p["_id"], "authorId": p["authorId"], "createdAt": p["createdAt"]}
+            for p in posts
+        ]
+        if entries:
+            await self._push_timeline_entries([ObjectId(follower_id)], entries)
+
+    async def fan_out_post(self, post_id: str, author_id: str, created_at: datetime) -> int:
+        """Push a new post into followers' timelines unless the author is hot"""
+        author = await users_collection.find_one({"_id": ObjectId(author_id)}, {"followers": 1})
+        if not author or author.get("followers", 0) >= HOT_AUTHOR_FOLLOWERS:
+            return 0
+
+        entry = {"postId": ObjectId(post_id), "authorId": ObjectId(author_id), "createdAt": created_at}
+        pushed = 0
+        last_id = None
+        while True:
+            query = {"followeeId": ObjectId(author_id)}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            edges = await follows_collection.find(query, {"followerId": 1}).sort(
+                "_id", ASCENDING
+            ).limit(FANOUT_BATCH_SIZE).to_list(FANOUT_BATCH_SIZE)
+            if not edges:
+                break
+            await self._push_timeline_entries([e["followerId"] for e in edges], [entry])
+            pushed += len(edges)
+            last_id = edges[-1]["_id"]
+            if len(edges) < FANOUT_BATCH_SIZE:
+                break
+        return pushed
+
+    async def _get_hot_authors(self) -> set:
+        """Ids of authors served by pull, refreshed at most every HOT_AUTHORS_TTL seconds"""
+        now = time.monotonic()
+        if now - self._hot_authors_loaded_at > HOT_AUTHORS_TTL:
+            cursor = users_collection.find({"followers": {"$gte": HOT_AUTHOR_FOLLOWERS}}, {"_id": 1})
+            self._hot_authors = {u["_id"] async for u in cursor}
+            self._hot_authors_loaded_at = now
+        return self._hot_authors
+
+    async def get_home_timeline(
+        self,
+        user_id: str,
+        limit: int = 10,
+        before: Optional[Tuple[datetime, Optional[ObjectId]]] = None
+    ) -> tuple:
+        """
+        Get a user's home timeline merging pushed entries with pulled hot
+        authors. `before` is the (createdAt, postId) of the last entry
+        already seen; a postId of None pages by time alone. Returns
+        (posts, has_more, last) where last is the cursor for the next page.
+        """
+        entries_expr: Any = "$entries"
+        if before is not None:
+            # Only the requested page leaves the server, not the whole timeline
+            created_at, last_id = before
+            older: Dict[str, Any] = {"$lt": ["$$entry.createdAt", created_at]}
+            if last_id is not None:
+                older = {"$or": [older, {"$and": [
+                    {"$eq": ["$$entry.createdAt", created_at]},
+                    {"$lt": ["$$entry.postId", last_id]},
+                ]}]}
+            entries_expr = {"$filter": {"input": entries_expr, "as": "entry", "cond": older}}
+        timeline = await timelines_collection.aggregate([
+            {"$match": {"_id": ObjectId(user_id)}},
+            {"$project": {"_id": 0, "entries": {"$slice": [{"$ifNull": [entries_expr, []]}, limit + 1]}}},
+        ], **query_options()).to_list(1)
+        entries = timeline[0]["entries"] if timeline else []
+
+        hot_authors = await self._get_hot_authors()
+        if hot_authors:
+            edges = await follows_collection.find(
+                {"followerId": ObjectId(user_id), "followeeId": {"$in": list(hot_authors)}},
+                {"followeeId": 1},
+                max_time_ms=max_time_ms()
+            ).to_list(None)
+            if edges:
+                query: Dict[str, Any] = {"authorId": {"$in": [e["followeeId"] for e in edges]}, **LIVE_POSTS}
+                if before is not None:
+                    created_at, last_id = before
+                    if last_id is None:
+                        query["createdAt"] = {"$lt": created_at}
+                    else:
+                        query["$or"] = [
+                            {"createdAt": {"$lt": created_at}},
+                            {"createdAt": created_at, "_id": {"$lt": last_id}},
+                        ]
+                pulled = await posts_collection.find(
+                    query, {"_id": 1, "authorId": 1, "createdAt": 1}, max_time_ms=max_time_ms()
+                ).sort([("createdAt", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1).to_list(limit + 1)
+                entries += [
+                    {"postId": p["_id"], "authorId": p["authorId"], "createdAt": p["createdAt"]}
+                    for p in pulled
+                ]
+
+        # Merge both sources newest first, dropping duplicates
+        seen = set()
+        merged = []
+        for entry in sorted(entries, key=lambda e: (e["createdAt"], e["postId"]), reverse=True):
+            if entry["postId"] not in seen:
+                seen.add(entry["postId"])
+                merged.append(entry)
+        has_more = len(merged) > limit
+        merged = merged[:limit]
+        # Taken from the entries, so posts deleted since they were pushed cannot stall paging
+        last = (merged[-1]["createdAt"], merged[-1]["postId"]) if merged else None
+
+        posts = await self.get_posts_by_ids([e["postId"] for e in merged])
+        return posts, has_more, last
+
+    async def get_posts_by_ids(self, post_ids: List[ObjectId]) -> List[PostRecord]:
+        """Hydrate posts and their authors with one $in query each, keeping input order"""
+        if not post_ids:
+            return []
+        posts = await posts_collection.find(
+            {"_id": {"$in": post_ids}, "deleted": {"$ne": True}}, POST_PROJECTION, max_time_ms=max_time_ms()
+        ).to_list(len(post_ids))
+        # Older timeline entries may point at archived posts
+        missing = list(set(post_ids) - {p["_id"] for p in posts})
+        if missing:
+            archived = await posts_archive_collection.find(
+                {"_id": {"$in": missing}}, POST_PROJECTION, max_time_ms=max_time_ms()
+            ).to_list(len(missing))
+            for post in archived:
+                post["archived"] = True
+            posts += archived
+        authors = await self.get_authors(p["authorId"] for p in posts)
+        authors_by_id = {author_id: UserRecord.from_doc(author) for author_id, author in authors.items()}
+        posts_by_id = {p["_id"]: p for p in posts}
+
+        result = []
+        for post_id in post_ids:
+            post = posts_by_id.get(post_id)
+            if post is None or post["authorId"] not in authors_by_id:
+                continue
+            result.append(PostRecord.from_doc(post, authors_by_id[post["authorId"]], post.get("archived", False)))
+        return result
+
+    # Export operations
+    def export_cursor(
+        self,
+        collection: str,
+        after: Optional[ObjectId] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        category: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_deleted: bool = False
+    ):
+        """
+        Cursor over a collection in _id order for streaming exports.
+        Soft-deleted posts are left out unless include_deleted is set; every
+        post carries its deleted flag (backfilled in create_indexes), so
+        such an export tells them apart.
+        """
+        query: Dict[str, Any] = {}
+        if collection in POST_COLLECTIONS and not include_deleted:
+            query["deleted"] = {"$ne": True}
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        if since is not None or until is not None:
+            query["createdAt"] = {}
+            if since is not None:
+                query["createdAt"]["$gte"] = since
+            if until is not None:
+                query["createdAt"]["$lt"] = until
+        if category is not None:
+            query["category"] = category
 
-        return top_level_comments
+        cursor = db[collection].find(query).sort("_id", ASCENDING).batch_size(1000)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
 
 # Create database manager instance
 db_manager = DatabaseManager()
\ No newline at end of file
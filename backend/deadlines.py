@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+from pymongo.errors import ExecutionTimeout
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+# Request deadline configuration
+DEFAULT_BUDGET_MS = float(os.environ.get("DEADLINE_DEFAULT_MS", "2000"))
+# Latency budgets by path prefix; the longest matching prefix wins
+ENDPOINT_BUDGETS_MS: Dict[str, float] = {
+    "/api/posts": 1000,
+    "/api/comments": 1000,
+    "/api/feed": 1000,
+    "/api/votes": 1000,
+    "/api/users": 1000,
+    "/api/categories": 1000,
+    "/api/tags": 1000,
+    "/api/leaderboard": 1000,
+    "/api/notifications": 1000,
+    # Password hashing is deliberately slow
+    "/api/auth": 3000,
+    "/api/upload": 15000,
+    "/api/admin": 30000,
+}
+# Overrides, e.g. DEADLINE_BUDGETS="/api/posts=800,/api/comments=600"
+for _entry in filter(None, os.environ.get("DEADLINE_BUDGETS", "").split(",")):
+    _prefix, _, _ms = _entry.partition("=")
+    ENDPOINT_BUDGETS_MS[_prefix.strip()] = float(_ms)
+
+# Long-lived streams manage their own lifetime and disconnects; batch sub-requests get their own budgets
+EXEMPT_PREFIXES = ("/api/live/", "/api/admin/export/", "/api/batch")
+READ_METHODS = {"GET", "HEAD"}
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has no budget left for another query"""
+
+
+# Errors that mean a query ran out of budget, client-side or on the server
+TIMEOUT_ERRORS = (DeadlineExceeded, ExecutionTimeout)
+
+
+def budget_for(path: str) -> float:
+    best = None
+    for prefix in ENDPOINT_BUDGETS_MS:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return ENDPOINT_BUDGETS_MS[best] if best is not None else DEFAULT_BUDGET_MS
+
+
+def remaining_ms() -> Optional[float]:
+    """Milliseconds left in the current request's budget (None outside requests)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return (deadline - time.monotonic()) * 1000
+
+
+def max_time_ms(reserve: float = 0.0) -> Optional[int]:
+    """
+    maxTimeMS for the next query: what is left of the budget, minus the
+    share `reserve` kept back for a degraded fallback query.
+    """
+    remaining = remaining_ms()
+    if remaining is None:
+        return None
+    budget = int(remaining * (1 - reserve))
+    if budget <= 0:
+        raise DeadlineExceeded()
+    return budget
+
+
+def query_options(reserve: float = 0.0) -> dict:
+    """maxTimeMS as keyword options for aggregate and count_documents"""
+    budget = max_time_ms(reserve)
+    return {"maxTimeMS": budget} if budget is not None else {}
+
+
+async def deadline_exceeded_handler(request: Request, exc: Exception) -> JSONResponse:
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "Request took too long, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that gives each request its endpoint's latency budget
+    (read by the database layer as maxTimeMS) and cancels read handlers when
+    the client disconnects, so abandoned requests stop issuing queries.
+    Writes always run to completion; cancelling one halfway would leave
+    partial state (and an unfinished idempotency claim) behind.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        token = _deadline.set(time.monotonic() + budget_for(scope["path"]) / 1000)
+        if scope["method"] not in READ_METHODS:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _deadline.reset(token)
+            return
+
+        messages: asyncio.Queue = asyncio.Queue()
+
+        async def watch():
+            # Forward request messages to the app and notice a disconnect as soon as it happens
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        loop = asyncio.get_running_loop()
+        # Both tasks inherit the deadline set above
+        handler = loop.create_task(self.app(scope, messages.get, send))
+        watcher = loop.create_task(watch())
+        try:
+            await asyncio.wait({handler, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not handler.done():
+                # Client went away; nobody is left to receive a response
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
+                return
+            handler.result()
+        finally:
+            handler.cancel()
+            watcher.cancel()
+            _deadline.reset(token)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo import ASCENDING, ReturnDocument
+import cloudinary.uploader
+from database import (
+    posts_collection,
+    votes_collection,
+    comments_collection,
+    deletion_jobs_collection,
+    user_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cascade configuration
+BATCH_SIZE = int(os.environ.get("DELETION_BATCH_SIZE", "500"))
+# Pause between batches so the cascade never saturates the primary
+BATCH_DELAY = float(os.environ.get("DELETION_BATCH_DELAY", "0.05"))
+POLL_INTERVAL = float(os.environ.get("DELETION_POLL_INTERVAL", "30"))
+LEASE_SECONDS = 60
+
+STAGES = ["votes", "comments", "media", "post"]
+
+
+class DeletionCascade:
+    """
+    Background worker that finishes soft-deleted posts: removes their votes
+    and comments in bounded batches, deletes stored media and finally the
+    post document. Progress lives in deletion_jobs, and jobs are claimed with
+    a lease, so a restarted (or different) worker resumes where the last one
+    stopped.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=LEASE_SECONDS)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+            self._task = None
+
+    def notify(self):
+        """Wake the worker after a new job was queued"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                job = await self._claim_job()
+                if job is not None:
+                    await self._process(job)
+                    continue
+            except Exception:
+                logger.exception("Deletion cascade failed; retrying after poll interval")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim_job(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await deletion_jobs_collection.find_one_and_update(
+            {"$or": [
+                {"status": "pending"},
+                {"status": "running", "leaseUntil": {"$lt": now}}
+            ]},
+            {"$set": {"status": "running", "leaseUntil": now + timedelta(seconds=LEASE_SECONDS), "updatedAt": now}},
+            sort=[("createdAt", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _progress(self, job_id, stage: str, counter: Optional[str] = None, count: int = 0):
+        now = datetime.utcnow()
+        update = {"$set": {
+            "stage": stage,
+            "updatedAt": now,
+            "leaseUntil": now + timedelta(seconds=LEASE_SECONDS)
+        }}
+        if counter:
+            update["$inc"] = {f"deleted.{counter}": count}
+        await deletion_jobs_collection.update_one({"_id": job_id}, update)
+
+    async def _release(self, job_id):
+        """Hand an unfinished job back so the next start resumes its current stage"""
+        await deletion_jobs_collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "pending", "updatedAt": datetime.utcnow()}, "$unset": {"leaseUntil": ""}}
+        )
+
+    async def _delete_in_batches(self, job_id, collection, query: dict, counter: str, on_batch=None):
+        while not self._stopping:
+            ids = await collection.find(query, {"_id": 1, "userId": 1}).limit(BATCH_SIZE).to_list(BATCH_SIZE)
+            if not ids:
+                return True
+            result = await collection.delete_many({"_id": {"$in": [d["_id"] for d in ids]}})
+            if on_batch is not None:
+                await on_batch(ids)
+            await self._progress(job_id, counter, counter, result.deleted_count)
+            await asyncio.sleep(BATCH_DELAY)
+        return False
+
+    @staticmethod
+    async def _uncount_comments(comments: list):
+        per_user = {}
+        for comment in comments:
+            per_user[comment["userId"]] = per_user.get(comment["userId"], 0) + 1
+        for user_id, count in per_user.items():
+            await user_stats.add(user_id, commentCount=-count)
+
+    async def _delete_media(self, job_id, post: Optional[dict]):
+        public_id = post.get("mediaPublicId") if post else None
+        if public_id and cloudinary.config().api_key:
+            await asyncio.to_thread(cloudinary.uploader.destroy, public_id, invalidate=True)
+            await self._progress(job_id, "media", "media", 1)
+
+    async def _process(self, job: dict):
+        post_id = job["_id"]
+        stage_index = STAGES.index(job.get("stage", "votes"))
+        logger.info("Deleting post %s from stage %s", post_id, STAGES[stage_index])
+
+        for stage in STAGES[stage_index:]:
+            if self._stopping:
+                await self._release(post_id)
+                return
+            await self._progress(post_id, stage)
+            if stage == "votes":
+                if not await self._delete_in_batches(post_id, votes_collection, {"postId": post_id}, "votes"):
+                    await self._release(post_id)
+                    return
+            elif stage == "comments":
+                if not await self._delete_in_batches(
+                    post_id, comments_collection, {"postId": post_id}, "comments", self._uncount_comments
+                ):
+                    await self._release(post_id)
+                    return
+            elif stage == "media":
+                post = await posts_collection.find_one({"_id": post_id}, {"mediaPublicId": 1})
+                await self._delete_media(post_id, post)
+            elif stage == "post":
+                # Timeline entries are left alone; hydration skips missing posts
+                await posts_collection.delete_one({"_id": post_id, "deleted": True})
+
+        await deletion_jobs_collection.update_one(
+            {"_id": post_id},
+            {"$set": {"status": "done", "finishedAt": datetime.utcnow()}, "$unset": {"leaseUntil": ""}}
+        )
+        logger.info("Deleted post %s", post_id)
+
+
+# Create cascade worker instance
+deletion_cascade = DeletionCascade()
@@ -0,0 +1,102 @@
+from typing import Dict, Iterable, Optional, Set
+
+# Embedded authors never carry credentials, email or bio
+AUTHOR_PROJECTION = {
+    "username": 1,
+    "avatar": 1,
+    "followers": 1,
+    "following": 1,
+    "upvotesReceived": 1,
+    "karma": 1,
+    "postCount": 1,
+    "commentCount": 1,
+    "joinDate": 1,
+    "isActive": 1,
+}
+# Compact author shape used by sparse fieldsets
+COMPACT_AUTHOR_PROJECTION = {"username": 1, "avatar": 1}
+
+POST_FIELDS = {
+    "id", "title", "mediaType", "mediaUrl", "category", "tags", "author", "upvotes",
+    "downvotes", "score", "commentCount", "views", "nsfw", "createdAt", "repostOf",
+}
+COMMENT_FIELDS = {
+    "id", "postId", "user", "text", "parentId", "upvotes", "downvotes", "score", "replies", "createdAt",
+}
+FIELD_PRESETS = {
+    "posts": {
+        "card": {"id", "title", "mediaType", "mediaUrl", "category", "author", "score", "commentCount", "nsfw", "createdAt"},
+    },
+    "comments": {
+        "card": {"id", "user", "text", "score", "replies", "createdAt"},
+    },
+}
+ALLOWED_FIELDS = {"posts": POST_FIELDS, "comments": COMMENT_FIELDS}
+
+# Stored fields backing the post response (plus what conditional GETs need)
+POST_PROJECTION = {
+    **{field: 1 for field in POST_FIELDS - {"id", "author"}},
+    "authorId": 1,
+    "version": 1,
+    "updatedAt": 1,
+}
+COMMENT_PROJECTION = {field: 1 for field in COMMENT_FIELDS - {"id", "user", "replies"}} | {"userId": 1}
+
+
+def parse_fields(raw: Optional[str], kind: str) -> Optional[Set[str]]:
+    """Parse a fields= query value; raises ValueError for unknown fields"""
+    if not raw:
+        return None
+    fields = set()
+    for name in (part.strip() for part in raw.split(",")):
+        if not name:
+            continue
+        if name in FIELD_PRESETS[kind]:
+            fields |= FIELD_PRESETS[kind][name]
+        elif name in ALLOWED_FIELDS[kind]:
+            fields.add(name)
+        else:
+            raise ValueError(f"Unknown field '{name}'")
+    # The id is always returned so clients can key the results
+    fields.add("id")
+    return fields
+
+
+def projection_for(fields: Iterable[str], required: Iterable[str] = ()) -> Dict[str, int]:
+    """Mongo projection for a sparse fieldset (id/author/user/replies are derived)"""
+    derived = {"id", "author", "user", "replies"}
+    projection = {field: 1 for field in fields if field not in derived}
+    projection.update({field: 1 for field in required})
+    return projection
+
+
+def compact_author(author) -> Optional[dict]:
+    """The sparse-fieldset author: its id plus COMPACT_AUTHOR_PROJECTION"""
+    if author is None:
+        return None
+    return {"id": author["id"], **{field: author.get(field) for field in COMPACT_AUTHOR_PROJECTION}}
+
+
+def shape(doc: dict, fields: Optional[Set[str]]) -> dict:
+    """
+    Keep only the requested fields of a serialized document or record.
+    Embedded authors are trimmed to the compact shape, whichever path
+    loaded them.
+    """
+    if fields is None:
+        return doc
+    shaped = {key: value for key, value in doc.items() if key in fields}
+    for key in ("author", "user"):
+        if key in shaped:
+            shaped[key] = compact_author(shaped[key])
+    return shaped
+
+
+def shape_thread(comment: dict, fields: Optional[Set[str]]) -> dict:
+    """Shape a comment and, if requested, its nested replies"""
+    if fields is None:
+        return comment
+    shaped = shape(comment, fields)
+    if "replies" in fields:
+        shaped["replies"] = [shape_thread(reply, fields) for reply in comment.get("replies", [])]
+    return shaped
@@ -0,0 +1,91 @@
+from itertools import combinations
+from typing import Dict, Hashable, List, Set, Tuple
+
+
+class MultiIndexHashTable:
+    """
+    Hamming-distance index over fixed-width integer hashes (multi-index
+    hashing). Each hash is split into `chunks` substrings with one dict per
+    substring. Two hashes within distance d must agree to within d // chunks
+    bits on at least one substring (pigeonhole), so a lookup only probes the
+    buckets near each of the query's substrings and verifies those
+    candidates, instead of scanning every stored hash.
+    """
+
+    __slots__ = ("bits", "chunks", "chunk_bits", "mask", "tables", "items", "hash_of", "_probes")
+
+    def __init__(self, bits: int = 64, chunks: int = 4):
+        if bits % chunks:
+            raise ValueError("bits must be divisible by chunks")
+        self.bits = bits
+        self.chunks = chunks
+        self.chunk_bits = bits // chunks
+        self.mask = (1 << self.chunk_bits) - 1
+        self.tables: List[Dict[int, Set[int]]] = [{} for _ in range(chunks)]
+        # Several items (posts) may share one hash
+        self.items: Dict[int, Set[Hashable]] = {}
+        self.hash_of: Dict[Hashable, int] = {}
+        self._probes: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.hash_of)
+
+    def _substrings(self, value: int):
+        for i in range(self.chunks):
+            yield i, (value >> (i * self.chunk_bits)) & self.mask
+
+    def _probe_masks(self, radius: int) -> List[int]:
+        """XOR masks reaching every substring within radius bits"""
+        if radius not in self._probes:
+            masks = [0]
+            for r in range(1, radius + 1):
+                for positions in combinations(range(self.chunk_bits), r):
+                    mask = 0
+                    for position in positions:
+                        mask |= 1 << position
+                    masks.append(mask)
+            self._probes[radius] = masks
+        return self._probes[radius]
+
+    def add(self, item: Hashable, value: int):
+        if item in self.hash_of:
+            self.discard(item)
+        self.hash_of[item] = value
+        if value not in self.items:
+            self.items[value] = set()
+            for i, sub in self._substrings(value):
+                self.tables[i].setdefault(sub, set()).add(value)
+        self.items[value].add(item)
+
+    def discard(self, item: Hashable):
+        value = self.hash_of.pop(item, None)
+        if value is None:
+            return
+        owners = self.items[value]
+        owners.discard(item)
+        if owners:
+            return
+        del self.items[value]
+        for i, sub in self._substrings(value):
+            bucket = self.tables[i][sub]
+            bucket.discard(value)
+            if not bucket:
+                del self.tables[i][sub]
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[Hashable, int]]:
+        """Items whose hash is within max_distance bits, closest first"""
+        masks = self._probe_masks(max_distance // self.chunks)
+        candidates: Set[int] = set()
+        for i, sub in self._substrings(value):
+            table = self.tables[i]
+            for mask in masks:
+                bucket = table.get(sub ^ mask)
+                if bucket:
+                    candidates |= bucket
+        matches = []
+        for candidate in candidates:
+            distance = (candidate ^ value).bit_count()
+            if distance <= max_distance:
+                matches.extend((item, distance) for item in self.items[candidate])
+        matches.sort(key=lambda match: match[1])
+        return matches
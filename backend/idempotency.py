@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from pymongo.errors import DuplicateKeyError
+from auth import scope_user
+from database import idempotency_keys_collection
+from ttlcache import TTLCache
+
+# Idempotency configuration
+IDEMPOTENT_PATHS = {"/api/posts", "/api/comments", "/api/votes"}
+# An in-progress claim not renewed for this long is assumed to belong to a dead worker
+LOCK_SECONDS = float(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "30"))
+# The worker running the handler extends its claim this often, however long the handler takes
+RENEW_INTERVAL = LOCK_SECONDS / 3
+# How long a duplicate waits for the first execution on another worker
+WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "10"))
+POLL_INTERVAL = 0.1
+CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.environ.get("IDEMPOTENCY_CACHE_TTL", "300"))
+MAX_KEY_LENGTH = 255
+
+STORED_HEADERS = {b"content-type", b"etag", b"last-modified", b"cache-control"}
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware for Idempotency-Key on POST endpoints. The first request
+    with a key claims it in idempotency_keys and runs the handler. The
+    response is then stored and replayed to every retry with the same key.
+    Duplicates arriving while the first is running wait for it: in-process
+    ones on a future, ones on other workers by polling the claim. Retries
+    with the same key but a different body are rejected. Server errors are
+    not stored, so the client can retry them for real.
+
+    Keys are scoped to the authenticated user; requests without a valid
+    token go straight to the handler, which rejects them. The claim is
+    renewed while the handler runs, so a slow write is never taken over
+    and executed a second time by another worker.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.cache = TTLCache(CACHE_SIZE, CACHE_TTL)
+        self.in_flight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in IDEMPOTENT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(b"idempotency-key")
+        user_id = scope_user(scope) if key is not None else None
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, "Idempotency-Key must be 1-255 characters")
+            return
+
+        # The body is needed for the fingerprint, so buffer it and replay it to the app
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        body = bytes(body)
+
+        # Keys are scoped to the user and endpoint so clients cannot collide, whichever token they use
+        record_id = hashlib.sha256(b"\0".join([user_id.encode(), scope["path"].encode(), key])).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        record = await self._find_completed(record_id)
+        if record is None:
+            record = await self._execute(record_id, fingerprint, scope, body, send)
+            if record is None:
+                # This request ran the handler and already answered
+                return
+        if record["fingerprint"] != fingerprint:
+            await self._send_error(send, 422, "Idempotency-Key was already used for a different request")
+            return
+        await self._replay(send, record)
+
+    async def _find_completed(self, record_id: str) -> Optional[dict]:
+        record = self.cache.get(record_id)
+        if record is not None:
+            return record
+        future = self.in_flight.get(record_id)
+        if future is not None:
+            # Waiting must not cancel the owner's future if this request goes away
+            await asyncio.wait({future})
+            if not future.cancelled():
+                return future.result()
+        return None
+
+    async def _execute(self, record_id: str, fingerprint: str, scope, body: bytes, send) -> Optional[dict]:
+        """Run the handler if this request wins the claim, else return the winner's record"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.in_flight[record_id] = future
+        owner = uuid.uuid4().hex
+        try:
+            claimed = await self._claim(record_id, fingerprint, owner)
+            if not claimed:
+                record = await self._wait_for_record(record_id, fingerprint)
+                future.set_result(record)
+                return record
+
+            response = {"status": 500, "headers": [], "body": bytearray()}
+
+            async def capture(message):
+                if message["type"] == "http.response.start":
+                    response["status"] = message["status"]
+                    response["headers"] = [
+                        (name, value) for name, value in message.get("headers", []) if name in STORED_HEADERS
+                    ]
+                elif message["type"] == "http.response.body":
+                    response["body"] += message.get("body", b"")
+                await send(message)
+
+            sent = False
+            async def replay_body():
+                nonlocal sent
+                if not sent:
+                    sent = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                return {"type": "http.disconnect"}
+
+            renewer = loop.create_task(self._renew(record_id, owner))
+            try:
+                await self.app(scope, replay_body, capture)
+            finally:
+                renewer.cancel()
+                record = await self._finish(record_id, fingerprint, owner, response)
+            future.set_result(record)
+            return None
+        except BaseException:
+            # Waiters then run the request themselves
+            future.cancel()
+            raise
+        finally:
+            self.in_flight.pop(record_id, None)
+
+    async def _claim(self, record_id: str, fingerprint: str, owner: str) -> bool:
+        now = datetime.utcnow()
+        try:
+            await idempotency_keys_collection.insert_one({
+                "_id": record_id,
+                "status": "in_progress",
+                "owner": owner,
+                "fingerprint": fingerprint,
+                "createdAt": now,
+                "lockedUntil": now + timedelta(seconds=LOCK_SECONDS),
+            })
+            return True
+        except DuplicateKeyError:
+            pass
+        # Take over a claim whose worker died before finishing
+        stale = await idempotency_keys_collection.find_one_and_update(
+            {"_id": record_id, "status": "in_progress", "lockedUntil": {"$lt": now}},
+            {"$set": {
+                "owner": owner,
+                "fingerprint": fingerprint,
+                "lockedUntil": now + timedelta(seconds=LOCK_SECONDS),
+            }}
+        )
+        return stale is not None
+
+    async def _renew(self, record_id: str, owner: str):
+        """Keep extending this worker's claim until the handler finishes"""
+        while True:
+            await asyncio.sleep(RENEW_INTERVAL)
+            try:
+                await idempotency_keys_collection.update_one(
+                    {"_id": record_id, "status": "in_progress", "owner": owner},
+                    {"$set": {"lockedUntil": datetime.utcnow() + timedelta(seconds=LOCK_SECONDS)}}
+                )
+            except Exception:
+                # The next renewal may still land before the lock runs out
+                logger.warning("Failed to renew the idempotency claim %s", record_id, exc_info=True)
+
+    async def _wait_for_record(self, record_id: str, fingerprint: str) -> dict:
+        """Poll a claim held by another worker until it completes"""
+        deadline = asyncio.get_running_loop().time() + WAIT_SECONDS
+        while True:
+            doc = await idempotency_keys_collection.find_one({"_id": record_id})
+            if doc is not None and doc["status"] == "completed":
+                record = self._to_record(doc)
+                self.cache.set(record_id, record)
+                return record
+            mismatch = doc is not None and doc["fingerprint"] != fingerprint
+            # A different body is rejected straight away by the fingerprint check
+            if mismatch or doc is None or asyncio.get_running_loop().time() > deadline:
+                return {
+                    "fingerprint": doc["fingerprint"] if mismatch else fingerprint,
+                    "status": 409,
+                    "headers": [(b"content-type", b"application/json"), (b"retry-after", b"1")],
+                    "body": json.dumps({"detail": "A request with this Idempotency-Key is still in progress"}).encode(),
+                    "transient": True,
+                }
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _finish(self, record_id: str, fingerprint: str, owner: str, response: dict) -> dict:
+        record = {
+            "fingerprint": fingerprint,
+            "status": response["status"],
+            "headers": response["headers"],
+            "body": bytes(response["body"]),
+        }
+        if response["status"] >= 500:
+            # Let the client retry for real
+            await idempotency_keys_collection.delete_one({"_id": record_id, "status": "in_progress", "owner": owner})
+            record["transient"] = True
+            return record
+        await idempotency_keys_collection.update_one(
+            {"_id": record_id, "owner": owner},
+            {"$set": {
+                "status": "completed",
+                "response": {
+                    "status": record["status"],
+                    "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in record["headers"]],
+                    "body": record["body"],
+                },
+            }}
+        )
+        self.cache.set(record_id, record)
+        return record
+
+    @staticmethod
+    def _to_record(doc: dict) -> dict:
+        response = doc["response"]
+        return {
+            "fingerprint": doc["fingerprint"],
+            "status": response["status"],
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response["headers"]],
+            "body": bytes(response["body"]),
+        }
+
+    @staticmethod
+    async def _replay(send, record: dict):
+        headers = [(name, value) for name, value in record["headers"] if name != b"content-length"]
+        headers.append((b"content-length", str(len(record["body"])).encode("latin-1")))
+        if not record.get("transient"):
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": record["body"]})
+
+    @classmethod
+    async def _send_error(cls, send, status_code: int, detail: str):
+        await cls._replay(send, {
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json")],
+            "body": json.dumps({"detail": detail}).encode(),
+            "transient": True,
+        })
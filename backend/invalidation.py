@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from pymongo.errors import OperationFailure
+from database import (
+    users_collection,
+    posts_collection,
+    comments_collection,
+    seen_posts_collection,
+    change_stream_tokens_collection,
+    db_manager,
+    PROFILE_FIELDS,
+)
+from realtime import hub
+from reposts import repost_index
+from seen import seen_posts
+from usernames import username_registry
+from tasks import task_runner
+
+logger = logging.getLogger(__name__)
+
+# Several workers share the database: keep their in-process caches in sync through change streams
+MULTI_WORKER = os.environ.get("MULTI_WORKER", "false").lower() == "true"
+# How often each stream's position is stored, and how long an idle stream waits for events
+TOKEN_SAVE_INTERVAL = float(os.environ.get("CHANGE_STREAM_TOKEN_SAVE_INTERVAL", "5"))
+MAX_AWAIT_MS = 1000
+RETRY_DELAY = 5.0
+# ChangeStreamFatalError, ChangeStreamHistoryLost: the stored position cannot be resumed from
+RESUME_FAILED = {280, 286}
+SCORE_FIELDS = ("upvotes", "downvotes", "score")
+
+
+def updated_fields(*names: str) -> dict:
+    """$match for document events other than updates, or updates that set one of names"""
+    return {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete", "invalidate"]}},
+        *({f"updateDescription.updatedFields.{name}": {"$exists": True}} for name in names),
+    ]}}
+
+
+# Filtered and trimmed on the server, so view counters and the like never reach the workers
+PIPELINES = {
+    "posts": [
+        updated_fields("deleted", *SCORE_FIELDS),
+        {"$project": {
+            "operationType": 1, "documentKey": 1, "updateDescription.updatedFields": 1,
+            "fullDocument.mediaHash": 1, "fullDocument.deleted": 1,
+        }},
+    ],
+    # Counters (karma, followers, ...) change on every vote; cached authors pick them up on expiry
+    "users": [
+        updated_fields(*PROFILE_FIELDS),
+        {"$project": {"operationType": 1, "documentKey": 1, "fullDocument.username": 1}},
+    ],
+    "comments": [
+        {"$match": {"operationType": {"$in": ["insert", "delete", "invalidate"]}}},
+        {"$project": {
+            "operationType": 1, "documentKey": 1, "fullDocument.postId": 1, "fullDocument.userId": 1,
+            "fullDocument.text": 1, "fullDocument.parentId": 1, "fullDocument.createdAt": 1,
+        }},
+    ],
+    "seen_posts": [
+        {"$match": {"operationType": {"$in": ["insert", "replace", "update", "invalidate"]}}},
+        {"$project": {
+            "operationType": 1, "documentKey": 1,
+            "fullDocument.current": 1, "fullDocument.previous": 1,
+            "updateDescription.updatedFields.current": 1, "updateDescription.updatedFields.previous": 1,
+        }},
+    ],
+}
+COLLECTIONS = {
+    "posts": posts_collection,
+    "users": users_collection,
+    "comments": comments_collection,
+    "seen_posts": seen_posts_collection,
+}
+
+
+class CacheInvalidator:
+    """
+    Keeps a worker's in-process state in step with writes made by other
+    workers. One change stream per collection (posts, users, comments,
+    seen_posts; change streams need a replica set, a single node is
+    enough) drops stale post states, authors and comment ids, feeds new
+    posts and usernames to the repost index and the username filter,
+    merges seen-post filters stored by other workers into cached ones, and
+    relays score changes and new comments to this worker's live
+    subscribers.
+
+    Each stream's resume token is stored every TOKEN_SAVE_INTERVAL seconds
+    and on shutdown. A restarted worker resumes from it, so writes made
+    while it was down or rebuilding its indexes are replayed rather than
+    missed; only when that position has left the oplog does it start from
+    the current one and clear its caches.
+    """
+
+    def __init__(self, enabled: bool = MULTI_WORKER, save_interval: float = TOKEN_SAVE_INTERVAL):
+        self.enabled = enabled
+        self.save_interval = save_interval
+        self.tokens: Dict[str, Optional[dict]] = {}
+        self._saved: Dict[str, Optional[dict]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.events = 0
+        self.resets = 0
+
+    def start(self):
+        if self.enabled and not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._run(stream)) for stream in COLLECTIONS]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for stream in list(self.tokens):
+            try:
+                await self._save(stream)
+            except Exception:
+                logger.exception("Failed to store the %s change stream position", stream)
+
+    async def _run(self, stream: str):
+        while stream not in self.tokens:
+            try:
+                stored = await change_stream_tokens_collection.find_one({"_id": stream})
+                self.tokens[stream] = self._saved[stream] = stored["token"] if stored else None
+            except Exception:
+                logger.exception("Failed to load the %s change stream position", stream)
+                await asyncio.sleep(RETRY_DELAY)
+        while True:
+            try:
+                await self._watch(stream)
+            except OperationFailure as e:
+                if e.code not in RESUME_FAILED:
+                    logger.exception("Change stream on %s failed", stream)
+                else:
+                    logger.warning("Cannot resume the %s change stream (%s); starting over", stream, e)
+                    self.tokens[stream] = None
+                    await self._reset(stream)
+            except Exception:
+                logger.exception("Change stream on %s failed", stream)
+            await asyncio.sleep(RETRY_DELAY)
+
+    async def _watch(self, stream: str):
+        handle = getattr(self, f"_{stream}_changed")
+        saved_at = time.monotonic()
+        # While the worker runs it resumes from its own position, never another worker's
+        async with COLLECTIONS[stream].watch(
+            PIPELINES[stream], resume_after=self.tokens[stream], max_await_time_ms=MAX_AWAIT_MS
+        ) as changes:
+            while changes.alive:
+                change = await changes.try_next()
+                if change is not None:
+                    self.events += 1
+                    if change["operationType"] == "invalidate":
+                        # Collection dropped or renamed; a new stream has to start from now
+                        self.tokens[stream] = None
+                        await self._reset(stream)
+                        return
+                    try:
+                        await handle(change)
+                    except Exception:
+                        logger.exception("Failed to apply a %s change", stream)
+                # Advances on idle batches too, so a quiet collection still moves forward
+                self.tokens[stream] = changes.resume_token
+                if time.monotonic() - saved_at >= self.save_interval:
+                    await self._save(stream)
+                    saved_at = time.monotonic()
+
+    async def _save(self, stream: str):
+        token = self.tokens.get(stream)
+        if token is None or token == self._saved.get(stream):
+            return
+        await change_stream_tokens_collection.update_one(
+            {"_id": stream}, {"$set": {"token": token, "updatedAt": datetime.utcnow()}}, upsert=True
+        )
+        self._saved[stream] = token
+
+    async def _reset(self, stream: str):
+        """Forget everything a missed change could have made stale"""
+        self.resets += 1
+        db_manager.clear_caches()
+        if stream == "posts":
+            await task_runner.enqueue("repost_index_rebuild", repost_index.rebuild, key="repost_index")
+        elif stream == "users":
+            await task_runner.enqueue("username_filter_rebuild", username_registry.rebuild, key="username_filter")
+        elif stream == "seen_posts":
+            seen_posts.forget_clean()
+
+    async def _posts_changed(self, change: dict):
+        post_id = str(change["documentKey"]["_id"])
+        operation = change["operationType"]
+        if operation != "update":
+            # Inserted, restored from the archive, archived or purged
+            db_manager.forget_post(post_id)
+            post = change.get("fullDocument") or {}
+            if operation == "insert" and post.get("mediaHash") and not post.get("deleted"):
+                repost_index.add(post_id, post["mediaHash"])
+            return
+
+        fields = change["updateDescription"]["updatedFields"]
+        if fields.get("deleted"):
+            db_manager.forget_post(post_id)
+            repost_index.discard(post_id)
+        if post_id in hub.subscribers and any(field in fields for field in SCORE_FIELDS):
+            # Unchanged counters are left out of the update description
+            if not all(field in fields for field in SCORE_FIELDS):
+                fields = await posts_collection.find_one(
+                    {"_id": change["documentKey"]["_id"]}, dict.fromkeys(SCORE_FIELDS, 1)
+                )
+                if fields is None:
+                    return
+            # The writing worker published the same values; subscribers just see them again
+            hub.publish_score(post_id, fields.get("upvotes", 0), fields.get("downvotes", 0), fields.get("score", 0))
+
+    async def _users_changed(self, change: dict):
+        user_id = change["documentKey"]["_id"]
+        if change["operationType"] == "insert":
+            username_registry.add(change["fullDocument"]["username"])
+        else:
+            db_manager.forget_author(user_id)
+
+    async def _comments_changed(self, change: dict):
+        comment_id = change["documentKey"]["_id"]
+        if change["operationType"] == "delete":
+            db_manager.forget_comment(comment_id)
+            return
+        comment = change["fullDocument"]
+        # Comments created here are already known and were published by create_comment
+        if not db_manager.remember_comment(comment_id):
+            return
+        post_id = str(comment["postId"])
+        if post_id in hub.subscribers:
+            user = await db_manager.get_author(comment["userId"])
+            if user is not None:
+                comment = db_manager.serialize_comment({"_id": comment_id, **comment})
+                comment["user"] = user
+                hub.publish_comment(post_id, comment)
+
+    async def _seen_posts_changed(self, change: dict):
+        user_id = str(change["documentKey"]["_id"])
+        if change["operationType"] == "update":
+            doc = change["updateDescription"]["updatedFields"]
+        else:
+            doc = change.get("fullDocument") or {}
+        seen_posts.merge_stored(user_id, doc)
+
+
+# Create invalidator instance
+cache_invalidator = CacheInvalidator()
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent / '.env')
+
+import numpy as np
+from bson import ObjectId
+from database import (
+    users_collection,
+    posts_collection,
+    votes_collection,
+    posts_archive_collection,
+    leaderboards_collection,
+    db_manager,
+)
+from fieldsets import COMPACT_AUTHOR_PROJECTION
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard configuration
+LEADERBOARD_INTERVAL = float(os.environ.get("LEADERBOARD_INTERVAL", str(60 * 60)))
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", "100"))
+LEADERBOARD_CHUNK_SIZE = int(os.environ.get("LEADERBOARD_CHUNK_SIZE", "10000"))
+# Windowed post boards rank by net votes cast in the window
+PERIODS = {"day": timedelta(days=1), "week": timedelta(days=7)}
+
+# Column name -> (dtype, extractor); ObjectIds become 12-byte strings, which sort like the ids
+POST_COLUMNS: Dict[str, Tuple[object, Callable[[dict], object]]] = {
+    "id": ("S12", lambda p: p["_id"].binary),
+    "author": ("S12", lambda p: p["authorId"].binary),
+    "category": (object, lambda p: p.get("category") or ""),
+    "score": ("int64", lambda p: p.get("score", 0)),
+    "votes": ("int64", lambda p: p.get("upvotes", 0) + p.get("downvotes", 0)),
+    "comments": ("int64", lambda p: p.get("commentCount", 0)),
+    "views": ("int64", lambda p: p.get("views", 0)),
+}
+POST_FIELDS = {"authorId": 1, "category": 1, "score": 1, "upvotes": 1, "downvotes": 1, "commentCount": 1, "views": 1}
+VOTE_COLUMNS: Dict[str, Tuple[object, Callable[[dict], object]]] = {
+    "post": ("S12", lambda v: v["postId"].binary),
+    "value": ("int64", lambda v: 1 if v["voteType"] == "up" else -1),
+    "createdAt": ("datetime64[ms]", lambda v: v["createdAt"]),
+}
+VOTE_FIELDS = {"_id": 0, "postId": 1, "voteType": 1, "createdAt": 1}
+
+
+async def stream_columns(cursor, columns: dict, chunk_size: int = LEADERBOARD_CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Drain a cursor into one NumPy array per column, converting a chunk of
+    documents at a time so at most chunk_size documents are alive at once.
+    """
+    parts: Dict[str, list] = {name: [] for name in columns}
+    while True:
+        docs = await cursor.to_list(chunk_size)
+        if not docs:
+            break
+        for name, (dtype, extract) in columns.items():
+            parts[name].append(np.array([extract(doc) for doc in docs], dtype=dtype))
+    return {
+        name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+        for name, (dtype, _) in columns.items()
+    }
+
+
+def to_object_id(value: bytes) -> ObjectId:
+    # Fixed-width byte strings drop trailing NULs
+    return ObjectId(bytes(value).ljust(12, b"\0"))
+
+
+def concat_columns(*tables: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {name: np.concatenate([table[name] for table in tables]) for name in tables[0]}
+
+
+def top_indices(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest positive values, largest first"""
+    candidates = np.flatnonzero(values > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-values[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+def compute_boards(posts: Dict[str, np.ndarray], votes: Dict[str, np.ndarray], now: datetime, size: int) -> dict:
+    """
+    Every board from the columnar posts and recent votes, with vectorized
+    group-bys (bincount over factorized keys). Ids are left as 12-byte
+    strings; hydration happens afterwards for the few rows that made it.
+    """
+    boards = {}
+
+    # Join votes to posts by binary search over the sorted post ids
+    order = np.argsort(posts["id"], kind="stable")
+    sorted_ids = posts["id"][order]
+    position = np.searchsorted(sorted_ids, votes["post"])
+    known = position < len(sorted_ids)
+    known[known] = sorted_ids[position[known]] == votes["post"][known]
+    vote_post = order[position[known]]
+    vote_value = votes["value"][known]
+    vote_time = votes["createdAt"][known]
+    for period, span in PERIODS.items():
+        recent = vote_time >= np.datetime64(now - span, "ms")
+        net = np.bincount(vote_post[recent], weights=vote_value[recent], minlength=len(sorted_ids))
+        boards[f"posts:{period}"] = [(posts["id"][i], int(net[i])) for i in top_indices(net, size)]
+    boards["posts:all"] = [(posts["id"][i], int(posts["score"][i])) for i in top_indices(posts["score"], size)]
+
+    # Karma counts archived posts too, like the author stats on user documents
+    authors, author_codes = np.unique(posts["author"], return_inverse=True)
+    karma = np.bincount(author_codes, weights=posts["score"], minlength=len(authors))
+    post_counts = np.bincount(author_codes, minlength=len(authors))
+    boards["creators"] = [
+        (authors[i], int(karma[i]), int(post_counts[i])) for i in top_indices(karma, size)
+    ]
+
+    categories, category_codes = np.unique(posts["category"], return_inverse=True)
+    stats = {
+        name: np.bincount(category_codes, weights=posts[name], minlength=len(categories))
+        for name in ("votes", "comments", "views")
+    }
+    counts = np.bincount(category_codes, minlength=len(categories))
+    rates = (stats["votes"] + stats["comments"]) / np.maximum(stats["views"], 1)
+    boards["categories"] = [
+        {
+            "category": str(categories[i]),
+            "posts": int(counts[i]),
+            "views": int(stats["views"][i]),
+            "votes": int(stats["votes"][i]),
+            "comments": int(stats["comments"][i]),
+            "engagementRate": round(float(rates[i]), 4),
+        }
+        for i in np.argsort(-counts, kind="stable")
+    ]
+    return boards
+
+
+class LeaderboardJob:
+    """
+    Periodically recomputes the leaderboards from a columnar snapshot of
+    posts (hot and archived) and the last week's votes, and stores each
+    board as one small document in leaderboards so the API serves it with
+    a single read.
+    """
+
+    def __init__(self, interval: float = LEADERBOARD_INTERVAL, size: int = LEADERBOARD_SIZE):
+        self.interval = interval
+        self.size = size
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        # Pick up the schedule where the last run (on any worker) left it
+        try:
+            board = await leaderboards_collection.find_one({"_id": "posts:all"}, {"computedAt": 1})
+        except Exception:
+            logger.exception("Failed to read the last leaderboard run; recomputing now")
+            board = None
+        computed_at = board.get("computedAt") if board else None
+        if isinstance(computed_at, datetime):
+            age = (datetime.utcnow() - computed_at).total_seconds()
+            await asyncio.sleep(max(0.0, self.interval - age))
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Leaderboard run failed")
+            await asyncio.sleep(self.interval)
+
+    async def load(self, now: datetime, chunk_size: int = LEADERBOARD_CHUNK_SIZE) -> tuple:
+        """Columnar posts (hot and archived) and votes from the longest period"""
+        live = await stream_columns(
+            posts_collection.find({"deleted": {"$ne": True}}, POST_FIELDS).batch_size(chunk_size),
+            POST_COLUMNS, chunk_size
+        )
+        archived = await stream_columns(
+            posts_archive_collection.find({"deleted": {"$ne": True}}, POST_FIELDS).batch_size(chunk_size),
+            POST_COLUMNS, chunk_size
+        )
+        since = now - max(PERIODS.values())
+        votes = await stream_columns(
+            votes_collection.find({"createdAt": {"$gte": since}}, VOTE_FIELDS).batch_size(chunk_size),
+            VOTE_COLUMNS, chunk_size
+        )
+        return concat_columns(live, archived), votes
+
+    async def run_once(self, dry_run: bool = False) -> dict:
+        now = datetime.utcnow()
+        started = time.perf_counter()
+        posts, votes = await self.load(now)
+        loaded = time.perf_counter()
+        boards = compute_boards(posts, votes, now, self.size)
+        computed = time.perf_counter()
+
+        documents = {
+            board: await self._hydrate_posts(entries) for board, entries in boards.items() if board.startswith("posts:")
+        }
+        documents["creators"] = await self._hydrate_creators(boards["creators"])
+        documents["categories"] = boards["categories"]
+        if not dry_run:
+            for board, entries in documents.items():
+                await leaderboards_collection.replace_one(
+                    {"_id": board}, {"entries": entries, "computedAt": now}, upsert=True
+                )
+
+        report = {
+            "posts": len(posts["id"]),
+            "votes": len(votes["post"]),
+            "loadSeconds": round(loaded - started, 3),
+            "computeSeconds": round(computed - loaded, 3),
+            "totalSeconds": round(time.perf_counter() - started, 3),
+            "boards": {board: len(entries) for board, entries in documents.items()},
+        }
+        logger.info("Leaderboard run: %s", report)
+        return report
+
+    async def _hydrate_posts(self, entries: List[tuple]) -> List[dict]:
+        scores = {to_object_id(post_id): score for post_id, score in entries}
+        posts = await db_manager.get_posts_by_ids(list(scores))
+        return [
+            {
+                "id": post["id"],
+                "title": post["title"],
+                "mediaType": post["mediaType"],
+                "mediaUrl": post["mediaUrl"],
+                "category": post["category"],
+                "nsfw": post.get("nsfw", False),
+                "author": {field: post["author"].get(field) for field in ("id", "username", "avatar")},
+                "score": scores[ObjectId(post["id"])],
+                "createdAt": post["createdAt"],
+            }
+            for post in posts
+        ]
+
+    async def _hydrate_creators(self, entries: List[tuple]) -> List[dict]:
+        user_ids = [to_object_id(user_id) for user_id, _, _ in entries]
+        users = await users_collection.find({"_id": {"$in": user_ids}}, COMPACT_AUTHOR_PROJECTION).to_list(None)
+        users_by_id = {u["_id"]: u for u in users}
+        return [
+            {
+                "id": str(user_id),
+                "username": users_by_id[user_id]["username"],
+                "avatar": users_by_id[user_id].get("avatar"),
+                "karma": karma,
+                "postCount": post_count,
+            }
+            for user_id, (_, karma, post_count) in zip(user_ids, entries)
+            if user_id in users_by_id
+        ]
+
+
+# Create leaderboard job instance
+leaderboard_job = LeaderboardJob()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Recompute the leaderboards")
+    parser.add_argument("--dry-run", action="store_true", help="Compute and report without storing the boards")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(leaderboard_job.run_once(dry_run=args.dry_run)), indent=2))
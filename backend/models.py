@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 from bson import ObjectId
 import uuid
@@ -33,12 +33,16 @@ class UserLogin(BaseModel):
 class UserResponse(BaseModel):
     id: str
     username: str
-    email: str
+    # Omitted when the user is embedded in posts and comments
+    email: Optional[str] = None
     avatar: Optional[str] = None
     bio: Optional[str] = None
     followers: int = 0
     following: int = 0
     upvotesReceived: int = 0
+    karma: int = 0
+    postCount: int = 0
+    commentCount: int = 0
     joinDate: datetime
     isActive: bool = True
 
@@ -51,8 +55,10 @@ class PostCreate(BaseModel):
     title: str = Field(..., max_length=200)
     mediaType: str
     mediaUrl: str
+    # publicId returned by the upload endpoint; repost detection uses the hash stored with it
+    mediaPublicId: Optional[str] = None
     category: str
-    tags: List[str] = []
+    tags: List[str] = Field([], max_length=10)
     nsfw: bool = False
 
 class PostResponse(BaseModel):
@@ -70,11 +76,20 @@ class PostResponse(BaseModel):
     views: int
     nsfw: bool
     createdAt: datetime
+    archived: bool = False
+    # Earlier post with near-identical media, if any
+    repostOf: Optional[str] = None
 
 class PostsListResponse(BaseModel):
     posts: List[PostResponse]
     hasMore: bool
-    total: int
+    # None when counting did not fit the request's latency budget
+    total: Optional[int] = None
+
+class TimelineResponse(BaseModel):
+    posts: List[PostResponse]
+    hasMore: bool
+    nextCursor: Optional[str] = None
 
 # Vote Models
 class VoteCreate(BaseModel):
@@ -114,6 +129,119 @@ class UploadResponse(BaseModel):
     url: str
     publicId: str
     mediaType: str
+    mediaHash: Optional[str] = None
+
+# Batch Models
+class SubRequest(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest]
+
+class SubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[SubResponse]
+
+# Discovery Models
+class CategoryCount(BaseModel):
+    category: str
+    count: int
+
+class CategoryCountsResponse(BaseModel):
+    categories: List[CategoryCount]
+
+class TrendingTag(BaseModel):
+    tag: str
+    score: float
+
+class TrendingTagsResponse(BaseModel):
+    tags: List[TrendingTag]
+    windowSeconds: float
+
+# Leaderboard Models
+class LeaderboardAuthor(BaseModel):
+    id: str
+    username: str
+    avatar: Optional[str] = None
+
+class LeaderboardPost(BaseModel):
+    id: str
+    title: str
+    mediaType: str
+    mediaUrl: str
+    category: str
+    nsfw: bool = False
+    author: LeaderboardAuthor
+    # Net votes in the period, or the post score for all time
+    score: int
+    createdAt: datetime
+
+class LeaderboardCreator(BaseModel):
+    id: str
+    username: str
+    avatar: Optional[str] = None
+    karma: int
+    postCount: int
+
+class CategoryEngagement(BaseModel):
+    category: str
+    posts: int
+    views: int
+    votes: int
+    comments: int
+    engagementRate: float
+
+class PostLeaderboardResponse(BaseModel):
+    period: str
+    entries: List[LeaderboardPost]
+    computedAt: Optional[datetime] = None
+
+class CreatorLeaderboardResponse(BaseModel):
+    entries: List[LeaderboardCreator]
+    computedAt: Optional[datetime] = None
+
+class CategoryEngagementResponse(BaseModel):
+    entries: List[CategoryEngagement]
+    computedAt: Optional[datetime] = None
+
+# Notification Models
+class NotificationActor(BaseModel):
+    id: str
+    username: str
+    avatar: Optional[str] = None
+
+class NotificationResponse(BaseModel):
+    id: str
+    # "reply" or "mention"
+    type: str
+    actor: NotificationActor
+    postId: str
+    commentId: str
+    preview: str
+    read: bool
+    createdAt: datetime
+
+class NotificationsListResponse(BaseModel):
+    notifications: List[NotificationResponse]
+    hasMore: bool
+    unreadCount: int
+    nextCursor: Optional[str] = None
+
+class UnreadCountResponse(BaseModel):
+    count: int
+
+class MarkNotificationsRead(BaseModel):
+    # Omit to mark everything read
+    ids: Optional[List[str]] = Field(None, max_length=100)
 
 # Generic Response Models
 class MessageResponse(BaseModel):
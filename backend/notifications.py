@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Same charset and length as registration allows; an @ inside a word (emails) is not a mention
+MENTION_PATTERN = re.compile(r"(?<![\w@])@(\w{3,20})(?!\w)", re.ASCII)
+MAX_MENTIONS = 10
+PREVIEW_LENGTH = 140
+INSERT_BATCH_SIZE = 1000
+DUPLICATE_KEY = 11000
+# Write errors a later attempt can get past: elections, shutdowns, network trouble, timeouts
+RETRYABLE_WRITE_ERRORS = {6, 7, 50, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+
+def parse_mentions(text: str) -> List[str]:
+    """Distinct @usernames in a comment, in order of appearance, at most MAX_MENTIONS"""
+    return list(dict.fromkeys(MENTION_PATTERN.findall(text)))[:MAX_MENTIONS]
+
+
+class NotificationQueue:
+    """
+    Turns new comments into reply and mention notifications off the write
+    path and stores them in batches. Recipients are resolved in a task
+    (one parent lookup, one $in on usernames); the resulting documents are
+    buffered and written with insert_many once per interval, after which
+    each recipient's unreadNotifications counter gets one $inc for the
+    documents that were actually stored. Documents carry their _id from the
+    start, so a batch retried after an unknown outcome cannot be stored or
+    counted twice; the reconciler repairs counts such a retry missed.
+    """
+
+    def __init__(self, notifications, users, comments, interval: float = 0.0):
+        self.notifications = notifications
+        self.users = users
+        self.comments = comments
+        self.interval = interval
+        self.pending: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def comment_created(self, comment: dict):
+        """Queue notifications for the parent comment's author and everyone mentioned"""
+        recipients: Dict[ObjectId, str] = {}
+        if comment.get("parentId"):
+            parent = await self.comments.find_one({"_id": comment["parentId"]}, {"userId": 1})
+            if parent is not None:
+                recipients[parent["userId"]] = "reply"
+        usernames = parse_mentions(comment["text"])
+        if usernames:
+            async for user in self.users.find({"username": {"$in": usernames}}, {"_id": 1}):
+                # Replying to someone and mentioning them is still one notification
+                recipients.setdefault(user["_id"], "mention")
+        recipients.pop(comment["userId"], None)
+        if not recipients:
+            return
+
+        now = datetime.utcnow()
+        preview = comment["text"][:PREVIEW_LENGTH]
+        await self.add([
+            {
+                "_id": ObjectId(),
+                "userId": user_id,
+                "type": kind,
+                "actorId": comment["userId"],
+                "postId": comment["postId"],
+                "commentId": comment["_id"],
+                "preview": preview,
+                "read": False,
+                "createdAt": now,
+            }
+            for user_id, kind in recipients.items()
+        ])
+
+    async def add(self, docs: List[dict]):
+        self.pending.extend(docs)
+        if self.interval <= 0:
+            await self.flush()
+        elif self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def flush(self) -> int:
+        """Write all buffered notifications; returns the number stored"""
+        pending, self.pending = self.pending, []
+        stored = 0
+        for start in range(0, len(pending), INSERT_BATCH_SIZE):
+            batch = pending[start:start + INSERT_BATCH_SIZE]
+            try:
+                await self.notifications.insert_many(batch, ordered=False)
+                inserted = batch
+            except BulkWriteError as e:
+                failed = {error["index"]: error for error in e.details["writeErrors"]}
+                inserted = [doc for i, doc in enumerate(batch) if i not in failed]
+                for i, error in sorted(failed.items()):
+                    if error["code"] in RETRYABLE_WRITE_ERRORS:
+                        self.pending.append(batch[i])
+                    elif error["code"] != DUPLICATE_KEY:
+                        # Sending it again would fail the same way; duplicates were
+                        # stored by an earlier attempt whose outcome was lost
+                        logger.error("Dropping notification %s: %s", batch[i]["_id"], error.get("errmsg"))
+            except Exception:
+                self.pending += pending[start:]
+                raise
+            stored += len(inserted)
+            await self._count_unread(inserted)
+        if self.pending and self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return stored
+
+    async def _count_unread(self, docs: List[dict]):
+        counts = Counter(doc["userId"] for doc in docs)
+        if not counts:
+            return
+        try:
+            await self.users.bulk_write([
+                UpdateOne({"_id": user_id}, {"$inc": {"unreadNotifications": count}})
+                for user_id, count in counts.items()
+            ], ordered=False)
+        except Exception:
+            # Some $incs may have landed; repeating them could count twice, so the reconciler fixes the rest
+            logger.exception("Failed to count %d unread notifications", len(docs))
+
+    async def _run(self):
+        while self.pending:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to write notifications")
+
+    async def stop(self):
+        """Flush what is left before shutdown"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
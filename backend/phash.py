@@ -0,0 +1,39 @@
+import io
+from typing import Optional
+from PIL import Image
+
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+
+def dhash(data: bytes) -> int:
+    """
+    64-bit difference hash of an image: each bit says whether a pixel of the
+    9x8 grayscale thumbnail is brighter than its right neighbour. Survives
+    rescaling, recompression and small edits, which is what reposts go through.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Animated GIFs are hashed on their first frame
+        image.seek(0)
+        thumbnail = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = list(thumbnail.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def format_hash(value: int) -> str:
+    """Hex form stored in Mongo (64-bit unsigned values do not fit an int64)"""
+    return f"{value:0{HASH_BITS // 4}x}"
+
+
+def parse_hash(text: Optional[str]) -> Optional[int]:
+    if not text or len(text) != HASH_BITS // 4:
+        return None
+    try:
+        return int(text, 16)
+    except ValueError:
+        return None
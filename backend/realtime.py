@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Realtime configuration
+FLUSH_INTERVAL = float(os.environ.get("REALTIME_FLUSH_INTERVAL", "0.5"))
+SUBSCRIBER_BUFFER = int(os.environ.get("REALTIME_SUBSCRIBER_BUFFER", "256"))
+MAX_POSTS_PER_SUBSCRIPTION = int(os.environ.get("REALTIME_MAX_POSTS_PER_SUBSCRIPTION", "100"))
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    """
+    One client connection. Messages are appended to a bounded buffer and the
+    connection's stream wakes up on an event, so there is no per-connection
+    polling and no database access after subscribe.
+    """
+
+    __slots__ = ("post_ids", "buffer", "ready", "overflowed", "max_buffer")
+
+    def __init__(self, post_ids: Set[str], max_buffer: int = SUBSCRIBER_BUFFER):
+        self.post_ids = post_ids
+        self.buffer: Deque[str] = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self.max_buffer = max_buffer
+
+    def push(self, message: str):
+        if len(self.buffer) >= self.max_buffer:
+            # Slow consumer: drop it rather than buffering without bound,
+            # the client reconnects and resubscribes
+            self.overflowed = True
+        else:
+            self.buffer.append(message)
+        self.ready.set()
+
+    async def next_batch(self, timeout: float) -> Optional[List[str]]:
+        """Wait for buffered messages; returns None on timeout"""
+        if not self.buffer and not self.overflowed:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.ready.clear()
+        batch = list(self.buffer)
+        self.buffer.clear()
+        return batch
+
+
+class RealtimeHub:
+    """
+    In-process pub/sub for live post scores and new comments.
+
+    Score updates are coalesced per post: only the latest value seen within
+    a flush interval is delivered. A single flusher task encodes each
+    message once and fans it out to every subscriber of that post.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+        self.pending_scores: Dict[str, dict] = {}
+        self.pending_comments: Dict[str, List[dict]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+        self.published = 0
+        self.coalesced = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def connection_count(self) -> int:
+        return len({sub for subs in self.subscribers.values() for sub in subs})
+
+    def subscribe(self, post_ids: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(set(post_ids))
+        for post_id in subscriber.post_ids:
+            self.subscribers.setdefault(post_id, set()).add(subscriber)
+        self._ensure_flusher()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for post_id in subscriber.post_ids:
+            subs = self.subscribers.get(post_id)
+            if subs is None:
+                continue
+            subs.discard(subscriber)
+            if not subs:
+                del self.subscribers[post_id]
+
+    def publish_score(self, post_id: str, upvotes: int, downvotes: int, score: int):
+        """Queue a score update; later updates in the same interval replace it"""
+        if post_id not in self.subscribers:
+            return
+        self.published += 1
+        if post_id in self.pending_scores:
+            self.coalesced += 1
+        self.pending_scores[post_id] = {
+            "postId": post_id,
+            "upvotes": upvotes,
+            "downvotes": downvotes,
+            "score": score,
+            "ts": time.time(),
+        }
+
+    def publish_comment(self, post_id: str, comment: dict):
+        """Queue a new-comment event for subscribers of the post"""
+        if post_id not in self.subscribers:
+            return
+        self.published += 1
+        user = comment.get("user") or {}
+        self.pending_comments.setdefault(post_id, []).append({
+            "postId": post_id,
+            "id": comment.get("id"),
+            "text": comment.get("text"),
+            "parentId": str(comment["parentId"]) if comment.get("parentId") else None,
+            "user": {"id": user.get("id"), "username": user.get("username"), "avatar": user.get("avatar")},
+            "createdAt": comment.get("createdAt"),
+            "ts": time.time(),
+        })
+
+    def flush(self):
+        """Fan out everything queued since the last flush"""
+        started = time.perf_counter()
+        scores, self.pending_scores = self.pending_scores, {}
+        comments, self.pending_comments = self.pending_comments, {}
+
+        overflowed = set()
+        for post_id, payload in scores.items():
+            overflowed |= self._fan_out(post_id, format_sse("score", payload))
+        for post_id, items in comments.items():
+            for payload in items:
+                overflowed |= self._fan_out(post_id, format_sse("comment", payload))
+
+        for subscriber in overflowed:
+            self.unsubscribe(subscriber)
+            self.dropped_subscribers += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _fan_out(self, post_id: str, message: str) -> Set[Subscriber]:
+        overflowed = set()
+        for subscriber in self.subscribers.get(post_id, ()):
+            subscriber.push(message)
+            self.delivered += 1
+            if subscriber.overflowed:
+                overflowed.add(subscriber)
+        return overflowed
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self.subscribers:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Realtime flush failed")
+        # Nobody is listening; drop anything queued and let the task exit
+        self.pending_scores.clear()
+        self.pending_comments.clear()
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+    def snapshot(self) -> dict:
+        return {
+            "connections": self.connection_count,
+            "subscribedPosts": len(self.subscribers),
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "delivered": self.delivered,
+            "droppedSubscribers": self.dropped_subscribers,
+            "lastFlushMs": round(self.last_flush_ms, 3),
+        }
+
+
+# Create hub instance
+hub = RealtimeHub()
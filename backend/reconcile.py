@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from collections import deque
+from typing import Deque, Optional, Tuple
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent / '.env')
+
+from pymongo import ASCENDING, UpdateOne
+from database import (
+    users_collection,
+    posts_collection,
+    votes_collection,
+    comments_collection,
+    notifications_collection,
+    posts_archive_collection,
+    category_counts_collection,
+    db_manager,
+    user_stats,
+    USER_STATS_FLUSH_INTERVAL,
+)
+from user_stats import STAT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Reconciliation configuration
+RECONCILE_INTERVAL = float(os.environ.get("RECONCILE_INTERVAL", str(24 * 60 * 60)))
+RECONCILE_CHUNK_SIZE = int(os.environ.get("RECONCILE_CHUNK_SIZE", "500"))
+# Pause between chunks so a reconciliation run can share the database with live traffic
+RECONCILE_CHUNK_DELAY = float(os.environ.get("RECONCILE_CHUNK_DELAY", "0.1"))
+# Fraction of wall time a run may spend querying; the rest is spent sleeping
+RECONCILE_DUTY_CYCLE = float(os.environ.get("RECONCILE_DUTY_CYCLE", "0.25"))
+# Posts commented on this recently may still have their counter update in flight
+RECONCILE_SETTLE_SECONDS = float(os.environ.get("RECONCILE_SETTLE_SECONDS", "60"))
+# Longer than any worker's stats buffer holds deltas, so they have all landed before a fix is written
+RECONCILE_STATS_SETTLE_SECONDS = float(os.environ.get(
+    "RECONCILE_STATS_SETTLE_SECONDS", str(max(5.0, 3 * USER_STATS_FLUSH_INTERVAL))
+))
+
+POST_COUNTER_FIELDS = ("upvotes", "downvotes", "score", "commentCount")
+# Author stats plus the counter the notification writer and mark-read keep
+USER_COUNTER_FIELDS = STAT_FIELDS + ("unreadNotifications",)
+
+
+async def walk_chunks(collection, projection: dict, chunk_size: int, delay: float):
+    """Yield _id-ordered chunks of a collection, throttled to the duty cycle"""
+    last_id = None
+    while True:
+        started = time.perf_counter()
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = await collection.find(query, projection).sort("_id", ASCENDING).limit(chunk_size).to_list(chunk_size)
+        if not docs:
+            return
+        last_id = docs[-1]["_id"]
+        yield docs
+        # Work done for this chunk includes whatever the caller did with it
+        busy = time.perf_counter() - started
+        await asyncio.sleep(max(delay, busy * (1 / RECONCILE_DUTY_CYCLE - 1)))
+
+
+async def reconcile_post_counters(
+    chunk_size: int = RECONCILE_CHUNK_SIZE,
+    delay: float = RECONCILE_CHUNK_DELAY,
+    dry_run: bool = False
+) -> dict:
+    """
+    Recompute upvotes, downvotes, score and commentCount for every post from
+    the votes and comments collections. Each chunk costs two grouped
+    aggregations (one over votes, one over comments) and one bulk_write,
+    regardless of how many posts it holds. Fixes are guarded on the values
+    read, so posts changed by live writes mid-chunk are left for the next run.
+    A new comment is inserted before its post's counter is bumped, so posts
+    with a comment newer than RECONCILE_SETTLE_SECONDS are skipped too:
+    the guard would pass in that gap and the bump would count it twice.
+    """
+    report = {
+        "scanned": 0, "drifted": 0, "repaired": 0, "skipped": 0,
+        "drift": {field: 0 for field in POST_COUNTER_FIELDS},
+    }
+    projection = {field: 1 for field in POST_COUNTER_FIELDS}
+    async for posts in walk_chunks(posts_collection, projection, chunk_size, delay):
+        settled = datetime.utcnow() - timedelta(seconds=RECONCILE_SETTLE_SECONDS)
+        post_ids = [p["_id"] for p in posts]
+        vote_stats = await votes_collection.aggregate([
+            {"$match": {"postId": {"$in": post_ids}}},
+            {"$group": {
+                "_id": "$postId",
+                "upvotes": {"$sum": {"$cond": [{"$eq": ["$voteType", "up"]}, 1, 0]}},
+                "downvotes": {"$sum": {"$cond": [{"$eq": ["$voteType", "down"]}, 1, 0]}}
+            }}
+        ]).to_list(None)
+        comment_stats = await comments_collection.aggregate([
+            {"$match": {"postId": {"$in": post_ids}}},
+            {"$group": {"_id": "$postId", "commentCount": {"$sum": 1}, "latest": {"$max": "$createdAt"}}}
+        ]).to_list(None)
+        votes_by_post = {s["_id"]: s for s in vote_stats}
+        comments_by_post = {s["_id"]: s["commentCount"] for s in comment_stats}
+        unsettled = {s["_id"] for s in comment_stats if s["latest"] > settled}
+
+        fixes = []
+        now = datetime.utcnow()
+        for post in posts:
+            votes = votes_by_post.get(post["_id"], {})
+            expected = {
+                "upvotes": votes.get("upvotes", 0),
+                "downvotes": votes.get("downvotes", 0),
+                "commentCount": comments_by_post.get(post["_id"], 0),
+            }
+            expected["score"] = expected["upvotes"] - expected["downvotes"]
+            observed = {field: post.get(field) for field in POST_COUNTER_FIELDS}
+            diff = {f: expected[f] - (observed[f] or 0) for f in POST_COUNTER_FIELDS if observed[f] != expected[f]}
+            if not diff:
+                continue
+            if post["_id"] in unsettled:
+                report["skipped"] += 1
+                continue
+            report["drifted"] += 1
+            for field, delta in diff.items():
+                report["drift"][field] += abs(delta)
+            fixes.append(UpdateOne(
+                {"_id": post["_id"], **observed},
+                # Bump the version so conditional GETs see the corrected counters
+                {"$set": {**expected, "updatedAt": now}, "$inc": {"version": 1}}
+            ))
+
+        report["scanned"] += len(posts)
+        if fixes and not dry_run:
+            result = await posts_collection.bulk_write(fixes, ordered=False)
+            report["repaired"] += result.modified_count
+
+    logger.info("Post counter reconciliation: %s", report)
+    return report
+
+
+async def reconcile_user_stats(
+    chunk_size: int = RECONCILE_CHUNK_SIZE,
+    delay: float = RECONCILE_CHUNK_DELAY,
+    dry_run: bool = False
+) -> dict:
+    """
+    Recompute karma, upvotesReceived, postCount, commentCount and
+    unreadNotifications for every user in _id-ordered chunks and repair
+    drift. Each fix is guarded on the
+    values that were read, so a user touched by live traffic mid-chunk is
+    skipped and picked up by the next run instead of being clobbered.
+
+    Other workers may still hold deltas for changes the aggregations already
+    counted, and the notification writer and mark-read adjust the unread
+    counter just after changing the notifications. Writing a fix before
+    those land would count them twice, so fixes are held back for
+    RECONCILE_STATS_SETTLE_SECONDS: by then every such delta has changed
+    the user document and the guard rejects the fix.
+    """
+    report = {"scanned": 0, "drifted": 0, "repaired": 0, "drift": {field: 0 for field in USER_COUNTER_FIELDS}}
+    projection = {field: 1 for field in USER_COUNTER_FIELDS}
+    # (write after, fixes) per chunk, oldest first
+    held: Deque[Tuple[float, list]] = deque()
+
+    async def write_held(wait: bool):
+        while held and (wait or held[0][0] <= time.monotonic()):
+            write_after, fixes = held.popleft()
+            await asyncio.sleep(max(0.0, write_after - time.monotonic()))
+            result = await users_collection.bulk_write(fixes, ordered=False)
+            report["repaired"] += result.modified_count
+
+    async for users in walk_chunks(users_collection, projection, chunk_size, delay):
+        # Deltas still buffered in this process would otherwise look like drift
+        await user_stats.flush()
+        user_ids = [u["_id"] for u in users]
+
+        # Archived posts still count towards their author's stats; deleted ones
+        # stop counting when they are soft-deleted, like the live counters
+        post_stats = await posts_collection.aggregate([
+            {"$match": {"authorId": {"$in": user_ids}, "deleted": {"$ne": True}}},
+            {"$unionWith": {"coll": posts_archive_collection.name, "pipeline": [
+                {"$match": {"authorId": {"$in": user_ids}, "deleted": {"$ne": True}}}
+            ]}},
+            {"$group": {
+                "_id": "$authorId",
+                "postCount": {"$sum": 1},
+                "karma": {"$sum": "$score"},
+                "upvotesReceived": {"$sum": "$upvotes"}
+            }}
+        ]).to_list(None)
+        # Comments are never soft-deleted: the cascade uncounts them as it removes them
+        comment_stats = await comments_collection.aggregate([
+            {"$match": {"userId": {"$in": user_ids}}},
+            {"$group": {"_id": "$userId", "commentCount": {"$sum": 1}}}
+        ]).to_list(None)
+        # Served by the partial unread-only index
+        unread_stats = await notifications_collection.aggregate([
+            {"$match": {"userId": {"$in": user_ids}, "read": False}},
+            {"$group": {"_id": "$userId", "unreadNotifications": {"$sum": 1}}}
+        ]).to_list(None)
+        posts_by_user = {s["_id"]: s for s in post_stats}
+        comments_by_user = {s["_id"]: s for s in comment_stats}
+        unread_by_user = {s["_id"]: s["unreadNotifications"] for s in unread_stats}
+
+        fixes = []
+        for user in users:
+            expected = {
+                "postCount": posts_by_user.get(user["_id"], {}).get("postCount", 0),
+                "karma": posts_by_user.get(user["_id"], {}).get("karma", 0),
+                "upvotesReceived": posts_by_user.get(user["_id"], {}).get("upvotesReceived", 0),
+                "commentCount": comments_by_user.get(user["_id"], {}).get("commentCount", 0),
+                "unreadNotifications": unread_by_user.get(user["_id"], 0),
+            }
+            observed = {field: user.get(field) for field in USER_COUNTER_FIELDS}
+            diff = {f: expected[f] - (observed[f] or 0) for f in USER_COUNTER_FIELDS if observed[f] != expected[f]}
+            if not diff:
+                continue
+            report["drifted"] += 1
+            for field, delta in diff.items():
+                report["drift"][field] += abs(delta)
+            guard = {field: observed[field] for field in USER_COUNTER_FIELDS}
+            fixes.append(UpdateOne({"_id": user["_id"], **guard}, {"$set": expected}))
+
+        report["scanned"] += len(users)
+        if fixes and not dry_run:
+            held.append((time.monotonic() + RECONCILE_STATS_SETTLE_SECONDS, fixes))
+        await write_held(wait=False)
+    await write_held(wait=True)
+
+    logger.info("User stats reconciliation: %s", report)
+    return report
+
+
+async def reconcile_category_counts(dry_run: bool = False) -> dict:
+    """
+    Recount posts per category and repair the counters. Like the user stats
+    fixes, each one is guarded on the value read, so a counter that moved
+    in the meantime is left for the next run.
+    """
+    expected = await db_manager.count_posts_by_category()
+    observed = {c["_id"]: c["count"] async for c in category_counts_collection.find({})}
+    report = {"categories": len(set(expected) | set(observed)), "drifted": 0, "repaired": 0, "drift": 0}
+
+    fixes = []
+    for category in set(expected) | set(observed):
+        count = expected.get(category, 0)
+        if category not in observed:
+            fixes.append(UpdateOne({"_id": category}, {"$setOnInsert": {"count": count}}, upsert=True))
+        elif observed[category] != count:
+            fixes.append(UpdateOne({"_id": category, "count": observed[category]}, {"$set": {"count": count}}))
+        else:
+            continue
+        report["drifted"] += 1
+        report["drift"] += abs(count - observed.get(category, 0))
+
+    if fixes and not dry_run:
+        result = await category_counts_collection.bulk_write(fixes, ordered=False)
+        report["repaired"] += result.modified_count + result.upserted_count
+
+    logger.info("Category count reconciliation: %s", report)
+    return report
+
+
+class Reconciler:
+    """Runs the reconciliation jobs every RECONCILE_INTERVAL seconds"""
+
+    def __init__(self, interval: float = RECONCILE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self, dry_run: bool = False) -> dict:
+        # Posts first: author karma is derived from the repaired post scores
+        return {
+            "posts": await reconcile_post_counters(dry_run=dry_run),
+            "users": await reconcile_user_stats(dry_run=dry_run),
+            "categories": await reconcile_category_counts(dry_run=dry_run)
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Reconciliation run failed")
+
+
+# Create reconciler instance
+reconciler = Reconciler()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Recompute denormalized counters and repair drift")
+    parser.add_argument("--dry-run", action="store_true", help="Report drift without writing fixes")
+    parser.add_argument("--chunk-size", type=int, default=RECONCILE_CHUNK_SIZE)
+    parser.add_argument("--delay", type=float, default=RECONCILE_CHUNK_DELAY)
+    parser.add_argument("--only", choices=["posts", "users", "categories"], help="Run a single job")
+    args = parser.parse_args()
+
+    async def run():
+        report = {}
+        if args.only in (None, "posts"):
+            report["posts"] = await reconcile_post_counters(args.chunk_size, args.delay, args.dry_run)
+        if args.only in (None, "users"):
+            report["users"] = await reconcile_user_stats(args.chunk_size, args.delay, args.dry_run)
+        if args.only in (None, "categories"):
+            report["categories"] = await reconcile_category_counts(args.dry_run)
+        return report
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(run()), indent=2))
@@ -0,0 +1,243 @@
+import math
+from datetime import datetime
+from json.encoder import encode_basestring
+from typing import Any, List, Optional
+from starlette.responses import Response
+
+
+def _encode(value: Any, out: List[str]):
+    """Append the JSON encoding of a plain value, record or container to out"""
+    # Exact-type checks first: most fields are plain str and int
+    cls = type(value)
+    if cls is str:
+        out.append(encode_basestring(value))
+    elif cls is int:
+        out.append(int.__repr__(value))
+    elif value is None:
+        out.append("null")
+    elif value is True:
+        out.append("true")
+    elif value is False:
+        out.append("false")
+    elif isinstance(value, str):
+        out.append(encode_basestring(value))
+    elif isinstance(value, int):
+        # int.__repr__ also covers subclasses such as bson's Int64
+        out.append(int.__repr__(value))
+    elif isinstance(value, float):
+        # NaN and Infinity are not JSON; refuse them like JSONResponse (allow_nan=False) does
+        if not math.isfinite(value):
+            raise ValueError("Out of range float values are not JSON compliant")
+        out.append(float.__repr__(value))
+    elif isinstance(value, datetime):
+        out.append('"' + value.isoformat() + '"')
+    elif isinstance(value, Record):
+        value.write_json(out)
+    elif isinstance(value, dict):
+        out.append("{")
+        first = True
+        for key, item in value.items():
+            if not first:
+                out.append(",")
+            first = False
+            out.append(encode_basestring(key))
+            out.append(":")
+            _encode(item, out)
+        out.append("}")
+    elif isinstance(value, (list, tuple)):
+        out.append("[")
+        for i, item in enumerate(value):
+            if i:
+                out.append(",")
+            _encode(item, out)
+        out.append("]")
+    else:
+        out.append(encode_basestring(str(value)))
+
+
+def dumps(value: Any) -> bytes:
+    """JSON for records and the plain containers that hold them, as UTF-8 bytes"""
+    out: List[str] = []
+    _encode(value, out)
+    return "".join(out).encode("utf-8")
+
+
+class Record:
+    """
+    Base for the compact read-side records. Fields live in __slots__ and are
+    written out in slot order, matching the corresponding response model, so
+    a page is encoded straight from the records without building dicts or
+    Pydantic models. Read-only item access (record["id"], record.get(...))
+    keeps callers written against serialized documents working.
+    """
+
+    __slots__ = ()
+    # '{"id":', ',"title":', ... for each subclass's slots
+    _json_keys = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._json_keys = tuple(("," if i else "{") + encode_basestring(name) + ":" for i, name in enumerate(cls.__slots__))
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name, default)
+
+    def write_json(self, out: List[str]):
+        for key, name in zip(self._json_keys, self.__slots__):
+            out.append(key)
+            _encode(getattr(self, name), out)
+        out.append("}")
+
+    def items(self):
+        return ((name, getattr(self, name)) for name in self.__slots__)
+
+
+class UserRecord(Record):
+    """A user as embedded in posts and comments (UserResponse without email or bio)"""
+
+    __slots__ = (
+        "id", "username", "email", "avatar", "bio", "followers", "following", "upvotesReceived",
+        "karma", "postCount", "commentCount", "joinDate", "isActive",
+    )
+
+    def __init__(self, id: str, username: str, avatar: Optional[str] = None, followers: int = 0,
+                 following: int = 0, upvotesReceived: int = 0, karma: int = 0, postCount: int = 0,
+                 commentCount: int = 0, joinDate: Optional[datetime] = None, isActive: bool = True):
+        self.id = id
+        self.username = username
+        self.email = None
+        self.avatar = avatar
+        self.bio = None
+        self.followers = followers
+        self.following = following
+        self.upvotesReceived = upvotesReceived
+        self.karma = karma
+        self.postCount = postCount
+        self.commentCount = commentCount
+        self.joinDate = joinDate
+        self.isActive = isActive
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "UserRecord":
+        """From a raw user document (AUTHOR_PROJECTION) or an already serialized one"""
+        get = doc.get
+        return cls(
+            str(doc["_id"]) if "_id" in doc else doc["id"],
+            doc["username"],
+            get("avatar"),
+            get("followers", 0),
+            get("following", 0),
+            get("upvotesReceived", 0),
+            get("karma", 0),
+            get("postCount", 0),
+            get("commentCount", 0),
+            get("joinDate"),
+            get("isActive", True),
+        )
+
+
+class PostRecord(Record):
+    """A post as returned by the API (PostResponse)"""
+
+    __slots__ = (
+        "id", "title", "mediaType", "mediaUrl", "category", "tags", "author", "upvotes", "downvotes",
+        "score", "commentCount", "views", "nsfw", "createdAt", "archived", "repostOf",
+    )
+
+    def __init__(self, id: str, title: str, mediaType: str, mediaUrl: str, category: str, tags: list,
+                 author: UserRecord, upvotes: int, downvotes: int, score: int, commentCount: int,
+                 views: int, nsfw: bool, createdAt: datetime, archived: bool = False,
+                 repostOf: Optional[str] = None):
+        self.id = id
+        self.title = title
+        self.mediaType = mediaType
+        self.mediaUrl = mediaUrl
+        self.category = category
+        self.tags = tags
+        self.author = author
+        self.upvotes = upvotes
+        self.downvotes = downvotes
+        self.score = score
+        self.commentCount = commentCount
+        self.views = views
+        self.nsfw = nsfw
+        self.createdAt = createdAt
+        self.archived = archived
+        self.repostOf = repostOf
+
+    @classmethod
+    def from_doc(cls, doc: dict, author: UserRecord, archived: bool = False) -> "PostRecord":
+        """From a raw post document (POST_PROJECTION) and its author's record"""
+        get = doc.get
+        repost_of = get("repostOf")
+        return cls(
+            str(doc["_id"]),
+            doc["title"],
+            doc["mediaType"],
+            doc["mediaUrl"],
+            doc["category"],
+            get("tags", []),
+            author,
+            get("upvotes", 0),
+            get("downvotes", 0),
+            get("score", 0),
+            get("commentCount", 0),
+            get("views", 0),
+            get("nsfw", False),
+            doc["createdAt"],
+            archived,
+            str(repost_of) if repost_of is not None else None,
+        )
+
+
+class CommentRecord(Record):
+    """A comment with its replies as returned by the API (CommentResponse)"""
+
+    __slots__ = (
+        "id", "postId", "user", "text", "parentId", "upvotes", "downvotes", "score", "replies", "createdAt",
+    )
+
+    def __init__(self, id: str, postId: str, user: UserRecord, text: str, parentId: Optional[str],
+                 upvotes: int, downvotes: int, score: int, createdAt: datetime):
+        self.id = id
+        self.postId = postId
+        self.user = user
+        self.text = text
+        self.parentId = parentId
+        self.upvotes = upvotes
+        self.downvotes = downvotes
+        self.score = score
+        self.replies: List["CommentRecord"] = []
+        self.createdAt = createdAt
+
+    @classmethod
+    def from_doc(cls, doc: dict, user: UserRecord) -> "CommentRecord":
+        """From a raw comment document (COMMENT_PROJECTION) and its author's record"""
+        get = doc.get
+        parent_id = get("parentId")
+        return cls(
+            str(doc["_id"]),
+            str(doc["postId"]),
+            user,
+            doc["text"],
+            str(parent_id) if parent_id is not None else None,
+            get("upvotes", 0),
+            get("downvotes", 0),
+            get("score", 0),
+            doc["createdAt"],
+        )
+
+
+class RecordResponse(Response):
+    """JSON response encoded directly from records, skipping response-model validation"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
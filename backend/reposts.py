@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+from hashindex import MultiIndexHashTable
+from phash import HASH_BITS, parse_hash
+from database import posts_collection, posts_archive_collection
+
+logger = logging.getLogger(__name__)
+
+# Repost detection configuration
+REPOST_MAX_DISTANCE = int(os.environ.get("REPOST_MAX_DISTANCE", "6"))
+# Other workers' posts are only seen after a rebuild
+REBUILD_INTERVAL = float(os.environ.get("REPOST_INDEX_REBUILD_INTERVAL", "600"))
+
+
+class RepostIndex:
+    """
+    In-memory multi-index hash table of post media hashes, rebuilt from
+    Mongo (live and archived posts) at startup and periodically after that.
+    New posts are added as they are created, so a worker sees its own
+    posts immediately.
+    """
+
+    def __init__(self):
+        self.index = MultiIndexHashTable(bits=HASH_BITS)
+        self._task: Optional[asyncio.Task] = None
+
+    async def rebuild(self):
+        """Load every stored media hash into a fresh index"""
+        started = time.perf_counter()
+        index = MultiIndexHashTable(bits=HASH_BITS)
+        query = {"mediaHash": {"$exists": True}, "deleted": {"$ne": True}}
+        for collection in (posts_collection, posts_archive_collection):
+            async for post in collection.find(query, {"mediaHash": 1}, batch_size=10000):
+                value = parse_hash(post["mediaHash"])
+                if value is not None:
+                    index.add(str(post["_id"]), value)
+        self.index = index
+        logger.info("Repost index built with %d hashes in %.2fs", len(index), time.perf_counter() - started)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Failed to build repost index")
+            await asyncio.sleep(REBUILD_INTERVAL)
+
+    def add(self, post_id: str, media_hash: str):
+        value = parse_hash(media_hash)
+        if value is not None:
+            self.index.add(post_id, value)
+
+    def discard(self, post_id: str):
+        self.index.discard(post_id)
+
+    def find(self, media_hash: str, max_distance: int = REPOST_MAX_DISTANCE) -> List[Tuple[str, int]]:
+        """(post_id, distance) of earlier posts with near-identical media, closest first"""
+        value = parse_hash(media_hash)
+        if value is None:
+            return []
+        return self.index.search(value, max_distance)
+
+
+# Create index instance
+repost_index = RepostIndex()
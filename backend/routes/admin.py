@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+from auth import get_admin_user
+from database import db_manager
+from tasks import task_runner
+from bson import ObjectId
+import json
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+EXPORT_COLLECTIONS = {"posts", "votes", "comments", "posts_archive", "votes_archive"}
+# Lines are sent in chunks so each send carries many records
+LINES_PER_CHUNK = 500
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+@router.get("/export/{collection}")
+async def export_collection(
+    collection: str,
+    after: Optional[str] = Query(None, description="Resume token: last exported id"),
+    since: Optional[datetime] = Query(None, description="createdAt lower bound (inclusive)"),
+    until: Optional[datetime] = Query(None, description="createdAt upper bound (exclusive)"),
+    category: Optional[str] = Query(None, description="Post category (posts only)"),
+    limit: Optional[int] = Query(None, ge=1),
+    includeDeleted: bool = Query(False, description="Also export soft-deleted posts, with their deleted flag"),
+    current_user_id: str = Depends(get_admin_user)
+):
+    """Stream a collection as NDJSON in _id order"""
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown export collection"
+        )
+    if after is not None and not ObjectId.is_valid(after):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid resume token"
+        )
+    if category is not None and collection not in ("posts", "posts_archive"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Category filter is only supported for posts"
+        )
+    
+    cursor = db_manager.export_cursor(
+        collection,
+        after=ObjectId(after) if after else None,
+        since=since,
+        until=until,
+        category=category,
+        limit=limit,
+        include_deleted=includeDeleted
+    )
+    
+    async def ndjson():
+        lines = []
+        async for doc in cursor:
+            doc["id"] = doc.pop("_id")
+            lines.append(json.dumps(doc, default=_json_default, separators=(",", ":")))
+            if len(lines) >= LINES_PER_CHUNK:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{collection}.ndjson"'}
+    )
+
+@router.get("/tasks")
+async def get_task_metrics(current_user_id: str = Depends(get_admin_user)):
+    """Background task queue depth and per-task counters"""
+    return task_runner.snapshot()
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from models import UserCreate, UserLogin, UserResponse, MessageResponse
 from auth import hash_password, verify_password, create_access_token, get_current_user
-from database import db_manager
+from database import db_manager, DuplicateUserError
+from usernames import username_registry
 import re
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -21,22 +22,7 @@ async def register(user_data: UserCreate):
             detail="Username must be 3-20 characters long and contain only letters, numbers, and underscores"
         )
     
-    # Check if user already exists
-    existing_user_email = await db_manager.get_user_by_email(user_data.email)
-    if existing_user_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    existing_user_username = await db_manager.get_user_by_username(user_data.username)
-    if existing_user_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
-    
-    # Hash password and create user
+    # Hash password and create user; unique indexes reject existing email/username
     hashed_password = hash_password(user_data.password)
     user_dict = {
         "username": user_data.username,
@@ -45,9 +31,26 @@ async def register(user_data: UserCreate):
         "avatar": f"https://images.unsplash.com/photo-{1500000000 + hash(user_data.username) % 100000000}?w=100&h=100&fit=crop&crop=face"
     }
     
-    user = await db_manager.create_user(user_dict)
+    try:
+        user = await db_manager.create_user(user_dict)
+    except DuplicateUserError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered" if e.field == "email" else "Username already taken"
+        )
+    
+    username_registry.add(user["username"])
     return UserResponse(**user)
 
+@router.get("/username-available")
+async def check_username_available(username: str = Query(..., max_length=50)):
+    """Check whether a username can still be registered"""
+    if not validate_username(username):
+        return {"username": username, "available": False, "reason": "invalid"}
+    
+    available = await username_registry.is_available(username)
+    return {"username": username, "available": available}
+
 @router.post("/login")
 async def login(login_data: UserLogin):
     """Login user and return access token"""
@@ -0,0 +1,134 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+from models import BatchRequest, BatchResponse, SubRequest, SubResponse
+from auth import verify_token
+import asyncio
+import json
+import logging
+import os
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_REQUESTS = int(os.environ.get("MAX_BATCH_REQUESTS", "20"))
+ALLOWED_METHODS = {"GET", "POST", "PUT", "DELETE"}
+# Streams never finish and nested batches would multiply the fan-out
+EXCLUDED_PREFIXES = ("/api/batch", "/api/live/", "/api/admin/export/")
+# Response headers worth returning to the client
+FORWARDED_RESPONSE_HEADERS = {"etag", "last-modified", "cache-control", "retry-after", "content-type", "x-partial-response"}
+
+def resolve_auth(request: Request) -> Optional[Tuple[str, str]]:
+    """Verify the batch's bearer token once; sub-requests reuse the result"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user_id = verify_token(token).get("sub")
+    except HTTPException:
+        # Let each sub-request report the invalid token like it would on its own
+        return None
+    return (token, user_id) if user_id else None
+
+async def dispatch(request: Request, sub: SubRequest, resolved_auth: Optional[Tuple[str, str]]) -> SubResponse:
+    """
+    Run one sub-request in-process through the app's whole middleware stack,
+    so it is admitted, rate limited, deduplicated by Idempotency-Key and
+    given a latency budget exactly like the same request sent on its own
+    """
+    url = urlsplit(sub.path)
+    headers = {key.lower(): value for key, value in sub.headers.items()}
+    if "authorization" in request.headers:
+        headers["authorization"] = request.headers["authorization"]
+    body = b""
+    if sub.body is not None:
+        body = json.dumps(sub.body).encode()
+        headers["content-type"] = "application/json"
+    headers["content-length"] = str(len(body))
+
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": "1.1",
+        "method": sub.method,
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": "",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()],
+        "app": request.app,
+        "state": {"resolved_auth": resolved_auth},
+    }
+
+    body_sent = False
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Sub-requests never disconnect; park like a live connection would
+        await asyncio.Event().wait()
+
+    result = {"status": 500, "headers": {}, "body": bytearray()}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {
+                key.decode("latin-1"): value.decode("latin-1")
+                for key, value in message.get("headers", [])
+                if key.decode("latin-1") in FORWARDED_RESPONSE_HEADERS
+            }
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+
+    try:
+        await request.app.middleware_stack(scope, receive, send)
+    except Exception:
+        # One failing sub-request must not take the rest of the batch down
+        logger.exception("Batch sub-request %s %s failed", sub.method, url.path)
+        return SubResponse(id=sub.id, status=500, body={"detail": "Internal Server Error"})
+
+    content = bytes(result["body"])
+    payload = None
+    if content:
+        if result["headers"].get("content-type", "").startswith("application/json"):
+            payload = json.loads(content)
+        else:
+            payload = content.decode("utf-8", errors="replace")
+    result["headers"].pop("content-type", None)
+    return SubResponse(id=sub.id, status=result["status"], headers=result["headers"], body=payload)
+
+@router.post("", response_model=BatchResponse)
+async def batch(batch_data: BatchRequest, request: Request):
+    """Run several API requests concurrently and return all their responses"""
+    if not batch_data.requests:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Batch must contain at least one request"
+        )
+    if len(batch_data.requests) > MAX_BATCH_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch is limited to {MAX_BATCH_REQUESTS} requests"
+        )
+    for sub in batch_data.requests:
+        sub.method = sub.method.upper()
+        if sub.method not in ALLOWED_METHODS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported method '{sub.method}'"
+            )
+        if not sub.path.startswith("/api/") or sub.path.startswith(EXCLUDED_PREFIXES):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Path '{sub.path}' cannot be batched"
+            )
+
+    resolved_auth = resolve_auth(request)
+    # Sub-requests are independent and may complete in any order
+    responses = await asyncio.gather(*(dispatch(request, sub, resolved_auth) for sub in batch_data.requests))
+    return BatchResponse(responses=list(responses))
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from models import CategoryCountsResponse
+from database import db_manager
+
+router = APIRouter(prefix="/categories", tags=["categories"])
+
+@router.get("", response_model=CategoryCountsResponse)
+async def get_category_counts():
+    """Post count per category, served from incrementally maintained counters"""
+    return CategoryCountsResponse(categories=await db_manager.get_category_counts())
@@ -1,23 +1,64 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import List, Optional
 from models import CommentCreate, CommentResponse, MessageResponse
 from auth import get_current_user
 from database import db_manager
+from conditional import make_etag, is_not_modified, set_validators, not_modified
+from fieldsets import parse_fields, shape_thread
+from records import RecordResponse
 from bson import ObjectId
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
 @router.get("/{post_id}", response_model=List[CommentResponse])
-async def get_comments(post_id: str):
+async def get_comments(
+    post_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated comment fields, or 'card'")
+):
     """Get all comments for a post"""
     if not ObjectId.is_valid(post_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid post ID"
         )
+    try:
+        field_set = parse_fields(fields, "comments")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    comments = await db_manager.get_comments_for_post(post_id)
-    return [CommentResponse(**comment) for comment in comments]
+    # The post's comments version changes on every comment write
+    etag = last_modified = None
+    version = await db_manager.get_post_version(post_id)
+    if version:
+        etag = make_etag("c", post_id, version["commentsVersion"])
+        last_modified = version["updatedAt"]
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+    
+    comments, partial = await db_manager.get_comments_for_post(post_id, fields=field_set)
+    if partial:
+        # A truncated thread must not be cached under the full thread's validators
+        etag = last_modified = None
+    if field_set is not None:
+        sparse = JSONResponse(jsonable_encoder([shape_thread(c, field_set) for c in comments]))
+        if etag:
+            set_validators(sparse, etag, last_modified)
+        if partial:
+            sparse.headers["X-Partial-Response"] = "true"
+        return sparse
+    
+    thread = RecordResponse(comments)
+    if etag:
+        set_validators(thread, etag, last_modified)
+    if partial:
+        thread.headers["X-Partial-Response"] = "true"
+    return thread
 
 @router.post("", response_model=CommentResponse)
 async def create_comment(
@@ -39,20 +80,24 @@ async def create_comment(
                 detail="Invalid parent comment ID"
             )
         
-        parent_comment = await db_manager.get_comment_by_id(comment_data.parentId)
-        if not parent_comment:
+        if not await db_manager.comment_exists(comment_data.parentId):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Parent comment not found"
             )
     
     # Check if post exists
-    post = await db_manager.get_post_by_id(comment_data.postId)
-    if not post:
+    state = await db_manager.get_post_state(comment_data.postId)
+    if state is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
+    if state == "archived":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Archived posts can no longer be commented on"
+        )
     
     # Create comment
     comment_dict = comment_data.dict()
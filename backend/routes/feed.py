@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+from datetime import datetime, timezone
+from models import TimelineResponse
+from auth import get_current_user
+from database import db_manager
+from conditional import to_millis
+from records import RecordResponse
+from bson import ObjectId
+
+router = APIRouter(prefix="/feed", tags=["feed"])
+
+def parse_cursor(cursor: str) -> tuple:
+    """Cursor format: '<createdAt epoch ms>-<post id>'; a bare '<epoch ms>' pages by time alone"""
+    millis, _, post_id = cursor.partition("-")
+    if not millis.isdigit() or (post_id and not ObjectId.is_valid(post_id)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    created_at = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc).replace(tzinfo=None)
+    return created_at, ObjectId(post_id) if post_id else None
+
+@router.get("/home", response_model=TimelineResponse)
+async def get_home_timeline(
+    limit: int = Query(10, ge=1, le=50),
+    before: Optional[str] = Query(None, description="Cursor: nextCursor from the previous page"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """Get posts from followed users, newest first"""
+    cursor = parse_cursor(before) if before else None
+    
+    posts, has_more, last = await db_manager.get_home_timeline(current_user_id, limit=limit, before=cursor)
+    
+    next_cursor = None
+    if has_more and last is not None:
+        next_cursor = f"{to_millis(last[0])}-{last[1]}"
+    
+    return RecordResponse({"posts": posts, "hasMore": has_more, "nextCursor": next_cursor})
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Query
+from models import PostLeaderboardResponse, CreatorLeaderboardResponse, CategoryEngagementResponse
+from database import db_manager
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+# Boards are precomputed by leaderboard.py; each endpoint is a single document read.
+# Before the first run they are empty and have no computedAt.
+
+@router.get("/posts", response_model=PostLeaderboardResponse)
+async def get_post_leaderboard(period: str = Query("day", regex="^(day|week|all)$")):
+    """Top posts by net votes in the last day or week, or by score of all time"""
+    board = await db_manager.get_leaderboard(f"posts:{period}") or {"entries": []}
+    return PostLeaderboardResponse(period=period, **board)
+
+@router.get("/creators", response_model=CreatorLeaderboardResponse)
+async def get_creator_leaderboard():
+    """Top creators by karma"""
+    board = await db_manager.get_leaderboard("creators") or {"entries": []}
+    return CreatorLeaderboardResponse(**board)
+
+@router.get("/categories", response_model=CategoryEngagementResponse)
+async def get_category_engagement():
+    """Per-category engagement: votes and comments per view"""
+    board = await db_manager.get_leaderboard("categories") or {"entries": []}
+    return CategoryEngagementResponse(**board)
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from realtime import hub, MAX_POSTS_PER_SUBSCRIPTION
+from bson import ObjectId
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+HEARTBEAT_SECONDS = 15.0
+
+@router.get("/posts")
+async def stream_posts(request: Request, ids: str = Query(..., description="Comma-separated post IDs")):
+    """Server-sent event stream of score updates and new comments for a set of posts"""
+    post_ids = {post_id.strip() for post_id in ids.split(",") if post_id.strip()}
+    if not post_ids or len(post_ids) > MAX_POSTS_PER_SUBSCRIPTION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Subscribe to between 1 and {MAX_POSTS_PER_SUBSCRIPTION} posts"
+        )
+    if not all(ObjectId.is_valid(post_id) for post_id in post_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid post ID"
+        )
+
+    async def event_stream():
+        subscriber = hub.subscribe(post_ids)
+        try:
+            yield f"retry: 3000\n: subscribed to {len(post_ids)} posts\n\n"
+            while not subscriber.overflowed:
+                batch = await subscriber.next_batch(HEARTBEAT_SECONDS)
+                if batch is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                elif batch:
+                    yield "".join(batch)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats")
+async def live_stats():
+    """Connection and fan-out counters for this worker"""
+    return hub.snapshot()
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from datetime import datetime, timezone
+from typing import Optional
+from models import NotificationsListResponse, NotificationResponse, UnreadCountResponse, MarkNotificationsRead, MessageResponse
+from auth import get_current_user
+from database import db_manager
+from conditional import to_millis
+from bson import ObjectId
+
+router = APIRouter(prefix="/notifications", tags=["notifications"])
+
+def parse_cursor(cursor: str) -> tuple:
+    """Cursor format: '<createdAt epoch ms>-<notification id>'"""
+    millis, _, notification_id = cursor.partition("-")
+    if not millis.isdigit() or not ObjectId.is_valid(notification_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    created_at = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc).replace(tzinfo=None)
+    return created_at, ObjectId(notification_id)
+
+@router.get("", response_model=NotificationsListResponse)
+async def get_notifications(
+    limit: int = Query(20, ge=1, le=50),
+    before: Optional[str] = Query(None, description="Cursor: nextCursor from the previous page"),
+    current_user_id: str = Depends(get_current_user)
+):
+    """Get the current user's reply and mention notifications, newest first"""
+    cursor = parse_cursor(before) if before else None
+    notifications, has_more = await db_manager.get_notifications(current_user_id, limit=limit, before=cursor)
+    unread = await db_manager.get_unread_notification_count(current_user_id)
+    
+    next_cursor = None
+    if has_more and notifications:
+        last = notifications[-1]
+        next_cursor = f"{to_millis(last['createdAt'])}-{last['id']}"
+    
+    return NotificationsListResponse(
+        notifications=[NotificationResponse(**n) for n in notifications],
+        hasMore=has_more,
+        unreadCount=unread,
+        nextCursor=next_cursor
+    )
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(current_user_id: str = Depends(get_current_user)):
+    """Unread notification count from the user's counter (a single indexed read)"""
+    return UnreadCountResponse(count=await db_manager.get_unread_notification_count(current_user_id))
+
+@router.post("/read", response_model=MessageResponse)
+async def mark_read(
+    body: MarkNotificationsRead,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Mark the given notifications, or all of them, as read"""
+    if body.ids is not None and not all(ObjectId.is_valid(n) for n in body.ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid notification ID"
+        )
+    changed = await db_manager.mark_notifications_read(current_user_id, body.ids)
+    return MessageResponse(message=f"Marked {changed} notifications read")
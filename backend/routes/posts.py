@@ -1,43 +1,124 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
 from typing import Optional
 from models import PostCreate, PostResponse, PostsListResponse
 from auth import get_current_user, get_optional_user
-from database import db_manager
+from database import db_manager, normalize_tags
+from conditional import make_etag, to_millis, is_not_modified, set_validators, not_modified
+from deletion import deletion_cascade
+from fieldsets import parse_fields, shape
+from tasks import task_runner
+from archive import archiver
+from reposts import repost_index
+from seen import seen_posts
+from records import RecordResponse
 from bson import ObjectId
+import os
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
+# Most posts one GET /api/posts?ids= call resolves
+MAX_MULTI_GET_IDS = int(os.environ.get("MAX_MULTI_GET_IDS", "100"))
+
 @router.get("", response_model=PostsListResponse)
 async def get_posts(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=50),
     section: str = Query("hot", regex="^(hot|trending|fresh|top)$"),
     category: Optional[str] = Query(None),
+    tag: Optional[str] = Query(None, description="Only posts carrying this tag"),
+    fields: Optional[str] = Query(None, description="Comma-separated post fields, or 'card'"),
+    unseen: bool = Query(False, description="Leave out posts the user has already seen"),
+    ids: Optional[str] = Query(None, description="Comma-separated post IDs to fetch instead of a feed page"),
     current_user_id: Optional[str] = Depends(get_optional_user)
 ):
     """Get posts with pagination and filtering"""
-    posts, has_more, total = await db_manager.get_posts(
-        skip=skip, 
-        limit=limit, 
-        section=section, 
-        category=category
-    )
+    try:
+        field_set = parse_fields(fields, "posts")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if ids is not None:
+        return await get_posts_by_ids(ids, field_set)
+    tag = (normalize_tags([tag]) or [None])[0] if tag else None
+    if unseen and not current_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sign in to hide seen posts"
+        )
+    
+    etag = last_modified = None
+    if unseen:
+        # Per-user pages are never revalidated against the shared feed version
+        posts, has_more, total = await db_manager.get_unseen_posts(
+            await seen_posts.get(current_user_id),
+            skip=skip,
+            limit=limit,
+            section=section,
+            category=category,
+            tag=tag
+        )
+    else:
+        # Looked up before the feed query so the validator can only be older than the body.
+        # Tag feeds share their category's validator, which changes at least as often.
+        # The feed version covers posts leaving the feed (archived, deleted) and author edits.
+        last_modified, feed_version = await db_manager.get_feed_validators(category)
+        etag = make_etag("f", to_millis(last_modified), feed_version) if last_modified else None
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+
+        posts, has_more, total = await db_manager.get_posts(
+            skip=skip, 
+            limit=limit, 
+            section=section, 
+            category=category,
+            fields=field_set,
+            tag=tag
+        )
     
-    # Convert to response format
-    post_responses = []
-    for post in posts:
-        post_response = PostResponse(**post)
-        post_responses.append(post_response)
+    if current_user_id and posts:
+        await task_runner.enqueue("seen_impressions", seen_posts.mark_seen, current_user_id, [p["id"] for p in posts])
     
-    return PostsListResponse(
-        posts=post_responses,
-        hasMore=has_more,
-        total=total
-    )
+    if field_set is not None:
+        # Sparse pages carry only the requested keys
+        posts = [shape(post, field_set) for post in posts]
+    
+    # Encoded directly from the records; response_model only documents the shape
+    page = RecordResponse({"posts": posts, "hasMore": has_more, "total": total})
+    set_validators(page, etag, last_modified)
+    return page
+
+async def get_posts_by_ids(ids: str, field_set):
+    """
+    Multi-get for known post ids: one $in query plus batched author
+    hydration, in the requested order. Deleted or unknown ids are left out.
+    Views are not counted, since callers are warming caches or rendering
+    lists rather than opening the posts.
+    """
+    post_ids = list(dict.fromkeys(post_id.strip() for post_id in ids.split(",") if post_id.strip()))
+    if not post_ids or len(post_ids) > MAX_MULTI_GET_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Request between 1 and {MAX_MULTI_GET_IDS} post IDs"
+        )
+    if not all(ObjectId.is_valid(post_id) for post_id in post_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid post ID"
+        )
+    
+    posts = await db_manager.get_posts_by_ids([ObjectId(post_id) for post_id in post_ids])
+    if field_set is not None:
+        posts = [shape(post, field_set) for post in posts]
+    return RecordResponse({"posts": posts, "hasMore": False, "total": len(posts)})
 
 @router.get("/{post_id}", response_model=PostResponse)
 async def get_post(
     post_id: str,
+    request: Request,
+    response: Response,
     current_user_id: Optional[str] = Depends(get_optional_user)
 ):
     """Get a single post by ID"""
@@ -47,6 +128,15 @@ async def get_post(
             detail="Invalid post ID"
         )
     
+    # Revalidation only needs the version fields, not the author join
+    if request.headers.get("if-none-match") or request.headers.get("if-modified-since"):
+        version = await db_manager.get_post_version(post_id)
+        if version:
+            etag = make_etag("p", post_id, version["version"])
+            if is_not_modified(request, etag, version["updatedAt"]):
+                await task_runner.enqueue("post_views", db_manager.increment_post_views, post_id, retry=False)
+                return not_modified(etag, version["updatedAt"])
+    
     post = await db_manager.get_post_by_id(post_id)
     if not post:
         raise HTTPException(
@@ -54,10 +144,17 @@ async def get_post(
             detail="Post not found"
         )
     
-    # Increment view count
-    await db_manager.increment_post_views(post_id)
+    # Count the view after the response
+    await task_runner.enqueue("post_views", db_manager.increment_post_views, post_id, retry=False)
     post['views'] += 1
+    if current_user_id:
+        await task_runner.enqueue("seen_impressions", seen_posts.mark_seen, current_user_id, [post_id])
     
+    set_validators(
+        response,
+        make_etag("p", post_id, post.get("version", 0)),
+        post.get("updatedAt") or post["createdAt"]
+    )
     return PostResponse(**post)
 
 @router.post("", response_model=PostResponse)
@@ -67,7 +164,7 @@ async def create_post(
 ):
     """Create a new post (authenticated users only)"""
     # Get user info
-    user = await db_manager.get_user_by_id(current_user_id)
+    user = await db_manager.get_author(current_user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,8 +174,26 @@ async def create_post(
     # Create post
     post_dict = post_data.dict()
     post_dict["authorId"] = ObjectId(current_user_id)
+    # The media hash is the one computed on upload, never one sent by the client
+    if post_data.mediaPublicId:
+        upload = await db_manager.get_upload(post_data.mediaPublicId, current_user_id)
+        if upload is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unknown upload"
+            )
+        if upload.get("mediaHash"):
+            post_dict["mediaHash"] = upload["mediaHash"]
+            matches = repost_index.find(upload["mediaHash"])
+            if matches:
+                post_dict["repostOf"] = matches[0][0]
     
     post = await db_manager.create_post(post_dict)
+    if post_dict.get("mediaHash"):
+        repost_index.add(post["id"], post_dict["mediaHash"])
+    await task_runner.enqueue(
+        "timeline_fanout", db_manager.fan_out_post, post["id"], current_user_id, post["createdAt"]
+    )
     return PostResponse(**post)
 
 @router.delete("/{post_id}")
@@ -107,6 +222,40 @@ async def delete_post(
             detail="You can only delete your own posts"
         )
     
-    # Delete post (implement deletion logic)
-    # For now, just return success
-    return {"message": "Post deleted successfully"}
\ No newline at end of file
+    # Archived posts come back to the hot tier so the usual cascade applies
+    if post.get("archived"):
+        await archiver.restore(ObjectId(post_id))
+    
+    # Hide the post now; votes, comments and media are removed in the background
+    await db_manager.soft_delete_post(post_id)
+    repost_index.discard(post_id)
+    deletion_cascade.notify()
+    return {"message": "Post deleted successfully"}
+
+@router.get("/{post_id}/deletion")
+async def get_deletion_status(
+    post_id: str,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Get background deletion progress for a deleted post"""
+    if not ObjectId.is_valid(post_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid post ID"
+        )
+    
+    job = await db_manager.get_deletion_job(post_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No deletion in progress for this post"
+        )
+    
+    return {
+        "postId": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "deleted": job["deleted"],
+        "createdAt": job["createdAt"],
+        "updatedAt": job["updatedAt"]
+    }
\ No newline at end of file
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Query
+from models import TrendingTagsResponse
+from trending import trending_tags
+
+router = APIRouter(prefix="/tags", tags=["tags"])
+
+@router.get("/trending", response_model=TrendingTagsResponse)
+async def get_trending_tags(limit: int = Query(20, ge=1, le=100)):
+    """Tags with the most recent posts and votes, from an in-memory top-K sketch"""
+    return TrendingTagsResponse(tags=trending_tags.top(limit), windowSeconds=trending_tags.window)
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, status
 from models import UploadResponse, MessageResponse
 from auth import get_current_user
+from database import db_manager
+from phash import dhash, format_hash
+import asyncio
 import cloudinary
 import cloudinary.uploader
+import logging
 import os
 from typing import Optional
 
 router = APIRouter(prefix="/upload", tags=["upload"])
+logger = logging.getLogger(__name__)
 
 # Configure Cloudinary (will be set via environment variables)
 cloudinary.config(
@@ -56,10 +61,23 @@ async def upload_media(
         elif file.content_type == 'image/gif':
             media_type = "gif"
         
+        # Perceptual hash for repost detection; decoding runs off the event loop
+        media_hash = None
+        if media_type != "video":
+            try:
+                media_hash = format_hash(await asyncio.to_thread(dhash, file_content))
+            except Exception:
+                logger.warning("Could not hash uploaded image %s", file.filename)
+        
+        public_id = f"mock_{current_user_id}_{file.filename}"
+        # Posts look the hash up by publicId, so clients cannot supply their own
+        await db_manager.record_upload(public_id, current_user_id, media_type, media_hash)
+        
         return UploadResponse(
             url=mock_url,
-            publicId=f"mock_{current_user_id}_{file.filename}",
-            mediaType=media_type
+            publicId=public_id,
+            mediaType=media_type,
+            mediaHash=media_hash
         )
         
         # Real Cloudinary upload (uncomment when keys are provided):
@@ -77,10 +95,13 @@ async def upload_media(
         # elif result.get("format") == "gif":
         #     media_type = "gif"
         # 
+        # await db_manager.record_upload(result["public_id"], current_user_id, media_type, media_hash)
+        # 
         # return UploadResponse(
         #     url=result["secure_url"],
         #     publicId=result["public_id"],
-        #     mediaType=media_type
+        #     mediaType=media_type,
+        #     mediaHash=media_hash
         # )
         
     except Exception as e:
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
-from models import UserResponse, PostsListResponse
-from auth import get_optional_user
+from models import UserResponse, PostsListResponse, MessageResponse
+from auth import get_current_user, get_optional_user
 from database import db_manager
+from records import RecordResponse
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -43,8 +44,49 @@ async def get_user_posts(
     # Filter posts by this user
     user_posts = [post for post in posts if post['author']['username'] == username]
     
-    return PostsListResponse(
-        posts=user_posts,
-        hasMore=len(user_posts) == limit,  # Simple check
-        total=len(user_posts)
-    )
\ No newline at end of file
+    return RecordResponse({
+        "posts": user_posts,
+        "hasMore": len(user_posts) == limit,  # Simple check
+        "total": len(user_posts)
+    })
+
+@router.post("/{username}/follow", response_model=MessageResponse)
+async def follow_user(
+    username: str,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Follow a user"""
+    user = await db_manager.get_user_by_username(username)
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="User not found"
+        )
+    if user["id"] == current_user_id:
+        raise HTTPException(
+            status_code=400,
+            detail="You cannot follow yourself"
+        )
+    
+    created = await db_manager.follow_user(current_user_id, user["id"])
+    if not created:
+        return MessageResponse(message=f"Already following {username}")
+    return MessageResponse(message=f"Now following {username}")
+
+@router.delete("/{username}/follow", response_model=MessageResponse)
+async def unfollow_user(
+    username: str,
+    current_user_id: str = Depends(get_current_user)
+):
+    """Unfollow a user"""
+    user = await db_manager.get_user_by_username(username)
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="User not found"
+        )
+    
+    removed = await db_manager.unfollow_user(current_user_id, user["id"])
+    if not removed:
+        return MessageResponse(message=f"Not following {username}")
+    return MessageResponse(message=f"Unfollowed {username}")
@@ -19,12 +19,17 @@ async def create_or_update_vote(
         )
     
     # Check if post exists
-    post = await db_manager.get_post_by_id(vote_data.postId)
-    if not post:
+    state = await db_manager.get_post_state(vote_data.postId)
+    if state is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
+    if state == "archived":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Archived posts can no longer be voted on"
+        )
     
     # Create or update vote
     await db_manager.create_or_update_vote(
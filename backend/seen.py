@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import math
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from bloom import BloomFilter
+from database import seen_posts_collection
+
+logger = logging.getLogger(__name__)
+
+# Seen-post filter configuration
+SEEN_FP_RATE = float(os.environ.get("SEEN_FILTER_FP_RATE", "0.01"))
+# Memory budget per user, split between the current and previous generation
+SEEN_BYTES_PER_USER = int(os.environ.get("SEEN_FILTER_BYTES_PER_USER", "4096"))
+SEEN_FLUSH_INTERVAL = float(os.environ.get("SEEN_FILTER_FLUSH_INTERVAL", "5.0"))
+SEEN_CACHE_USERS = int(os.environ.get("SEEN_FILTER_CACHE_USERS", "5000"))
+
+
+def generation_capacity(num_bytes: int, error_rate: float) -> int:
+    """Posts one generation can hold before its false-positive rate exceeds error_rate"""
+    return max(1, int(num_bytes * 8 * math.log(2) ** 2 / -math.log(error_rate)))
+
+
+class SeenFilter:
+    """
+    Two-generation Bloom filter of the posts a user has seen. New posts go
+    into the current generation; when it reaches capacity it becomes the
+    previous one and the oldest generation is dropped, so memory stays fixed
+    and very old impressions age out instead of saturating the filter.
+    """
+
+    __slots__ = ("current", "previous", "capacity", "dirty")
+
+    def __init__(self, current: BloomFilter, previous: Optional[BloomFilter], capacity: int):
+        self.current = current
+        self.previous = previous
+        self.capacity = capacity
+        self.dirty = False
+
+    @classmethod
+    def empty(cls, num_bytes: int = SEEN_BYTES_PER_USER, error_rate: float = SEEN_FP_RATE) -> "SeenFilter":
+        capacity = generation_capacity(num_bytes // 2, error_rate)
+        return cls(BloomFilter.for_size(num_bytes // 2, capacity), None, capacity)
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "SeenFilter":
+        fresh = cls.empty()
+        current = BloomFilter.from_bytes(doc["current"])
+        # A changed budget starts over rather than mixing filter sizes
+        if current.num_bits != fresh.current.num_bits:
+            return fresh
+        previous = BloomFilter.from_bytes(doc["previous"]) if doc.get("previous") else None
+        return cls(current, previous, fresh.capacity)
+
+    def to_doc(self) -> dict:
+        return {
+            "current": self.current.to_bytes(),
+            "previous": self.previous.to_bytes() if self.previous is not None else None,
+        }
+
+    def add(self, post_id: str):
+        if post_id in self:
+            return
+        if self.current.count >= self.capacity:
+            self.previous = self.current
+            self.current = BloomFilter(self.current.num_bits, self.current.num_hashes)
+        self.current.add(post_id)
+        self.dirty = True
+
+    def __contains__(self, post_id: str) -> bool:
+        return post_id in self.current or (self.previous is not None and post_id in self.previous)
+
+    def merge(self, other: "SeenFilter") -> bool:
+        """
+        Fold in another copy of the same user's filter, generation by
+        generation. Returns True when this one now holds posts the other
+        copy lacks, i.e. it still has to be written back.
+        """
+        self.current.union(other.current)
+        if other.previous is not None:
+            if self.previous is None:
+                self.previous = BloomFilter.from_bytes(other.previous.to_bytes())
+            else:
+                self.previous.union(other.previous)
+        if self.current.bits != other.current.bits:
+            return True
+        return self.previous is not None and (other.previous is None or self.previous.bits != other.previous.bits)
+
+
+class SeenPostsStore:
+    """
+    Per-user SeenFilters cached in memory (LRU) and persisted as binary
+    fields in seen_posts. Impressions only touch memory; dirty filters are
+    written back as one bulk_write per flush interval. Workers write back
+    whole filters; with several workers the cache invalidator feeds each
+    stored filter to merge_stored, so a worker holding the same user folds
+    the other's impressions in and writes the union back.
+    """
+
+    def __init__(self, collection, interval: float = SEEN_FLUSH_INTERVAL, max_users: int = SEEN_CACHE_USERS):
+        self.collection = collection
+        self.interval = interval
+        self.max_users = max_users
+        self.filters: "OrderedDict[str, SeenFilter]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self, user_id: str) -> SeenFilter:
+        seen = self.filters.get(user_id)
+        if seen is not None:
+            self.filters.move_to_end(user_id)
+            return seen
+        # Concurrent requests for the same user share one load
+        if user_id in self._loading:
+            return await asyncio.shield(self._loading[user_id])
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        try:
+            doc = await self.collection.find_one({"_id": ObjectId(user_id)}, {"current": 1, "previous": 1})
+            seen = SeenFilter.from_doc(doc) if doc and doc.get("current") else SeenFilter.empty()
+            self.filters[user_id] = seen
+            future.set_result(seen)
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; retrieve it so asyncio does not warn
+            future.exception()
+            raise
+        finally:
+            del self._loading[user_id]
+        return seen
+
+    async def mark_seen(self, user_id: str, post_ids: Iterable[str]):
+        seen = await self.get(user_id)
+        for post_id in post_ids:
+            seen.add(post_id)
+        if seen.dirty:
+            self._schedule_flush()
+
+    def merge_stored(self, user_id: str, doc: dict):
+        """Fold a filter stored by another worker into this worker's copy, if it holds one"""
+        seen = self.filters.get(user_id)
+        if seen is None or not doc.get("current"):
+            return
+        # Our own writes come back too; merging them changes nothing
+        if seen.merge(SeenFilter.from_doc(doc)):
+            seen.dirty = True
+            self._schedule_flush()
+
+    def forget_clean(self):
+        """Drop cached filters with nothing to write, so they are reloaded from the database"""
+        for user_id in [user_id for user_id, seen in self.filters.items() if not seen.dirty]:
+            del self.filters[user_id]
+
+    def _schedule_flush(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def flush(self) -> int:
+        """Write dirty filters back; returns the number of users written"""
+        now = datetime.utcnow()
+        dirty = [(user_id, seen) for user_id, seen in self.filters.items() if seen.dirty]
+        for _, seen in dirty:
+            seen.dirty = False
+        requests = [
+            UpdateOne({"_id": ObjectId(user_id)}, {"$set": {**seen.to_doc(), "updatedAt": now}}, upsert=True)
+            for user_id, seen in dirty
+        ]
+        if requests:
+            try:
+                await self.collection.bulk_write(requests, ordered=False)
+            except Exception:
+                # Keep them dirty so the next flush retries
+                for _, seen in dirty:
+                    seen.dirty = True
+                raise
+        self._evict()
+        return len(requests)
+
+    def _evict(self):
+        """Drop least recently used clean filters beyond the cache size"""
+        excess = len(self.filters) - self.max_users
+        for user_id in list(self.filters):
+            if excess <= 0:
+                break
+            if not self.filters[user_id].dirty:
+                del self.filters[user_id]
+                excess -= 1
+
+    async def _run(self):
+        while any(seen.dirty for seen in self.filters.values()):
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush seen-post filters")
+
+    async def stop(self):
+        """Flush what is left before shutdown"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# Create store instance
+seen_posts = SeenPostsStore(seen_posts_collection)
@@ -1,13 +1,28 @@
 from fastapi import FastAPI, APIRouter
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from admission import AdmissionControlMiddleware
+from deadlines import DeadlineMiddleware, DeadlineExceeded, deadline_exceeded_handler
+from idempotency import IdempotencyMiddleware
+from pymongo.errors import ExecutionTimeout
+from database import db_manager, user_stats, notification_queue
+from realtime import hub
+from deletion import deletion_cascade
+from reconcile import reconciler
+from usernames import username_registry
+from tasks import task_runner
+from archive import archiver
+from leaderboard import leaderboard_job
+from reposts import repost_index
+from invalidation import cache_invalidator
+from seen import seen_posts
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 
 # Import route modules
-from routes import auth, posts, votes, comments, users, upload
+from routes import auth, posts, votes, comments, users, upload, live, feed, admin, batch, categories, tags, leaderboard, notifications
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -35,10 +50,33 @@ api_router.include_router(votes.router)
 api_router.include_router(comments.router)
 api_router.include_router(users.router)
 api_router.include_router(upload.router)
+api_router.include_router(live.router)
+api_router.include_router(feed.router)
+api_router.include_router(admin.router)
+api_router.include_router(batch.router)
+api_router.include_router(categories.router)
+api_router.include_router(tags.router)
+api_router.include_router(leaderboard.router)
+api_router.include_router(notifications.router)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Timed-out queries answer 504 instead of a generic 500
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+app.add_exception_handler(ExecutionTimeout, deadline_exceeded_handler)
+
+# Innermost: the latency budget starts once a request has been admitted
+app.add_middleware(DeadlineMiddleware)
+# Replays skip the handler, and with it the latency budget
+app.add_middleware(IdempotencyMiddleware)
+
+# Admission control sits inside CORS so load-shedding responses still carry CORS headers
+app.add_middleware(
+    AdmissionControlMiddleware,
+    enabled=os.environ.get("ADMISSION_CONTROL", "true").lower() == "true"
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -54,6 +92,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    await db_manager.create_indexes()
+
+@app.on_event("startup")
+async def start_background_workers():
+    task_runner.start()
+    deletion_cascade.start()
+    reconciler.start()
+    archiver.start()
+    leaderboard_job.start()
+    username_registry.start()
+    repost_index.start()
+    # Only with MULTI_WORKER=true; needs MONGO_URL to point at a replica set
+    cache_invalidator.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Stop following other workers' writes, then drain queued side effects; they may still write user stats
+    await cache_invalidator.stop()
+    await task_runner.stop()
+    await deletion_cascade.stop()
+    await reconciler.stop()
+    await archiver.stop()
+    await leaderboard_job.stop()
+    await username_registry.stop()
+    await repost_index.stop()
+    await seen_posts.stop()
+    await notification_queue.stop()
+    await user_stats.stop()
+    await hub.stop()
     client.close()
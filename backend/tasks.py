@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Task runner configuration
+TASK_WORKERS = int(os.environ.get("TASK_WORKERS", "4"))
+TASK_QUEUE_SIZE = int(os.environ.get("TASK_QUEUE_SIZE", "10000"))
+TASK_MAX_RETRIES = int(os.environ.get("TASK_MAX_RETRIES", "3"))
+TASK_RETRY_BACKOFF = float(os.environ.get("TASK_RETRY_BACKOFF", "0.2"))
+# How long enqueue waits for room before running the task inline instead
+TASK_ENQUEUE_TIMEOUT = float(os.environ.get("TASK_ENQUEUE_TIMEOUT", "0.05"))
+TASK_DRAIN_TIMEOUT = float(os.environ.get("TASK_DRAIN_TIMEOUT", "10"))
+
+
+class Task:
+    __slots__ = ("name", "key", "retry", "func", "args", "kwargs", "attempts", "enqueued_at")
+
+    def __init__(
+        self, name: str, key: Optional[str], retry: bool, func: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict
+    ):
+        self.name = name
+        self.key = key
+        self.retry = retry
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+        self.enqueued_at = time.perf_counter()
+
+
+class TaskRunner:
+    """
+    Bounded asyncio queue drained by a fixed pool of workers, for side
+    effects that do not need to finish before the response is sent.
+
+    Failed tasks are retried with exponential backoff unless they are not
+    safe to repeat. When the queue is full, enqueue waits briefly and then
+    runs the task in the caller, so overload slows requests down instead of
+    dropping writes. On shutdown the queue is drained before the database
+    client closes.
+    """
+
+    def __init__(self, workers: int = TASK_WORKERS, queue_size: int = TASK_QUEUE_SIZE):
+        self.num_workers = workers
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.metrics: Dict[str, Dict[str, float]] = {}
+        # Keys of queued tasks that have not started yet
+        self.pending_keys: set = set()
+
+    def _metric(self, name: str) -> Dict[str, float]:
+        if name not in self.metrics:
+            self.metrics[name] = {
+                "enqueued": 0, "coalesced": 0, "completed": 0, "failed": 0, "retried": 0,
+                "inline": 0, "totalRunMs": 0.0, "maxQueueWaitMs": 0.0,
+            }
+        return self.metrics[name]
+
+    @property
+    def running(self) -> bool:
+        return bool(self.workers)
+
+    def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.workers = [
+            asyncio.get_running_loop().create_task(self._worker(i))
+            for i in range(self.num_workers)
+        ]
+
+    async def stop(self, timeout: float = TASK_DRAIN_TIMEOUT):
+        """Drain queued tasks, then stop the workers"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Task queue not drained on shutdown; %d tasks dropped", self.queue.qsize())
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queue = None
+
+    async def enqueue(
+        self, name: str, func: Callable[..., Awaitable[Any]], *args,
+        key: Optional[str] = None, retry: bool = True, **kwargs
+    ):
+        """
+        Schedule func(*args, **kwargs) to run after the current request. Tasks
+        with a key are idempotent recomputations: if one with the same key is
+        still waiting in the queue, the new one is dropped. Pass retry=False
+        for writes that are not safe to repeat, such as a raw $inc: an error
+        may be raised after the server already applied it.
+        """
+        metric = self._metric(name)
+        if key is not None and key in self.pending_keys:
+            metric["coalesced"] += 1
+            return
+        task = Task(name, key, retry, func, args, kwargs)
+        if not self.running:
+            # No runner (scripts, tests): keep the old inline behaviour
+            metric["inline"] += 1
+            await self._execute(task)
+            return
+        try:
+            self.queue.put_nowait(task)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(task), TASK_ENQUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Backpressure: the caller pays for the work itself
+                metric["inline"] += 1
+                await self._execute(task)
+                return
+        if key is not None:
+            self.pending_keys.add(key)
+        metric["enqueued"] += 1
+
+    async def _execute(self, task: Task) -> bool:
+        metric = self._metric(task.name)
+        while True:
+            task.attempts += 1
+            started = time.perf_counter()
+            try:
+                await task.func(*task.args, **task.kwargs)
+            except Exception:
+                if not task.retry or task.attempts > TASK_MAX_RETRIES:
+                    metric["failed"] += 1
+                    logger.exception("Task %s failed after %d attempts", task.name, task.attempts)
+                    return False
+                metric["retried"] += 1
+                await asyncio.sleep(TASK_RETRY_BACKOFF * (2 ** (task.attempts - 1)))
+                continue
+            metric["completed"] += 1
+            metric["totalRunMs"] += (time.perf_counter() - started) * 1000
+            return True
+
+    async def _worker(self, worker_id: int):
+        while True:
+            task = await self.queue.get()
+            # Changes made after this point need a fresh run
+            self.pending_keys.discard(task.key)
+            try:
+                wait_ms = (time.perf_counter() - task.enqueued_at) * 1000
+                metric = self._metric(task.name)
+                metric["maxQueueWaitMs"] = max(metric["maxQueueWaitMs"], wait_ms)
+                await self._execute(task)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Task worker %d crashed on %s", worker_id, task.name)
+            finally:
+                self.queue.task_done()
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": len(self.workers),
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "capacity": self.queue_size,
+            "tasks": {
+                name: {**m, "totalRunMs": round(m["totalRunMs"], 2), "maxQueueWaitMs": round(m["maxQueueWaitMs"], 2)}
+                for name, m in self.metrics.items()
+            },
+        }
+
+
+# Create task runner instance
+task_runner = TaskRunner()
@@ -0,0 +1,43 @@
+from typing import Dict, Hashable, List, Tuple
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K sketch (Metwally et al.). Tracks at most `capacity`
+    items; a new item arriving when the sketch is full replaces the one with
+    the smallest count and inherits that count as its error. Any item whose
+    true count exceeds total / capacity is guaranteed to be tracked, and a
+    reported count overestimates the true one by at most its error.
+    """
+
+    __slots__ = ("capacity", "counts", "errors", "total")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        self.errors: Dict[Hashable, float] = {}
+        self.total = 0.0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, item: Hashable, weight: float = 1.0):
+        self.total += weight
+        if item in self.counts:
+            self.counts[item] += weight
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0.0
+            return
+        # Evictions only happen for untracked items, and capacities are small
+        victim = min(self.counts, key=self.counts.__getitem__)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[item] = floor + weight
+        self.errors[item] = floor
+
+    def top(self, k: int) -> List[Tuple[Hashable, float, float]]:
+        """The k largest (item, count, error) triples, largest first"""
+        ranked = sorted(self.counts.items(), key=lambda entry: entry[1], reverse=True)[:k]
+        return [(item, count, self.errors[item]) for item, count in ranked]
@@ -0,0 +1,62 @@
+import os
+import time
+from typing import Iterable, List, Optional
+from topk import SpaceSaving
+
+# Trending tag configuration
+TRENDING_WINDOW = float(os.environ.get("TRENDING_TAGS_WINDOW", "3600"))
+TRENDING_CAPACITY = int(os.environ.get("TRENDING_TAGS_CAPACITY", "1000"))
+# A new post says more about a tag than a single vote on an older one
+TRENDING_POST_WEIGHT = float(os.environ.get("TRENDING_TAGS_POST_WEIGHT", "3"))
+
+
+class TrendingTags:
+    """
+    Heavy-hitter tags over recent post creations and votes, kept in two
+    Space-Saving sketches that rotate every window. Queries add the previous
+    window's counts, faded out linearly as the current window fills, so the
+    ranking moves smoothly instead of resetting at each rotation. The
+    sketches live in memory per worker; each worker ranks the traffic it
+    served, which is a fair sample behind a load balancer.
+    """
+
+    def __init__(self, window: float = TRENDING_WINDOW, capacity: int = TRENDING_CAPACITY):
+        self.window = window
+        self.capacity = capacity
+        self.current = SpaceSaving(capacity)
+        self.previous: Optional[SpaceSaving] = None
+        self.started_at = time.monotonic()
+
+    def _rotate(self, now: float):
+        elapsed = now - self.started_at
+        if elapsed < self.window:
+            return
+        # After more than one idle window the previous counts are stale too
+        self.previous = self.current if elapsed < 2 * self.window else None
+        self.current = SpaceSaving(self.capacity)
+        self.started_at = now
+
+    def record(self, tags: Iterable[str], weight: float = 1.0):
+        if weight <= 0:
+            return
+        self._rotate(time.monotonic())
+        for tag in tags:
+            self.current.add(tag, weight)
+
+    def record_post(self, tags: Iterable[str]):
+        self.record(tags, TRENDING_POST_WEIGHT)
+
+    def top(self, k: int) -> List[dict]:
+        now = time.monotonic()
+        self._rotate(now)
+        fade = 1 - (now - self.started_at) / self.window
+        scores = {tag: count for tag, count, _ in self.current.top(self.capacity)}
+        if self.previous is not None and fade > 0:
+            for tag, count, _ in self.previous.top(self.capacity):
+                scores[tag] = scores.get(tag, 0) + count * fade
+        ranked = sorted(scores.items(), key=lambda entry: entry[1], reverse=True)[:k]
+        return [{"tag": tag, "score": round(score, 2)} for tag, score in ranked]
+
+
+# Create trending tags instance
+trending_tags = TrendingTags()
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Denormalized per-author counters kept on user documents
+STAT_FIELDS = ("karma", "upvotesReceived", "postCount", "commentCount")
+
+
+class UserStatsBuffer:
+    """
+    Applies $inc deltas to user stats. With an interval of 0 every delta is
+    written immediately; otherwise deltas are summed per user in memory and
+    flushed as one bulk_write per interval, so a viral post costs one author
+    update per interval instead of one per vote.
+
+    A failed flush never writes a delta twice: after a BulkWriteError only
+    the updates the server reported as failed are kept for the next flush,
+    and after any other error (which may have applied some or all of the
+    batch) the deltas are dropped and left to the reconciler.
+    """
+
+    def __init__(self, collection, interval: float = 0.0):
+        self.collection = collection
+        self.interval = interval
+        self.pending: Dict[ObjectId, Dict[str, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def add(self, user_id, **deltas: int):
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        user_id = ObjectId(user_id)
+        if self.interval <= 0:
+            await self.collection.update_one({"_id": user_id}, {"$inc": deltas})
+            return
+
+        self._merge(user_id, deltas)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def flush(self) -> int:
+        """Write all buffered deltas; returns the number of users updated"""
+        pending, self.pending = self.pending, {}
+        user_ids = [user_id for user_id, deltas in pending.items() if any(deltas.values())]
+        requests = [UpdateOne({"_id": user_id}, {"$inc": pending[user_id]}) for user_id in user_ids]
+        if requests:
+            try:
+                await self.collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # The rest of the batch was applied; only the failed updates go again. Any
+                # other error may have applied some or all of it, so nothing is kept
+                for error in e.details["writeErrors"]:
+                    self._merge(user_ids[error["index"]], pending[user_ids[error["index"]]])
+                raise
+        return len(requests)
+
+    def _merge(self, user_id: ObjectId, deltas: Dict[str, int]):
+        current = self.pending.setdefault(user_id, {})
+        for field, value in deltas.items():
+            current[field] = current.get(field, 0) + value
+
+    async def _run(self):
+        while self.pending:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush user stats; deltas not kept are left to the reconciler")
+
+    async def stop(self):
+        """Flush what is left before shutdown"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
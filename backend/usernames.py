@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+from bloom import BloomFilter
+from database import users_collection
+
+logger = logging.getLogger(__name__)
+
+# Username availability configuration
+FALSE_POSITIVE_RATE = float(os.environ.get("USERNAME_FILTER_FP_RATE", "0.01"))
+MIN_CAPACITY = 100000
+# Other workers' signups are only seen after a rebuild
+REBUILD_INTERVAL = float(os.environ.get("USERNAME_FILTER_REBUILD_INTERVAL", "600"))
+
+
+class UsernameRegistry:
+    """
+    In-memory Bloom filter of taken usernames. A miss proves the name is
+    free without touching Mongo; only possible hits (taken names and the
+    configured false-positive rate) fall through to an indexed lookup.
+    """
+
+    def __init__(self):
+        self.filter: Optional[BloomFilter] = None
+        self._task: Optional[asyncio.Task] = None
+        self.filter_hits = 0
+        self.db_checks = 0
+
+    async def rebuild(self):
+        """Load every username into a freshly sized filter"""
+        started = time.perf_counter()
+        total = await users_collection.estimated_document_count()
+        bloom = BloomFilter.for_capacity(max(MIN_CAPACITY, total * 2), FALSE_POSITIVE_RATE)
+        async for user in users_collection.find({}, {"username": 1, "_id": 0}, batch_size=10000):
+            bloom.add(user["username"])
+        self.filter = bloom
+        logger.info(
+            "Username filter built with %d names in %.2fs (%d KiB)",
+            bloom.count, time.perf_counter() - started, len(bloom.bits) // 1024
+        )
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Failed to build username filter")
+            await asyncio.sleep(REBUILD_INTERVAL)
+
+    def add(self, username: str):
+        if self.filter is not None:
+            self.filter.add(username)
+
+    async def is_available(self, username: str) -> bool:
+        if self.filter is not None and username not in self.filter:
+            self.filter_hits += 1
+            return True
+        self.db_checks += 1
+        user = await users_collection.find_one({"username": username}, {"_id": 1})
+        return user is None
+
+
+# Create registry instance
+username_registry = UsernameRegistry()
@@ -0,0 +1,89 @@
+"""
+Shared helpers for the benchmark scripts: environment setup, latency
+statistics and JSON result files.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+RESULTS_DIR = BENCH_DIR / "results"
+
+DEFAULT_MONGO_URL = "mongodb://localhost:27017"
+DEFAULT_DB_NAME = "fleak_bench"
+BENCH_PASSWORD = "benchpass123"
+
+
+def setup_backend_env(mongo_url: str = None, db_name: str = None):
+    """Point the backend at the benchmark database and make it importable"""
+    os.environ["MONGO_URL"] = mongo_url or os.environ.get("MONGO_URL", DEFAULT_MONGO_URL)
+    os.environ["DB_NAME"] = db_name or os.environ.get("BENCH_DB_NAME", DEFAULT_DB_NAME)
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    # All benchmark clients share one address, so per-client throttling would dominate
+    os.environ.setdefault("ADMISSION_USER_RATE", "1000000")
+    os.environ.setdefault("ADMISSION_USER_BURST", "1000000")
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies_ms: List[float], errors: int, elapsed_s: float) -> Dict[str, Any]:
+    """Build the per-endpoint summary stored in result files"""
+    values = sorted(latencies_ms)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+        "mean_ms": round(sum(values) / count, 3) if count else 0.0,
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, Any]]):
+    """Pretty-print endpoint summaries"""
+    print(f"\n{title}")
+    print("-" * 92)
+    print(f"{'endpoint':<24}{'reqs':>8}{'errs':>7}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>11}")
+    for name, s in rows.items():
+        print(
+            f"{name:<24}{s['requests']:>8}{s['errors']:>7}{s['rps']:>10.1f}"
+            f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>11.2f}"
+        )
+
+
+def save_results(name: str, payload: Dict[str, Any], output: str = None) -> Path:
+    """Write a result document to benchmarks/results (or an explicit path)"""
+    payload = dict(payload)
+    payload.setdefault("meta", {})
+    payload["meta"].update({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    })
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+    print(f"\nResults written to {path}")
+    return path
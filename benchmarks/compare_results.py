@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files.
+
+    python benchmarks/compare_results.py results/load-A.json results/load-B.json
+"""
+
+import argparse
+import json
+
+METRICS = ["rps", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def pct_change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(baseline: dict, candidate: dict):
+    for mode, runs in candidate.get("runs", {}).items():
+        base_runs = baseline.get("runs", {}).get(mode)
+        if not base_runs:
+            continue
+        print(f"\n{mode}")
+        print("-" * 100)
+        print(f"{'endpoint':<18}" + "".join(f"{m:>27}" for m in METRICS))
+        for name, stats in runs.items():
+            base = base_runs.get(name)
+            if not base:
+                continue
+            cells = []
+            for metric in METRICS:
+                cells.append(f"{base[metric]:>8.1f} -> {stats[metric]:>8.1f} {pct_change(base[metric], stats[metric]):>7}")
+            print(f"{name:<18}" + "".join(f"{c:>27}" for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Leaderboard job runtime: columnar NumPy group-bys against Mongo $group.
+
+Computes the same boards both ways on a seeded database: the leaderboard
+job's path (stream posts and votes into NumPy arrays, then bincount), and
+one aggregation pipeline per board. Reports each side's runtime, split into
+load and compute for the NumPy path, and checks that the boards agree.
+Nothing is written to the leaderboards collection.
+
+    python benchmarks/seed_data.py --posts 200000 --votes 2000000
+    python benchmarks/leaderboard_bench.py --runs 3
+
+--compute-only times compute_boards alone on synthetic columns of the
+given sizes, without a database, so the NumPy side can be measured where
+no mongod is reachable. It says nothing about the $group side.
+
+    python benchmarks/leaderboard_bench.py --compute-only --posts 200000 --votes 2000000
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from common import save_results, setup_backend_env
+
+
+async def group_boards(size: int, now: datetime) -> dict:
+    """The same boards as compute_boards, as one aggregation per board"""
+    from database import posts_collection, posts_archive_collection, votes_collection
+    from leaderboard import PERIODS
+
+    all_posts = [
+        {"$match": {"deleted": {"$ne": True}}},
+        {"$unionWith": {"coll": posts_archive_collection.name, "pipeline": [{"$match": {"deleted": {"$ne": True}}}]}},
+    ]
+    boards = {}
+    # Unlike the job, these do not drop votes on deleted posts; seeded corpora have none
+    for period, span in PERIODS.items():
+        boards[f"posts:{period}"] = await votes_collection.aggregate([
+            {"$match": {"createdAt": {"$gte": now - span}}},
+            {"$group": {"_id": "$postId", "score": {"$sum": {"$cond": [{"$eq": ["$voteType", "up"]}, 1, -1]}}}},
+            {"$match": {"score": {"$gt": 0}}},
+            {"$sort": {"score": -1}},
+            {"$limit": size},
+        ], allowDiskUse=True).to_list(None)
+    boards["posts:all"] = await posts_collection.aggregate(all_posts + [
+        {"$match": {"score": {"$gt": 0}}},
+        {"$sort": {"score": -1}},
+        {"$limit": size},
+        {"$project": {"score": 1}},
+    ], allowDiskUse=True).to_list(None)
+    boards["creators"] = await posts_collection.aggregate(all_posts + [
+        {"$group": {"_id": "$authorId", "score": {"$sum": "$score"}, "postCount": {"$sum": 1}}},
+        {"$match": {"score": {"$gt": 0}}},
+        {"$sort": {"score": -1}},
+        {"$limit": size},
+    ], allowDiskUse=True).to_list(None)
+    boards["categories"] = await posts_collection.aggregate(all_posts + [
+        {"$group": {
+            "_id": "$category",
+            "posts": {"$sum": 1},
+            "views": {"$sum": "$views"},
+            "votes": {"$sum": {"$add": ["$upvotes", "$downvotes"]}},
+            "comments": {"$sum": "$commentCount"},
+        }},
+        {"$sort": {"posts": -1}},
+    ], allowDiskUse=True).to_list(None)
+    return boards
+
+
+def synthetic_columns(posts: int, votes: int, now: datetime, seed: int) -> tuple:
+    """Post and vote columns shaped like LeaderboardJob.load's, drawn at random"""
+    import numpy as np
+    from leaderboard import PERIODS
+
+    rng = np.random.default_rng(seed)
+
+    def object_ids(n: int) -> np.ndarray:
+        return np.array([bytes(row) for row in rng.integers(0, 256, (n, 12), dtype=np.uint8)], dtype="S12")
+
+    post_ids = object_ids(posts)
+    authors = object_ids(max(1, posts // 20))
+    upvotes = rng.poisson(20, posts)
+    downvotes = rng.poisson(5, posts)
+    post_columns = {
+        "id": post_ids,
+        "author": authors[rng.integers(0, len(authors), posts)],
+        "category": np.array(["funny", "gaming", "wtf", "aww", "news"], dtype=object)[rng.integers(0, 5, posts)],
+        "score": (upvotes - downvotes).astype("int64"),
+        "votes": (upvotes + downvotes).astype("int64"),
+        "comments": rng.poisson(3, posts).astype("int64"),
+        "views": rng.poisson(200, posts).astype("int64"),
+    }
+    span_ms = int(max(PERIODS.values()) / timedelta(milliseconds=1))
+    vote_columns = {
+        "post": post_ids[rng.integers(0, posts, votes)],
+        "value": rng.choice(np.array([1, -1], dtype="int64"), votes, p=[0.8, 0.2]),
+        "createdAt": np.datetime64(now, "ms") - rng.integers(0, span_ms, votes).astype("timedelta64[ms]"),
+    }
+    return post_columns, vote_columns
+
+
+def run_compute_only(args):
+    """Time compute_boards without a database"""
+    from leaderboard import compute_boards
+
+    now = datetime.utcnow()
+    posts, votes = synthetic_columns(args.posts, args.votes, now, args.seed)
+    runs = []
+    for run in range(args.runs):
+        started = time.perf_counter()
+        compute_boards(posts, votes, now, args.size)
+        runs.append({
+            "posts": args.posts,
+            "votes": args.votes,
+            "numpyComputeSeconds": round(time.perf_counter() - started, 3),
+        })
+        print(f"run {run + 1}: {args.posts} posts, {args.votes} votes  compute {runs[-1]['numpyComputeSeconds']:.3f}s")
+    save_results("leaderboard-compute", {"config": vars(args), "runs": runs}, args.output)
+
+
+def check_agreement(numpy_boards: dict, group_boards: dict):
+    """Scores must match rank by rank (ties may order differently)"""
+    for board in ("posts:day", "posts:week", "posts:all", "creators"):
+        ours = [entry[1] for entry in numpy_boards[board]]
+        theirs = [doc["score"] for doc in group_boards[board]]
+        if ours != theirs:
+            raise SystemExit(f"Boards disagree on {board}")
+    ours = {c["category"]: (c["posts"], c["views"], c["votes"], c["comments"]) for c in numpy_boards["categories"]}
+    theirs = {c["_id"] or "": (c["posts"], c["views"], c["votes"], c["comments"]) for c in group_boards["categories"]}
+    if ours != theirs:
+        raise SystemExit("Boards disagree on categories")
+
+
+async def main(args):
+    setup_backend_env(args.mongo_url, args.db_name)
+    if args.compute_only:
+        run_compute_only(args)
+        return
+    from leaderboard import LeaderboardJob, compute_boards
+
+    job = LeaderboardJob(size=args.size)
+    runs = []
+    for run in range(args.runs):
+        now = datetime.utcnow()
+        started = time.perf_counter()
+        posts, votes = await job.load(now, args.chunk_size)
+        loaded = time.perf_counter()
+        ours = compute_boards(posts, votes, now, args.size)
+        computed = time.perf_counter()
+        theirs = await group_boards(args.size, now)
+        grouped = time.perf_counter()
+        check_agreement(ours, theirs)
+
+        runs.append({
+            "posts": len(posts["id"]),
+            "votes": len(votes["post"]),
+            "numpyLoadSeconds": round(loaded - started, 3),
+            "numpyComputeSeconds": round(computed - loaded, 3),
+            "numpyTotalSeconds": round(computed - started, 3),
+            "groupSeconds": round(grouped - computed, 3),
+        })
+        r = runs[-1]
+        print(
+            f"run {run + 1}: {r['posts']} posts, {r['votes']} votes  "
+            f"numpy {r['numpyTotalSeconds']:.2f}s (load {r['numpyLoadSeconds']:.2f}s, "
+            f"compute {r['numpyComputeSeconds']:.3f}s)  $group {r['groupSeconds']:.2f}s"
+        )
+    save_results("leaderboard", {"config": vars(args), "runs": runs}, args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the leaderboard job against $group")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--db-name", default=None)
+    parser.add_argument("--size", type=int, default=100, help="Entries per board")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--compute-only", action="store_true", help="Time compute_boards on synthetic columns, no database")
+    parser.add_argument("--posts", type=int, default=200000, help="Synthetic posts (--compute-only)")
+    parser.add_argument("--votes", type=int, default=2000000, help="Synthetic votes (--compute-only)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail-latency benchmark for the backend API.
+
+Drives the FastAPI app with concurrent async clients either in-process
+(ASGI transport, no sockets) or over a local uvicorn server, and reports
+p50/p95/p99 and requests per second for every endpoint scenario. Seed the
+database first with seed_data.py.
+
+    python benchmarks/load_test.py --mode both --concurrency 32 --duration 15
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+from common import BACKEND_DIR, BENCH_PASSWORD, print_table, save_results, setup_backend_env, summarize
+
+FEED_SECTIONS = ["hot", "trending", "fresh", "top"]
+
+# A request factory returns (method, path, json_body, headers)
+RequestSpec = Tuple[str, str, dict, dict]
+
+
+class Workload:
+    """Request factories for every benchmarked endpoint"""
+
+    def __init__(self, post_ids: List[str], users: List[dict], tokens: Dict[str, str], zipf_s: float):
+        self.post_ids = post_ids
+        self.users = users
+        self.tokens = tokens
+        # Hot posts are requested more often, mirroring real traffic
+        weights = [1.0 / ((rank + 1) ** zipf_s) for rank in range(len(post_ids))]
+        total = sum(weights)
+        self.cum_weights = []
+        running = 0.0
+        for w in weights:
+            running += w / total
+            self.cum_weights.append(running)
+
+    def pick_post(self, rng: random.Random) -> str:
+        return rng.choices(self.post_ids, cum_weights=self.cum_weights, k=1)[0]
+
+    def auth_headers(self, rng: random.Random) -> dict:
+        user = rng.choice(self.users)
+        return {"Authorization": f"Bearer {self.tokens[user['id']]}"}
+
+    def scenarios(self) -> Dict[str, Callable[[random.Random], RequestSpec]]:
+        scenarios = {}
+        for section in FEED_SECTIONS:
+            scenarios[f"feed_{section}"] = (
+                lambda rng, section=section: ("GET", f"/api/posts?section={section}&limit=20&skip={rng.choice([0, 0, 0, 20, 40])}", None, {})
+            )
+        scenarios["post_detail"] = lambda rng: ("GET", f"/api/posts/{self.pick_post(rng)}", None, {})
+        scenarios["comments"] = lambda rng: ("GET", f"/api/comments/{self.pick_post(rng)}", None, {})
+        scenarios["vote"] = lambda rng: (
+            "POST", "/api/votes",
+            {"postId": self.pick_post(rng), "voteType": "up" if rng.random() < 0.8 else "down"},
+            self.auth_headers(rng),
+        )
+        scenarios["comment"] = lambda rng: (
+            "POST", "/api/comments",
+            {"postId": self.pick_post(rng), "text": f"bench comment {rng.randint(0, 1 << 30)}"},
+            self.auth_headers(rng),
+        )
+        scenarios["login"] = lambda rng: (
+            "POST", "/api/auth/login",
+            {"email": rng.choice(self.users)["email"], "password": BENCH_PASSWORD},
+            {},
+        )
+        return scenarios
+
+
+async def load_workload(args) -> Workload:
+    """Sample post ids and users from the seeded database"""
+    from auth import create_access_token
+    from database import db
+
+    posts = await db.posts.find({}, {"_id": 1}).sort("score", -1).limit(args.sample_posts).to_list(args.sample_posts)
+    users = await db.users.find({}, {"_id": 1, "email": 1}).limit(args.sample_users).to_list(args.sample_users)
+    if not posts or not users:
+        raise SystemExit("Benchmark database is empty - run benchmarks/seed_data.py first")
+
+    users = [{"id": str(u["_id"]), "email": u["email"]} for u in users]
+    tokens = {u["id"]: create_access_token({"sub": u["id"]}) for u in users}
+    return Workload([str(p["_id"]) for p in posts], users, tokens, args.zipf_s)
+
+
+async def run_scenario(client: httpx.AsyncClient, factory, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    """Run one scenario with a fixed number of closed-loop clients"""
+    latencies: List[float] = []
+    status_counts: Dict[str, int] = {}
+    errors = 0
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            method, path, body, headers = factory(rng)
+            t0 = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                code = str(response.status_code)
+            except httpx.HTTPError as e:
+                code = type(e).__name__
+            elapsed = (time.perf_counter() - t0) * 1000
+            if t0 < measure_from:
+                continue
+            status_counts[code] = status_counts.get(code, 0) + 1
+            if code.isdigit() and int(code) < 400:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    summary = summarize(latencies, errors, duration)
+    summary["status"] = status_counts
+    return summary
+
+
+async def run_suite(client: httpx.AsyncClient, workload: Workload, args) -> Dict[str, dict]:
+    results = {}
+    for name, factory in workload.scenarios().items():
+        if args.scenarios and name not in args.scenarios:
+            continue
+        results[name] = await run_scenario(client, factory, args.concurrency, args.duration, args.warmup, args.seed)
+        s = results[name]
+        print(f"  {name:<16} {s['rps']:>9.1f} rps  p50 {s['p50_ms']:.2f}ms  p99 {s['p99_ms']:.2f}ms  errors {s['errors']}")
+    return results
+
+
+async def run_inprocess(workload: Workload, args) -> Dict[str, dict]:
+    from server import app
+
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=None)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=args.timeout) as client:
+            return await run_suite(client, workload, args)
+
+
+async def wait_until_ready(base_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"uvicorn did not become ready at {base_url}")
+
+
+async def run_uvicorn(workload: Workload, args) -> Dict[str, dict]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    cmd = [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=str(BACKEND_DIR), env=os.environ.copy())
+    try:
+        await wait_until_ready(base_url, 30)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            return await run_suite(client, workload, args)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def main(args):
+    setup_backend_env(args.mongo_url, args.db_name)
+    workload = await load_workload(args)
+
+    runs = {}
+    if args.mode in ("inprocess", "both"):
+        print("\nIn-process (ASGI transport)")
+        runs["inprocess"] = await run_inprocess(workload, args)
+        print_table("In-process results (ms)", runs["inprocess"])
+    if args.mode in ("uvicorn", "both"):
+        print(f"\nuvicorn ({args.workers} worker(s))")
+        runs["uvicorn"] = await run_uvicorn(workload, args)
+        print_table("uvicorn results (ms)", runs["uvicorn"])
+
+    save_results(args.name, {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output",)},
+        "meta": {"db_name": os.environ["DB_NAME"]},
+        "runs": runs,
+    }, args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API load benchmark")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="both")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--db-name", default=None)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sample-posts", type=int, default=2000)
+    parser.add_argument("--sample-users", type=int, default=200)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--scenarios", nargs="*", help="Only run these scenarios")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--name", default="load", help="Result file prefix")
+    parser.add_argument("--output", default=None, help="Explicit result file path")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
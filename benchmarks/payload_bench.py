@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Payload size and server CPU per page: full responses vs sparse fieldsets.
+
+Requests run sequentially in-process, so process CPU time per request is
+the cost of handling that page (query dispatch, decoding, serialization)
+with no socket overhead. Seed the database first with seed_data.py.
+
+    python benchmarks/payload_bench.py --pages 200 --fields card
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import percentile, save_results, setup_backend_env
+
+
+async def measure(client: httpx.AsyncClient, paths: list) -> dict:
+    sizes, cpu_ms, wall_ms = [], [], []
+    for path in paths:
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        response = await client.get(path)
+        cpu_ms.append((time.process_time() - cpu0) * 1000)
+        wall_ms.append((time.perf_counter() - wall0) * 1000)
+        response.raise_for_status()
+        sizes.append(len(response.content))
+    cpu_ms.sort()
+    wall_ms.sort()
+    return {
+        "pages": len(paths),
+        "bytesPerPage": round(sum(sizes) / len(sizes)),
+        "cpuMsPerPage": round(sum(cpu_ms) / len(cpu_ms), 3),
+        "cpuP95Ms": round(percentile(cpu_ms, 95), 3),
+        "wallP50Ms": round(percentile(wall_ms, 50), 3),
+    }
+
+
+async def main(args):
+    setup_backend_env(args.mongo_url, args.db_name)
+    from database import db
+    from server import app
+
+    hot = await db.posts.find({"deleted": False}, {"_id": 1}).sort("commentCount", -1).limit(args.pages).to_list(args.pages)
+    if not hot:
+        raise SystemExit("Benchmark database is empty - run benchmarks/seed_data.py first")
+    post_ids = [str(p["_id"]) for p in hot]
+
+    feed_paths = [
+        f"/api/posts?section={section}&limit={args.limit}&skip={(i * args.limit) % 500}"
+        for i in range(args.pages)
+        for section in ("hot", "fresh")
+    ]
+    comment_paths = [f"/api/comments/{post_id}" for post_id in post_ids]
+    sparse = f"fields={args.fields}"
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            # Warm caches and connection pools before measuring
+            await measure(client, feed_paths[:10] + comment_paths[:10])
+            results["posts_full"] = await measure(client, feed_paths)
+            results["posts_sparse"] = await measure(client, [f"{p}&{sparse}" for p in feed_paths])
+            results["comments_full"] = await measure(client, comment_paths)
+            results["comments_sparse"] = await measure(client, [f"{p}?{sparse}" for p in comment_paths])
+
+    for name, r in results.items():
+        print(f"{name:<16} {r['bytesPerPage']:>9} B/page  {r['cpuMsPerPage']:>8.3f} ms CPU/page  p50 {r['wallP50Ms']:.2f}ms")
+    for kind in ("posts", "comments"):
+        full, lean = results[f"{kind}_full"], results[f"{kind}_sparse"]
+        print(
+            f"{kind}: {100 * (1 - lean['bytesPerPage'] / full['bytesPerPage']):.1f}% fewer bytes, "
+            f"{100 * (1 - lean['cpuMsPerPage'] / full['cpuMsPerPage']):.1f}% less CPU"
+        )
+    save_results("payload", {"config": vars(args), "results": results}, args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare full and sparse payloads")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--db-name", default=None)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--fields", default="card")
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Connection-scaling benchmark for the realtime hub.
+
+Simulates N live connections (one consumer coroutine each, exactly what an
+SSE stream runs) subscribed to Zipf-distributed hot posts, publishes score
+updates at a fixed rate, and reports flush cost, delivery lag and memory per
+connection for each connection count.
+
+    python benchmarks/realtime_bench.py --connections 1000 5000 20000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+from common import percentile, save_results, setup_backend_env
+
+
+async def run_level(connections: int, args) -> dict:
+    from realtime import RealtimeHub
+
+    rng = random.Random(args.seed)
+    post_ids = [f"{i:024x}" for i in range(args.posts)]
+    weights = [1.0 / ((rank + 1) ** 1.1) for rank in range(args.posts)]
+
+    tracemalloc.start()
+    base_mem = tracemalloc.get_traced_memory()[0]
+    hub = RealtimeHub(flush_interval=args.interval)
+    lags = []
+    received = 0
+    stop = asyncio.Event()
+
+    async def consumer(subscriber):
+        nonlocal received
+        while not stop.is_set():
+            batch = await subscriber.next_batch(0.5)
+            if not batch:
+                continue
+            received += len(batch)
+            # Sample lag from the first message only to keep consumers cheap
+            if len(lags) < 200000:
+                data = batch[0].split("data: ", 1)[1]
+                lags.append((time.time() - json.loads(data)["ts"]) * 1000)
+
+    subscribers = [
+        hub.subscribe(set(rng.choices(post_ids, weights=weights, k=args.posts_per_connection)))
+        for _ in range(connections)
+    ]
+    consumers = [asyncio.create_task(consumer(sub)) for sub in subscribers]
+    mem_per_conn = (tracemalloc.get_traced_memory()[0] - base_mem) / connections
+    # Tracing slows every allocation, so only measure the subscription footprint
+    tracemalloc.stop()
+
+    flush_times = []
+    original_flush = hub.flush
+
+    def timed_flush():
+        original_flush()
+        flush_times.append(hub.last_flush_ms)
+
+    hub.flush = timed_flush
+
+    period = 1.0 / args.rate
+    started = time.perf_counter()
+    deadline = started + args.duration
+    sent = 0
+    while time.perf_counter() < deadline:
+        post_id = rng.choices(post_ids, weights=weights, k=1)[0]
+        score = rng.randint(0, 10000)
+        hub.publish_score(post_id, score, 0, score)
+        sent += 1
+        # Publish in small bursts so the producer keeps up with high rates
+        if sent % 50 == 0:
+            await asyncio.sleep(max(0.0, started + sent * period - time.perf_counter()))
+    await asyncio.sleep(args.interval * 2)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*consumers, return_exceptions=True)
+    await hub.stop()
+
+    lags.sort()
+    flush_times.sort()
+    return {
+        "connections": connections,
+        "published": sent,
+        "coalesced": hub.coalesced,
+        "delivered": hub.delivered,
+        "received": received,
+        "deliveredPerSec": round(hub.delivered / elapsed, 1),
+        "droppedSubscribers": hub.dropped_subscribers,
+        "flushP50Ms": round(percentile(flush_times, 50), 3),
+        "flushP99Ms": round(percentile(flush_times, 99), 3),
+        "lagP50Ms": round(percentile(lags, 50), 2),
+        "lagP99Ms": round(percentile(lags, 99), 2),
+        "bytesPerConnection": int(mem_per_conn),
+    }
+
+
+async def main(args):
+    setup_backend_env()
+    results = []
+    for connections in args.connections:
+        level = await run_level(connections, args)
+        results.append(level)
+        print(
+            f"{connections:>7} conns  delivered {level['deliveredPerSec']:>10.0f}/s  "
+            f"flush p99 {level['flushP99Ms']:>8.2f}ms  lag p50 {level['lagP50Ms']:>7.1f}ms "
+            f"p99 {level['lagP99Ms']:>7.1f}ms  {level['bytesPerConnection']} B/conn"
+        )
+    save_results("realtime", {"config": vars(args), "levels": results}, args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark realtime hub fan-out")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--posts", type=int, default=500, help="Distinct hot posts")
+    parser.add_argument("--posts-per-connection", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=2000, help="Score updates published per second")
+    parser.add_argument("--interval", type=float, default=0.5, help="Hub flush interval in seconds")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Memory, allocations and CPU per feed page: Pydantic response models
+against the compact record types.
+
+Builds synthetic feed pages shaped like the feed aggregation's output (raw
+BSON documents with an embedded author) and turns each into response bytes
+two ways:
+
+  models   serialize_doc, PostResponse(**post) per post and what FastAPI
+           does with a response_model (dump, validate, dump to JSON mode,
+           json.dumps)
+  records  DatabaseManager.post_records and records.dumps
+
+Both outputs are checked to decode to the same JSON. No database is needed.
+
+    python benchmarks/records_bench.py --page-size 50 --pages 2000
+"""
+
+import argparse
+import copy
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import percentile, save_results, setup_backend_env
+
+
+def make_pages(rng: random.Random, count: int, page_size: int, authors: int) -> list:
+    from bson import ObjectId
+
+    users = [
+        {
+            "_id": ObjectId(),
+            "username": f"user{i}",
+            "avatar": f"https://example.test/avatars/{i}.png",
+            "followers": rng.randint(0, 5000),
+            "following": rng.randint(0, 500),
+            "upvotesReceived": rng.randint(0, 100000),
+            "karma": rng.randint(-100, 100000),
+            "postCount": rng.randint(0, 500),
+            "commentCount": rng.randint(0, 5000),
+            "joinDate": datetime(2024, 1, 1) + timedelta(seconds=rng.randint(0, 10 ** 8)),
+            "isActive": True,
+        }
+        for i in range(authors)
+    ]
+    pages = []
+    for _ in range(count):
+        page = []
+        for _ in range(page_size):
+            author = rng.choice(users)
+            upvotes, downvotes = rng.randint(0, 5000), rng.randint(0, 500)
+            page.append({
+                "_id": ObjectId(),
+                "title": "Meme title with a few words " + str(rng.randint(0, 10 ** 6)),
+                "mediaType": "image",
+                "mediaUrl": f"https://example.test/media/{rng.randint(0, 10 ** 6)}.jpg",
+                "category": rng.choice(["funny", "animals", "gaming"]),
+                "tags": rng.sample(["cat", "dog", "meme", "monday", "code"], rng.randint(0, 3)),
+                "nsfw": False,
+                "authorId": author["_id"],
+                "upvotes": upvotes,
+                "downvotes": downvotes,
+                "score": upvotes - downvotes,
+                "commentCount": rng.randint(0, 300),
+                "views": rng.randint(0, 10 ** 5),
+                "createdAt": datetime(2026, 1, 1) + timedelta(seconds=rng.randint(0, 10 ** 7)),
+                "version": 3,
+                "updatedAt": datetime(2026, 6, 1),
+                "author": dict(author),
+            })
+        pages.append(page)
+    return pages
+
+
+def build_models(docs: list):
+    from database import DatabaseManager
+    from models import PostResponse, PostsListResponse
+
+    posts = []
+    for post in docs:
+        post = DatabaseManager.serialize_doc(post)
+        post["author"] = DatabaseManager.serialize_doc(post["author"])
+        posts.append(PostResponse(**post))
+    return PostsListResponse(posts=posts, hasMore=True, total=1000)
+
+
+def encode_models(page) -> bytes:
+    from pydantic import TypeAdapter
+    from models import PostsListResponse
+
+    # What FastAPI's serialize_response does with a returned model
+    adapter = TypeAdapter(PostsListResponse)
+    value = adapter.validate_python(page.model_dump(by_alias=True))
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def build_records(docs: list):
+    from database import DatabaseManager
+
+    return {"posts": DatabaseManager.post_records(docs), "hasMore": True, "total": 1000}
+
+
+def encode_records(page) -> bytes:
+    from records import dumps
+
+    return dumps(page)
+
+
+def measure(pages: list, build, encode) -> dict:
+    """CPU per page, plus tracemalloc figures from a separate pass"""
+    # serialize_doc mutates its input, so every pass works on fresh copies
+    timings = []
+    for docs in copy.deepcopy(pages):
+        started = time.perf_counter()
+        encode(build(docs))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    retained, peaks, blocks = [], [], []
+    for docs in copy.deepcopy(pages[:200]):
+        gc.collect()
+        tracemalloc.start()
+        blocks_before = sys.getallocatedblocks()
+        page = build(docs)
+        retained.append(tracemalloc.get_traced_memory()[0])
+        blocks.append(sys.getallocatedblocks() - blocks_before)
+        encode(page)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del page
+    return {
+        "msPerPage": round(sum(timings) / len(timings), 4),
+        "p95Ms": round(percentile(timings, 95), 4),
+        # Intermediate representation held between the query and the encoder
+        "retainedBytesPerPage": round(sum(retained) / len(retained)),
+        "retainedBlocksPerPage": round(sum(blocks) / len(blocks)),
+        # High-water mark while building and encoding one page
+        "peakBytesPerPage": round(sum(peaks) / len(peaks)),
+    }
+
+
+def main(args):
+    setup_backend_env()
+    rng = random.Random(args.seed)
+    pages = make_pages(rng, args.pages, args.page_size, args.authors)
+
+    # Both paths must produce the same document
+    for docs in pages[:20]:
+        expected = json.loads(encode_models(build_models(copy.deepcopy(docs))))
+        actual = json.loads(encode_records(build_records(copy.deepcopy(docs))))
+        if expected != actual:
+            raise SystemExit("Record encoding differs from the response models")
+
+    results = {
+        "models": measure(pages, build_models, encode_models),
+        "records": measure(pages, build_records, encode_records),
+    }
+    for name, r in results.items():
+        print(
+            f"{name:<8} {r['msPerPage']:.3f} ms/page (p95 {r['p95Ms']:.3f})  "
+            f"retained {r['retainedBytesPerPage'] / 1024:.1f} KiB in {r['retainedBlocksPerPage']} blocks  "
+            f"peak {r['peakBytesPerPage'] / 1024:.1f} KiB"
+        )
+    save_results("records", {"config": vars(args), "results": results}, args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark response models against record types")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=200, help="Distinct authors the posts are drawn from")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Lookup latency of the repost detection index against index size.
+
+Builds the multi-index hash table from synthetic 64-bit media hashes (a mix
+of unrelated images and clusters of near-identical reposts), then times
+lookups for near-duplicate queries (hits) and unrelated images (misses).
+The smallest size is also checked against a linear scan for correctness.
+
+    python benchmarks/repost_bench.py --sizes 10000 100000 1000000 --distance 6
+"""
+
+import argparse
+import random
+import time
+
+from common import percentile, save_results, setup_backend_env
+
+
+def perturb(rng: random.Random, value: int, bits: int) -> int:
+    """Flip `bits` random bits, as recompression or a watermark would"""
+    for position in rng.sample(range(64), bits):
+        value ^= 1 << position
+    return value
+
+
+def generate(rng: random.Random, size: int, cluster_share: float) -> list:
+    """Unrelated hashes plus clusters of reposts around a few originals"""
+    hashes = []
+    while len(hashes) < size:
+        original = rng.getrandbits(64)
+        hashes.append(original)
+        if rng.random() < cluster_share:
+            hashes.extend(perturb(rng, original, rng.randint(1, 4)) for _ in range(rng.randint(1, 8)))
+    return hashes[:size]
+
+
+def time_queries(index, queries: list, distance: int) -> tuple:
+    latencies, matches = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        matches += len(index.search(query, distance))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return latencies, matches
+
+
+def run_size(size: int, args) -> dict:
+    from hashindex import MultiIndexHashTable
+
+    rng = random.Random(args.seed)
+    hashes = generate(rng, size, args.cluster_share)
+    index = MultiIndexHashTable(bits=64, chunks=args.chunks)
+    started = time.perf_counter()
+    for i, value in enumerate(hashes):
+        index.add(i, value)
+    build_s = time.perf_counter() - started
+
+    hit_queries = [perturb(rng, rng.choice(hashes), rng.randint(0, args.distance)) for _ in range(args.queries)]
+    miss_queries = [rng.getrandbits(64) for _ in range(args.queries)]
+    hit_ms, hit_matches = time_queries(index, hit_queries, args.distance)
+    miss_ms, _ = time_queries(index, miss_queries, args.distance)
+
+    level = {
+        "size": size,
+        "buildSeconds": round(build_s, 2),
+        "hitP50Ms": round(percentile(hit_ms, 50), 4),
+        "hitP99Ms": round(percentile(hit_ms, 99), 4),
+        "missP50Ms": round(percentile(miss_ms, 50), 4),
+        "missP99Ms": round(percentile(miss_ms, 99), 4),
+        "matchesPerHit": round(hit_matches / len(hit_queries), 2),
+    }
+
+    if size <= args.verify_up_to:
+        # Linear scan is the reference answer and the baseline latency
+        sample = hit_queries[:200]
+        scan_ms = []
+        for query in sample:
+            started = time.perf_counter()
+            expected = {i for i, value in enumerate(hashes) if (value ^ query).bit_count() <= args.distance}
+            scan_ms.append((time.perf_counter() - started) * 1000)
+            found = {item for item, _ in index.search(query, args.distance)}
+            if found != expected:
+                raise SystemExit(f"Index disagrees with linear scan at size {size}")
+        scan_ms.sort()
+        level["linearScanP50Ms"] = round(percentile(scan_ms, 50), 3)
+    return level
+
+
+def main(args):
+    setup_backend_env()
+    results = []
+    for size in args.sizes:
+        level = run_size(size, args)
+        results.append(level)
+        scan = f"  linear scan p50 {level['linearScanP50Ms']:.2f}ms" if "linearScanP50Ms" in level else ""
+        print(
+            f"{size:>9} hashes  build {level['buildSeconds']:>6.2f}s  "
+            f"hit p50 {level['hitP50Ms']:.3f}ms p99 {level['hitP99Ms']:.3f}ms  "
+            f"miss p50 {level['missP50Ms']:.3f}ms p99 {level['missP99Ms']:.3f}ms{scan}"
+        )
+    save_results("repost", {"config": vars(args), "levels": results}, args.output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark repost hash lookups")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--distance", type=int, default=6, help="Maximum Hamming distance")
+    parser.add_argument("--chunks", type=int, default=4, help="Substrings per hash")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--cluster-share", type=float, default=0.1, help="Share of originals that get reposted")
+    parser.add_argument("--verify-up-to", type=int, default=100000, help="Check against a linear scan up to this size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Synthetic corpus generator for benchmarks.
+
+Seeds a local mongod with users, posts whose votes follow a Zipfian
+distribution, and comment threads with one level of replies. The same
+--seed always produces the same corpus, so runs are comparable.
+
+    python benchmarks/seed_data.py --users 2000 --posts 20000 --votes 400000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from common import BENCH_PASSWORD, setup_backend_env
+
+CATEGORIES = ["funny", "animals", "gaming", "wtf", "anime", "sports", "science", "food", "movies", "music"]
+MEDIA_TYPES = ["image", "image", "image", "gif", "video"]
+WORDS = (
+    "cat dog meme when you the finally monday weekend boss code bug deploy "
+    "coffee pizza game level up fail win epic tiny huge friday mood reaction"
+).split()
+
+
+def zipf_weights(n: int, exponent: float) -> list:
+    """Unnormalized Zipf weights for ranks 1..n"""
+    return [1.0 / ((rank + 1) ** exponent) for rank in range(n)]
+
+
+def random_text(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+class CorpusGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime.utcnow()
+
+    def make_users(self, password_hash: str) -> list:
+        users = []
+        for i in range(self.args.users):
+            users.append({
+                "_id": ObjectId(),
+                "username": f"bench_{i}",
+                "email": f"bench_{i}@bench.test",
+                "passwordHash": password_hash,
+                "avatar": f"https://example.test/avatar/{i}.jpg",
+                "bio": random_text(self.rng, 3, 12),
+                "joinDate": self.now - timedelta(days=self.rng.randint(0, 900)),
+                "followers": 0,
+                "following": 0,
+                "upvotesReceived": 0,
+                "isActive": True,
+            })
+        return users
+
+    def make_posts(self, users: list) -> list:
+        posts = []
+        span = self.args.days * 86400
+        for i in range(self.args.posts):
+            author = self.rng.choice(users)
+            posts.append({
+                "_id": ObjectId(),
+                "title": random_text(self.rng, 3, 10),
+                "mediaType": self.rng.choice(MEDIA_TYPES),
+                "mediaUrl": f"https://example.test/media/{i}.jpg",
+                "category": self.rng.choice(CATEGORIES),
+                "tags": self.rng.sample(WORDS, self.rng.randint(0, 4)),
+                "nsfw": self.rng.random() < 0.05,
+                "authorId": author["_id"],
+                "upvotes": 0,
+                "downvotes": 0,
+                "score": 0,
+                "commentCount": 0,
+                "views": 0,
+                "createdAt": self.now - timedelta(seconds=self.rng.randint(0, span)),
+            })
+        return posts
+
+    def make_votes(self, users: list, posts: list) -> list:
+        """Distribute the vote budget over posts following Zipf's law"""
+        # Popularity rank is independent of creation order
+        ranked = posts[:]
+        self.rng.shuffle(ranked)
+        weights = zipf_weights(len(ranked), self.args.zipf_s)
+        total_weight = sum(weights)
+        user_ids = [u["_id"] for u in users]
+
+        votes = []
+        for post, weight in zip(ranked, weights):
+            count = min(len(user_ids), int(round(self.args.votes * weight / total_weight)))
+            if count == 0:
+                continue
+            voters = self.rng.sample(user_ids, count)
+            for user_id in voters:
+                vote_type = "up" if self.rng.random() < self.args.upvote_ratio else "down"
+                votes.append({
+                    "_id": ObjectId(),
+                    "userId": user_id,
+                    "postId": post["_id"],
+                    "voteType": vote_type,
+                    "createdAt": post["createdAt"] + timedelta(seconds=self.rng.randint(1, 86400)),
+                })
+                if vote_type == "up":
+                    post["upvotes"] += 1
+                else:
+                    post["downvotes"] += 1
+                post["views"] += self.rng.randint(1, 5)
+            post["score"] = post["upvotes"] - post["downvotes"]
+        return votes
+
+    def make_comments(self, users: list, posts: list) -> list:
+        """Comments proportional to post popularity, with one level of replies"""
+        comments = []
+        user_ids = [u["_id"] for u in users]
+        by_score = sorted(posts, key=lambda p: p["upvotes"] + p["downvotes"], reverse=True)
+        weights = zipf_weights(len(by_score), self.args.zipf_s)
+        total_weight = sum(weights)
+        for post, weight in zip(by_score, weights):
+            count = int(round(self.args.comments * weight / total_weight))
+            top_level = []
+            for _ in range(count):
+                comment = {
+                    "_id": ObjectId(),
+                    "postId": post["_id"],
+                    "userId": self.rng.choice(user_ids),
+                    "text": random_text(self.rng, 2, 25),
+                    "parentId": None,
+                    "upvotes": 0,
+                    "downvotes": 0,
+                    "score": 0,
+                    "createdAt": post["createdAt"] + timedelta(seconds=self.rng.randint(1, 172800)),
+                }
+                if top_level and self.rng.random() < self.args.reply_ratio:
+                    comment["parentId"] = self.rng.choice(top_level)["_id"]
+                else:
+                    top_level.append(comment)
+                comments.append(comment)
+            post["commentCount"] = count
+        return comments
+
+
+async def insert_batched(collection, docs: list, batch_size: int):
+    for start in range(0, len(docs), batch_size):
+        await collection.insert_many(docs[start:start + batch_size], ordered=False)
+
+
+async def seed(args):
+    setup_backend_env(args.mongo_url, args.db_name)
+    from auth import hash_password
+    from database import db
+
+    generator = CorpusGenerator(args)
+    started = time.perf_counter()
+
+    if args.drop:
+        for name in ("users", "posts", "votes", "comments"):
+            await db[name].drop()
+
+    # bcrypt is deliberately slow, so every synthetic user shares one hash
+    users = generator.make_users(hash_password(BENCH_PASSWORD))
+    posts = generator.make_posts(users)
+    votes = generator.make_votes(users, posts)
+    comments = generator.make_comments(users, posts)
+
+    for name, docs in (("users", users), ("posts", posts), ("votes", votes), ("comments", comments)):
+        t0 = time.perf_counter()
+        await insert_batched(db[name], docs, args.batch_size)
+        print(f"  {name:<9} {len(docs):>9} docs in {time.perf_counter() - t0:.2f}s")
+
+    print(f"Seeded {db.name} in {time.perf_counter() - started:.2f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a synthetic benchmark corpus")
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--db-name", default=None)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--votes", type=int, default=200000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent for vote popularity")
+    parser.add_argument("--upvote-ratio", type=float, default=0.8)
+    parser.add_argument("--reply-ratio", type=float, default=0.4)
+    parser.add_argument("--days", type=int, default=60, help="Spread post creation over this many days")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-drop", dest="drop", action="store_false", help="Keep existing collections")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(seed(parse_args()))
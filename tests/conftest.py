@@ -0,0 +1,12 @@
+import os
+import sys
+from pathlib import Path
+
+# The backend modules import each other as top-level modules and read their
+# configuration at import time; Motor only connects on the first query
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "fleak_test")
+os.environ.setdefault("JWT_SECRET", "fleak-test-secret-of-at-least-32-bytes")
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
@@ -0,0 +1,246 @@
+import asyncio
+import json
+
+import pytest
+
+import admission
+from admission import AdmissionControlMiddleware, AIMDLimiter, Rejected, TokenBucketRegistry, client_key
+from auth import create_access_token
+
+
+def make_scope(method="GET", path="/api/posts", headers=(), client=("203.0.113.7", 5000)):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers), "client": client}
+
+
+def test_limit_starts_at_initial_value_within_bounds():
+    assert AIMDLimiter("read", 4, 256, 10, 1.0, initial_limit=64).limit == 64
+    assert AIMDLimiter("read", 4, 256, 10, 1.0).limit == 4
+    assert AIMDLimiter("read", 4, 32, 10, 1.0, initial_limit=64).limit == 32
+    assert AIMDLimiter("read", 4, 32, 10, 1.0, initial_limit=1).limit == 4
+
+
+def test_limit_grows_additively_when_it_is_the_constraint():
+    async def scenario():
+        limiter = AIMDLimiter("read", 2, 10, 10, 1.0, initial_limit=2, target_latency_ms=100)
+        await limiter.acquire()
+        await limiter.acquire()
+        limiter.release(10)
+        assert limiter.limit == pytest.approx(2.5)
+        # Not at the limit any more: no growth
+        limiter.release(10)
+        assert limiter.limit == pytest.approx(2.5)
+
+    asyncio.run(scenario())
+
+
+def test_limit_shrinks_multiplicatively_once_per_slow_burst():
+    async def scenario():
+        limiter = AIMDLimiter("read", 2, 100, 10, 1.0, initial_limit=20, target_latency_ms=100, backoff=0.5)
+        limiter.min_latency_ms = 10
+        for _ in range(3):
+            await limiter.acquire()
+        limiter.release(1000)
+        assert limiter.limit == pytest.approx(10)
+        # Within the same observed latency the limit is left alone
+        limiter.release(1000)
+        assert limiter.limit == pytest.approx(10)
+        limiter._last_decrease = 0.0
+        limiter.release(1000)
+        assert limiter.limit == pytest.approx(5)
+
+    asyncio.run(scenario())
+
+
+def test_limit_never_drops_below_min():
+    limiter = AIMDLimiter("write", 2, 10, 10, 1.0, initial_limit=2, target_latency_ms=1, backoff=0.1)
+    limiter.inflight = 1
+    limiter.release(500)
+    assert limiter.limit == 2
+
+
+def test_waiter_is_granted_a_released_slot():
+    async def scenario():
+        limiter = AIMDLimiter("read", 1, 1, 10, 1.0, initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert len(limiter.waiters) == 1
+        limiter.release()
+        await waiter
+        assert limiter.inflight == 1
+        assert limiter.admitted == 2
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_rejects_and_leaves_no_waiter():
+    async def scenario():
+        limiter = AIMDLimiter("read", 1, 1, 10, 0.01, initial_limit=1)
+        await limiter.acquire()
+        with pytest.raises(Rejected) as exc:
+            await limiter.acquire()
+        assert "budget" in exc.value.reason
+        assert not limiter.waiters
+        assert limiter.inflight == 1
+        assert limiter.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_immediately():
+    async def scenario():
+        limiter = AIMDLimiter("write", 1, 1, 1, 1.0, initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as exc:
+            await limiter.acquire()
+        assert "queue full" in exc.value.reason
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = AIMDLimiter("read", 1, 1, 10, 1.0, initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not limiter.waiters
+        limiter.release()
+        assert limiter.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_grant_returns_the_slot():
+    async def scenario():
+        limiter = AIMDLimiter("read", 1, 1, 10, 1.0, initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # The client goes away, and the slot is handed over before the waiter resumes
+        waiter.cancel()
+        limiter.release()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_throttles_after_burst():
+    buckets = TokenBucketRegistry(rate=1, burst=2, max_clients=10)
+    assert buckets.take("a") == 0
+    assert buckets.take("a") == 0
+    assert buckets.take("a") > 0
+    assert buckets.take("b") == 0
+    assert buckets.throttled == 1
+
+
+def test_token_bucket_map_is_bounded():
+    buckets = TokenBucketRegistry(rate=1, burst=1, max_clients=2)
+    for key in ("a", "b", "c"):
+        buckets.take(key)
+    assert list(buckets.buckets) == ["b", "c"]
+
+
+def test_client_key_uses_verified_subject():
+    token = create_access_token({"sub": "user-1"}).encode()
+    other_token = create_access_token({"sub": "user-1", "jti": "second"}).encode()
+    assert client_key(make_scope(headers=[(b"authorization", b"Bearer " + token)])) == "u:user-1"
+    assert client_key(make_scope(headers=[(b"authorization", b"Bearer " + other_token)])) == "u:user-1"
+
+
+def test_client_key_ignores_unverified_tokens():
+    scope = make_scope(headers=[(b"authorization", b"Bearer made-up")])
+    assert client_key(scope) == "ip:203.0.113.7"
+
+
+def test_forwarded_for_only_from_trusted_proxies(monkeypatch):
+    headers = [(b"x-forwarded-for", b"198.51.100.1, 192.0.2.10, 10.0.0.2")]
+    assert client_key(make_scope(headers=headers)) == "ip:203.0.113.7"
+
+    monkeypatch.setattr(admission, "TRUSTED_PROXIES", [admission.ipaddress.ip_network("10.0.0.0/8")])
+    # The nearest untrusted hop wins; anything left of it could be client-written
+    assert client_key(make_scope(headers=headers, client=("10.0.0.1", 80))) == "ip:192.0.2.10"
+    assert client_key(make_scope(headers=headers)) == "ip:203.0.113.7"
+
+
+class Recorder:
+    def __init__(self):
+        self.messages = []
+
+    async def __call__(self, message):
+        self.messages.append(message)
+
+    @property
+    def status(self):
+        return self.messages[0]["status"]
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def test_middleware_throttles_per_client_with_429():
+    async def scenario():
+        middleware = AdmissionControlMiddleware(ok_app)
+        middleware.buckets = TokenBucketRegistry(rate=0.001, burst=1, max_clients=10)
+        first, second = Recorder(), Recorder()
+        await middleware(make_scope(), receive, first)
+        await middleware(make_scope(), receive, second)
+        assert first.status == 200
+        assert second.status == 429
+        headers = dict(second.messages[0]["headers"])
+        assert int(headers[b"retry-after"]) >= 1
+        assert json.loads(second.messages[1]["body"])["detail"] == "Too many requests"
+
+    asyncio.run(scenario())
+
+
+def test_middleware_sheds_load_with_503():
+    async def scenario():
+        middleware = AdmissionControlMiddleware(ok_app)
+        limiter = middleware.limiters["read"]
+        limiter.limit = 1.0
+        limiter.queue_size = 0
+        limiter.inflight = 1
+        recorder = Recorder()
+        await middleware(make_scope(), receive, recorder)
+        assert recorder.status == 503
+
+    asyncio.run(scenario())
+
+
+def test_middleware_releases_slot_when_handler_fails():
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        middleware = AdmissionControlMiddleware(failing_app)
+        with pytest.raises(RuntimeError):
+            await middleware(make_scope(method="POST"), receive, Recorder())
+        assert middleware.limiters["write"].inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_exempt_paths_bypass_admission():
+    async def scenario():
+        middleware = AdmissionControlMiddleware(ok_app)
+        middleware.buckets = TokenBucketRegistry(rate=0.001, burst=0, max_clients=10)
+        for path in ("/api/", "/api/batch", "/api/live/posts/1"):
+            recorder = Recorder()
+            await middleware(make_scope(path=path), receive, recorder)
+            assert recorder.status == 200
+
+    asyncio.run(scenario())
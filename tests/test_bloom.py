@@ -0,0 +1,52 @@
+import pytest
+
+from bloom import BloomFilter
+
+
+def test_added_items_are_always_found():
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    items = [f"user{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    assert bloom.count == 1000
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = BloomFilter.for_capacity(2000, 0.01)
+    for i in range(2000):
+        bloom.add(f"in{i}")
+    false_positives = sum(f"out{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.03
+    assert bloom.false_positive_rate() == pytest.approx(0.01, rel=0.5)
+
+
+def test_empty_filter_contains_nothing():
+    bloom = BloomFilter.for_size(64, 100)
+    assert "anything" not in bloom
+    assert bloom.false_positive_rate() == 0
+
+
+def test_round_trips_through_bytes():
+    bloom = BloomFilter.for_size(128, 50)
+    for i in range(50):
+        bloom.add(str(i))
+    restored = BloomFilter.from_bytes(bloom.to_bytes())
+    assert (restored.num_bits, restored.num_hashes, restored.count) == (bloom.num_bits, bloom.num_hashes, 50)
+    assert restored.bits == bloom.bits
+    assert all(str(i) in restored for i in range(50))
+
+
+def test_union_holds_both_sets():
+    left, right = BloomFilter.for_size(128, 50), BloomFilter.for_size(128, 50)
+    left.add("a")
+    right.add("b")
+    right.add("c")
+    left.union(right)
+    assert all(item in left for item in "abc")
+    assert left.count == 2
+
+
+def test_union_rejects_other_shapes():
+    with pytest.raises(ValueError):
+        BloomFilter.for_size(128, 50).union(BloomFilter.for_size(64, 50))
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from conditional import http_date, is_not_modified, make_etag, not_modified, set_validators, to_millis
+
+UPDATED = datetime(2024, 5, 1, 12, 30, 15, 250000)
+
+
+def request_with(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_make_etag_is_weak_and_joins_parts():
+    assert make_etag("p", 123, 4) == 'W/"p-123-4"'
+
+
+def test_to_millis_treats_naive_datetimes_as_utc():
+    aware = UPDATED.replace(tzinfo=timezone.utc)
+    assert to_millis(UPDATED) == to_millis(aware) == int(aware.timestamp() * 1000)
+    assert to_millis(None) == 0
+
+
+def test_http_date_is_gmt_with_second_precision():
+    assert http_date(UPDATED) == "Wed, 01 May 2024 12:30:15 GMT"
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = make_etag("p", 1)
+    assert is_not_modified(request_with(if_none_match=etag), etag, None)
+    assert is_not_modified(request_with(if_none_match='"p-1"'), etag, None)
+    assert is_not_modified(request_with(if_none_match='W/"x", W/"p-1"'), etag, None)
+    assert not is_not_modified(request_with(if_none_match='W/"p-2"'), etag, None)
+
+
+def test_if_none_match_star_and_missing_etag():
+    assert is_not_modified(request_with(if_none_match="*"), make_etag("p", 1), None)
+    assert not is_not_modified(request_with(if_none_match="*"), None, UPDATED)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    request = request_with(if_none_match='W/"other"', if_modified_since=http_date(UPDATED))
+    assert not is_not_modified(request, make_etag("p", 1), UPDATED)
+
+
+def test_if_modified_since_compares_whole_seconds():
+    assert is_not_modified(request_with(if_modified_since=http_date(UPDATED)), None, UPDATED)
+    later = UPDATED + timedelta(seconds=1)
+    assert not is_not_modified(request_with(if_modified_since=http_date(UPDATED)), None, later)
+
+
+def test_unparseable_if_modified_since_is_ignored():
+    assert not is_not_modified(request_with(if_modified_since="yesterday"), None, UPDATED)
+
+
+def test_no_conditional_headers():
+    assert not is_not_modified(request_with(), make_etag("p", 1), UPDATED)
+
+
+def test_validators_on_responses():
+    response = Response()
+    set_validators(response, make_etag("p", 1), UPDATED)
+    assert response.headers["etag"] == 'W/"p-1"'
+    assert response.headers["last-modified"] == http_date(UPDATED)
+    assert response.headers["cache-control"] == "no-cache"
+
+    empty = not_modified(make_etag("p", 1), None)
+    assert empty.status_code == 304
+    assert empty.body == b""
+    assert "last-modified" not in empty.headers
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import deadlines
+from deadlines import DeadlineExceeded, DeadlineMiddleware, budget_for, max_time_ms, query_options, remaining_ms
+
+
+def make_scope(method="GET", path="/api/posts"):
+    return {"type": "http", "method": method, "path": path, "headers": []}
+
+
+async def send(message):
+    pass
+
+
+def test_longest_prefix_wins():
+    assert budget_for("/api/posts/123") == deadlines.ENDPOINT_BUDGETS_MS["/api/posts"]
+    assert budget_for("/api/admin/tasks") == deadlines.ENDPOINT_BUDGETS_MS["/api/admin"]
+    assert budget_for("/somewhere/else") == deadlines.DEFAULT_BUDGET_MS
+
+
+def test_no_budget_outside_requests():
+    assert remaining_ms() is None
+    assert max_time_ms() is None
+    assert query_options() == {}
+
+
+def test_budget_reaches_the_handler_and_is_reset():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["remaining"] = remaining_ms()
+        seen["options"] = query_options(reserve=0.5)
+
+    asyncio.run(DeadlineMiddleware(app)(make_scope(), asyncio.Queue().get, send))
+    budget = deadlines.ENDPOINT_BUDGETS_MS["/api/posts"]
+    assert 0 < seen["remaining"] <= budget
+    assert 0 < seen["options"]["maxTimeMS"] <= budget / 2
+    assert remaining_ms() is None
+
+
+def test_exhausted_budget_raises():
+    token = deadlines._deadline.set(deadlines.time.monotonic() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            max_time_ms()
+    finally:
+        deadlines._deadline.reset(token)
+
+
+def test_streams_get_no_budget():
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["remaining"] = remaining_ms()
+
+    asyncio.run(DeadlineMiddleware(app)(make_scope(path="/api/live/posts/1"), asyncio.Queue().get, send))
+    assert seen["remaining"] is None
+
+
+def test_read_handler_is_cancelled_on_disconnect():
+    state = {"cancelled": False}
+
+    async def app(scope, receive, send):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def scenario():
+        await asyncio.wait_for(DeadlineMiddleware(app)(make_scope(), receive, send), 1)
+
+    asyncio.run(scenario())
+    assert state["cancelled"]
+
+
+def test_read_handler_sees_the_request_body():
+    received = []
+
+    async def app(scope, receive, send):
+        received.append(await receive())
+
+    messages = [{"type": "http.request", "body": b"{}", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.sleep(10)
+
+    asyncio.run(DeadlineMiddleware(app)(make_scope(), receive, send))
+    assert received[0]["body"] == b"{}"
+
+
+def test_writes_run_to_completion_after_disconnect():
+    state = {"finished": False}
+
+    async def app(scope, receive, send):
+        assert (await receive())["type"] == "http.disconnect"
+        await asyncio.sleep(0.01)
+        state["finished"] = True
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    asyncio.run(DeadlineMiddleware(app)(make_scope(method="POST"), receive, send))
+    assert state["finished"]
+
+
+def test_handler_errors_propagate():
+    async def app(scope, receive, send):
+        raise DeadlineExceeded()
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(DeadlineMiddleware(app)(make_scope(), receive, send))
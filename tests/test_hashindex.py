@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from hashindex import MultiIndexHashTable
+
+
+def flip_bits(value: int, count: int, rng: random.Random) -> int:
+    for position in rng.sample(range(64), count):
+        value ^= 1 << position
+    return value
+
+
+def test_search_matches_a_linear_scan():
+    rng = random.Random(7)
+    index = MultiIndexHashTable(bits=64, chunks=4)
+    stored = {}
+    for i in range(2000):
+        value = rng.getrandbits(64)
+        stored[i] = value
+        index.add(i, value)
+    for i in range(50):
+        query = flip_bits(stored[i], rng.randint(0, 8), rng)
+        expected = sorted(
+            (item, (value ^ query).bit_count()) for item, value in stored.items() if (value ^ query).bit_count() <= 8
+        )
+        assert sorted(index.search(query, 8)) == expected
+
+
+def test_results_are_closest_first():
+    index = MultiIndexHashTable()
+    index.add("far", 0b111)
+    index.add("exact", 0)
+    index.add("near", 0b1)
+    assert index.search(0, 3) == [("exact", 0), ("near", 1), ("far", 3)]
+
+
+def test_items_sharing_a_hash_and_discard():
+    index = MultiIndexHashTable()
+    index.add("a", 42)
+    index.add("b", 42)
+    assert sorted(index.search(42, 0)) == [("a", 0), ("b", 0)]
+    index.discard("a")
+    assert index.search(42, 0) == [("b", 0)]
+    index.discard("b")
+    index.discard("missing")
+    assert index.search(42, 4) == []
+    assert len(index) == 0
+    assert all(not table for table in index.tables)
+
+
+def test_readding_an_item_moves_it():
+    index = MultiIndexHashTable()
+    index.add("a", 1)
+    index.add("a", 1 << 40)
+    assert index.search(1, 0) == []
+    assert index.search(1 << 40, 0) == [("a", 0)]
+    assert len(index) == 1
+
+
+def test_bits_must_split_evenly():
+    with pytest.raises(ValueError):
+        MultiIndexHashTable(bits=64, chunks=5)
@@ -0,0 +1,225 @@
+import asyncio
+import json
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import idempotency
+from auth import create_access_token
+from idempotency import IdempotencyMiddleware
+
+
+class FakeKeys:
+    """The subset of idempotency_keys the middleware uses, in memory"""
+
+    def __init__(self):
+        self.docs = {}
+        self.renewals = 0
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, condition in query.items():
+            if isinstance(condition, dict) and "$lt" in condition:
+                if not doc.get(field) < condition["$lt"]:
+                    return False
+            elif doc.get(field) != condition:
+                return False
+        return True
+
+    def _find(self, query):
+        doc = self.docs.get(query["_id"])
+        return doc if doc is not None and self._matches(doc, query) else None
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate key")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one(self, query):
+        return self._find(query)
+
+    async def find_one_and_update(self, query, update):
+        doc = self._find(query)
+        if doc is not None:
+            doc.update(update["$set"])
+        return doc
+
+    async def update_one(self, query, update):
+        doc = self._find(query)
+        if doc is not None:
+            if set(update["$set"]) == {"lockedUntil"}:
+                self.renewals += 1
+            doc.update(update["$set"])
+
+    async def delete_one(self, query):
+        if self._find(query) is not None:
+            del self.docs[query["_id"]]
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    fake = FakeKeys()
+    monkeypatch.setattr(idempotency, "idempotency_keys_collection", fake)
+    return fake
+
+
+class CountingApp:
+    def __init__(self, status=201, delay=0.0):
+        self.status = status
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        body = (await receive())["body"]
+        await asyncio.sleep(self.delay)
+        await send({"type": "http.response.start", "status": self.status, "headers": [
+            (b"content-type", b"application/json"), (b"x-internal", b"1"),
+        ]})
+        await send({"type": "http.response.body", "body": json.dumps({"call": self.calls, "echo": body.decode()}).encode()})
+
+
+def bearer(user_id, **claims):
+    return b"Bearer " + create_access_token({"sub": user_id, **claims}).encode()
+
+
+async def call(middleware, body=b"{}", key=b"key-1", authorization=None, path="/api/posts"):
+    headers = []
+    if key is not None:
+        headers.append((b"idempotency-key", key))
+    if authorization is not None:
+        headers.append((b"authorization", authorization))
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers, "client": ("192.0.2.1", 1)}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    headers = dict(messages[0]["headers"])
+    return messages[0]["status"], headers, json.loads(messages[1]["body"])
+
+
+def test_retry_replays_the_stored_response(keys):
+    async def scenario():
+        app = CountingApp()
+        middleware = IdempotencyMiddleware(app)
+        first = await call(middleware, authorization=bearer("u1"))
+        second = await call(middleware, authorization=bearer("u1"))
+        assert app.calls == 1
+        assert first[0] == second[0] == 201
+        assert first[2] == second[2]
+        assert second[1][b"idempotent-replayed"] == b"true"
+        # Only the stored headers are replayed
+        assert b"x-internal" not in second[1]
+
+    asyncio.run(scenario())
+
+
+def test_keys_are_scoped_to_the_user_not_the_token(keys):
+    async def scenario():
+        app = CountingApp()
+        middleware = IdempotencyMiddleware(app)
+        await call(middleware, authorization=bearer("u1"))
+        # A refreshed token for the same user still finds the record
+        await call(middleware, authorization=bearer("u1", jti="refreshed"))
+        assert app.calls == 1
+        await call(middleware, authorization=bearer("u2"))
+        assert app.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_requests_without_a_valid_token_are_not_deduplicated(keys):
+    async def scenario():
+        app = CountingApp()
+        middleware = IdempotencyMiddleware(app)
+        await call(middleware)
+        await call(middleware, authorization=b"Bearer forged")
+        assert app.calls == 2
+        assert not keys.docs
+
+    asyncio.run(scenario())
+
+
+def test_different_body_with_same_key_is_rejected(keys):
+    async def scenario():
+        middleware = IdempotencyMiddleware(CountingApp())
+        await call(middleware, body=b'{"a":1}', authorization=bearer("u1"))
+        status, _, body = await call(middleware, body=b'{"a":2}', authorization=bearer("u1"))
+        assert status == 422
+        assert "different request" in body["detail"]
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_duplicates_wait_for_the_first(keys):
+    async def scenario():
+        app = CountingApp(delay=0.05)
+        middleware = IdempotencyMiddleware(app)
+        results = await asyncio.gather(*(call(middleware, authorization=bearer("u1")) for _ in range(3)))
+        assert app.calls == 1
+        assert len({json.dumps(result[2]) for result in results}) == 1
+
+    asyncio.run(scenario())
+
+
+def test_server_errors_are_not_stored(keys):
+    async def scenario():
+        app = CountingApp(status=500)
+        middleware = IdempotencyMiddleware(app)
+        await call(middleware, authorization=bearer("u1"))
+        status, headers, _ = await call(middleware, authorization=bearer("u1"))
+        assert app.calls == 2
+        assert status == 500
+        assert b"idempotent-replayed" not in headers
+        assert not keys.docs
+
+    asyncio.run(scenario())
+
+
+def test_claim_is_renewed_while_the_handler_runs(keys, monkeypatch):
+    monkeypatch.setattr(idempotency, "RENEW_INTERVAL", 0.01)
+
+    async def scenario():
+        middleware = IdempotencyMiddleware(CountingApp(delay=0.1))
+        await call(middleware, authorization=bearer("u1"))
+        assert keys.renewals >= 3
+        (doc,) = keys.docs.values()
+        assert doc["status"] == "completed"
+
+    asyncio.run(scenario())
+
+
+def test_stale_claim_of_a_dead_worker_is_taken_over(keys):
+    async def scenario():
+        app = CountingApp()
+        middleware = IdempotencyMiddleware(app)
+        await call(middleware, authorization=bearer("u1"))
+        (record_id, doc), = keys.docs.items()
+        doc.update(status="in_progress", owner="dead-worker", lockedUntil=doc["createdAt"])
+        middleware.cache.clear()
+        status, _, _ = await call(middleware, authorization=bearer("u1"))
+        assert status == 201
+        assert app.calls == 2
+        assert keys.docs[record_id]["status"] == "completed"
+        assert keys.docs[record_id]["owner"] != "dead-worker"
+
+    asyncio.run(scenario())
+
+
+def test_invalid_keys_and_other_routes(keys):
+    async def scenario():
+        app = CountingApp()
+        middleware = IdempotencyMiddleware(app)
+        status, _, _ = await call(middleware, key=b"x" * 256, authorization=bearer("u1"))
+        assert status == 400
+        await call(middleware, path="/api/users/me", authorization=bearer("u1"))
+        await call(middleware, path="/api/users/me", authorization=bearer("u1"))
+        assert app.calls == 2
+
+    asyncio.run(scenario())
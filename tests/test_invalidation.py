@@ -0,0 +1,207 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import invalidation
+from database import PROFILE_FIELDS
+from invalidation import PIPELINES, CacheInvalidator
+from seen import SeenFilter, SeenPostsStore
+
+
+def matched_fields(pipeline):
+    """updatedFields names an updated_fields() $match lets through"""
+    prefix = "updateDescription.updatedFields."
+    return {
+        name[len(prefix):]
+        for clause in pipeline[0]["$match"]["$or"] for name in clause if name.startswith(prefix)
+    }
+
+
+def test_users_stream_only_carries_profile_edits():
+    assert matched_fields(PIPELINES["users"]) == PROFILE_FIELDS
+    assert "karma" not in matched_fields(PIPELINES["users"])
+
+
+def test_posts_stream_skips_view_counters():
+    fields = matched_fields(PIPELINES["posts"])
+    assert "deleted" in fields and "score" in fields
+    assert "views" not in fields
+
+
+class FakeChanges:
+    """A change stream yielding the given events, then closing; without events it idles"""
+
+    def __init__(self, events, resume_token=None):
+        self.events = events
+        self.resume_token = resume_token
+
+    @property
+    def alive(self):
+        return self.events is None or bool(self.events)
+
+    async def try_next(self):
+        if self.events is None:
+            await asyncio.Event().wait()
+        event = self.events.pop(0)
+        self.resume_token = {"_data": f"token-{len(self.events)}"}
+        return event
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeCollection:
+    """Hands out the given streams (event lists or errors) in turn, then an idle one"""
+
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.resumed_from = []
+        self.idle = asyncio.Event()
+
+    def watch(self, pipeline, resume_after=None, max_await_time_ms=None):
+        self.resumed_from.append(resume_after)
+        if not self.streams:
+            self.idle.set()
+            return FakeChanges(None, resume_after)
+        stream = self.streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        return FakeChanges(list(stream))
+
+
+class FakeTokens:
+    def __init__(self, stored=None):
+        self.stored = stored
+        self.saved = []
+
+    async def find_one(self, query):
+        return {"_id": query["_id"], "token": self.stored} if self.stored else None
+
+    async def update_one(self, query, update, upsert=False):
+        self.saved.append(update["$set"]["token"])
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = SeenPostsStore(collection=None, interval=3600)
+    monkeypatch.setattr(invalidation, "seen_posts", store)
+    return store
+
+
+def test_profile_edit_evicts_the_author(monkeypatch):
+    forgotten = []
+    monkeypatch.setattr(invalidation.db_manager, "forget_author", forgotten.append)
+    user_id = ObjectId()
+    change = {"operationType": "update", "documentKey": {"_id": user_id}, "updateDescription": {"updatedFields": {}}}
+    asyncio.run(CacheInvalidator(enabled=False)._users_changed(change))
+    assert forgotten == [user_id]
+
+
+def test_seen_filter_stored_elsewhere_is_merged(store):
+    async def scenario():
+        user_id = str(ObjectId())
+        local, remote = SeenFilter.empty(), SeenFilter.empty()
+        local.add("p1")
+        remote.add("p2")
+        store.filters[user_id] = local
+        local.dirty = False
+        change = {
+            "operationType": "update",
+            "documentKey": {"_id": ObjectId(user_id)},
+            "updateDescription": {"updatedFields": remote.to_doc()},
+        }
+        await CacheInvalidator(enabled=False)._seen_posts_changed(change)
+        assert "p1" in local and "p2" in local
+        # The union holds p1, which the stored copy lacks, so it is written back
+        assert local.dirty
+        store._task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_own_seen_writes_change_nothing(store):
+    async def scenario():
+        user_id = str(ObjectId())
+        seen = SeenFilter.empty()
+        seen.add("p1")
+        seen.dirty = False
+        store.filters[user_id] = seen
+        change = {"operationType": "insert", "documentKey": {"_id": ObjectId(user_id)}, "fullDocument": seen.to_doc()}
+        await CacheInvalidator(enabled=False)._seen_posts_changed(change)
+        assert not seen.dirty
+        assert store._task is None
+
+    asyncio.run(scenario())
+
+
+def test_seen_filters_of_uncached_users_are_ignored(store):
+    change = {"operationType": "insert", "documentKey": {"_id": ObjectId()}, "fullDocument": SeenFilter.empty().to_doc()}
+    asyncio.run(CacheInvalidator(enabled=False)._seen_posts_changed(change))
+    assert not store.filters
+
+
+def run_stream(monkeypatch, stream, collection, tokens, handler):
+    """Run one stream's loop until the fake collection has handed out all its streams"""
+    monkeypatch.setattr(invalidation, "COLLECTIONS", {stream: collection})
+    monkeypatch.setattr(invalidation, "change_stream_tokens_collection", tokens)
+    monkeypatch.setattr(invalidation, "RETRY_DELAY", 0)
+    invalidator = CacheInvalidator(enabled=False, save_interval=0)
+    monkeypatch.setattr(invalidator, f"_{stream}_changed", handler)
+    resets = []
+
+    async def reset(name):
+        resets.append(name)
+
+    monkeypatch.setattr(invalidator, "_reset", reset)
+
+    async def scenario():
+        task = asyncio.create_task(invalidator._run(stream))
+        await asyncio.wait_for(collection.idle.wait(), 1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    return invalidator, resets
+
+
+def test_stream_resumes_from_stored_token_and_saves_progress(monkeypatch):
+    handled = []
+
+    async def handler(change):
+        handled.append(change["documentKey"]["_id"])
+
+    events = [{"operationType": "insert", "documentKey": {"_id": i}} for i in range(3)]
+    collection = FakeCollection(events)
+    tokens = FakeTokens(stored={"_data": "stored"})
+    invalidator, resets = run_stream(monkeypatch, "comments", collection, tokens, handler)
+    # The next stream picks up where this worker got to
+    assert collection.resumed_from == [{"_data": "stored"}, {"_data": "token-0"}]
+    assert handled == [0, 1, 2]
+    assert tokens.saved[-1] == {"_data": "token-0"}
+    assert not resets
+
+
+def test_lost_position_starts_over_and_resets(monkeypatch):
+    async def handler(change):
+        pass
+
+    history_lost = OperationFailure("history lost", code=286)
+    collection = FakeCollection(history_lost)
+    invalidator, resets = run_stream(monkeypatch, "users", collection, FakeTokens(stored={"_data": "old"}), handler)
+    assert collection.resumed_from == [{"_data": "old"}, None]
+    assert resets == ["users"]
+
+
+def test_invalidate_event_resets(monkeypatch):
+    async def handler(change):
+        raise AssertionError("invalidate events are not handled as changes")
+
+    collection = FakeCollection([{"operationType": "invalidate", "documentKey": {}}])
+    invalidator, resets = run_stream(monkeypatch, "posts", collection, FakeTokens(), handler)
+    assert resets == ["posts"]
+    assert collection.resumed_from == [None, None]
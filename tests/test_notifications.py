@@ -0,0 +1,92 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from notifications import DUPLICATE_KEY, NotificationQueue, parse_mentions
+
+
+class FakeNotifications:
+    """insert_many that fails the given indexes with the given codes, once"""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.docs = {}
+
+    async def insert_many(self, docs, ordered=True):
+        failures, self.failures = self.failures, {}
+        errors = []
+        for i, doc in enumerate(docs):
+            if i in failures:
+                errors.append({"index": i, "code": failures[i], "errmsg": "failed"})
+            else:
+                self.docs[doc["_id"]] = doc
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+
+class FakeUsers:
+    def __init__(self):
+        self.unread = {}
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            user_id = request._filter["_id"]
+            self.unread[user_id] = self.unread.get(user_id, 0) + request._doc["$inc"]["unreadNotifications"]
+
+
+def make_docs(*user_ids):
+    return [{"_id": ObjectId(), "userId": user_id, "read": False} for user_id in user_ids]
+
+
+def test_parse_mentions():
+    assert parse_mentions("hi @ana and @bob, @ana again, mail me at x@example.com") == ["ana", "bob"]
+
+
+def test_flush_counts_what_was_stored():
+    async def scenario():
+        notifications, users = FakeNotifications(), FakeUsers()
+        queue = NotificationQueue(notifications, users, None)
+        a, b = ObjectId(), ObjectId()
+        await queue.add(make_docs(a, a, b))
+        assert len(notifications.docs) == 3
+        assert users.unread == {a: 2, b: 1}
+
+    asyncio.run(scenario())
+
+
+def test_partial_failure_counts_only_inserted_docs():
+    async def scenario():
+        # Index 1: a transient error; 2: already stored; 3: can never be stored
+        notifications = FakeNotifications({1: 189, 2: DUPLICATE_KEY, 3: 121})
+        users = FakeUsers()
+        queue = NotificationQueue(notifications, users, None, interval=3600)
+        a = ObjectId()
+        docs = make_docs(a, a, a, a)
+        queue.pending = list(docs)
+        assert await queue.flush() == 1
+        assert users.unread == {a: 1}
+        # Only the transient failure is tried again
+        assert queue.pending == [docs[1]]
+        queue._task.cancel()
+        assert await queue.flush() == 1
+        assert users.unread == {a: 2}
+        assert not queue.pending
+
+    asyncio.run(scenario())
+
+
+def test_failed_count_does_not_lose_later_batches(monkeypatch):
+    async def scenario():
+        class BrokenUsers:
+            async def bulk_write(self, requests, ordered=True):
+                raise ConnectionError("lost")
+
+        monkeypatch.setattr("notifications.INSERT_BATCH_SIZE", 2)
+        notifications = FakeNotifications()
+        queue = NotificationQueue(notifications, BrokenUsers(), None)
+        await queue.add(make_docs(*(ObjectId() for _ in range(5))))
+        assert len(notifications.docs) == 5
+        assert not queue.pending
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+from phash import HASH_BITS, dhash, format_hash, parse_hash
+
+
+def make_image(size=(320, 240), fmt="PNG", quality=None) -> bytes:
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.rectangle([width // 8, height // 6, width // 2, height // 2], fill="black")
+    draw.ellipse([width // 2, height // 3, width - width // 10, height - height // 8], fill=(200, 40, 40))
+    draw.line([0, height - 1, width - 1, 0], fill="blue", width=max(1, width // 40))
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **({"quality": quality} if quality else {}))
+    return buffer.getvalue()
+
+
+def test_dhash_survives_rescaling_and_recompression():
+    original = dhash(make_image())
+    assert (original ^ dhash(make_image((640, 480)))).bit_count() <= 6
+    assert (original ^ dhash(make_image(fmt="JPEG", quality=40))).bit_count() <= 6
+
+
+def test_dhash_separates_different_images():
+    other = Image.new("RGB", (320, 240), "black")
+    ImageDraw.Draw(other).rectangle([200, 20, 300, 200], fill="white")
+    buffer = io.BytesIO()
+    other.save(buffer, "PNG")
+    assert (dhash(make_image()) ^ dhash(buffer.getvalue())).bit_count() > 10
+
+
+def test_hash_text_round_trip():
+    for value in (0, 1, 2 ** 63, 2 ** 64 - 1):
+        text = format_hash(value)
+        assert len(text) == HASH_BITS // 4
+        assert parse_hash(text) == value
+
+
+@pytest.mark.parametrize("text", [None, "", "abc", "zz" * 8, "0" * 17])
+def test_parse_hash_rejects_malformed_text(text):
+    assert parse_hash(text) is None
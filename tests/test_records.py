@@ -0,0 +1,89 @@
+import json
+import math
+from datetime import datetime
+
+import pytest
+from bson import Int64, ObjectId
+
+from models import CommentResponse, PostResponse
+from records import CommentRecord, PostRecord, RecordResponse, UserRecord, dumps
+
+CREATED = datetime(2024, 5, 1, 12, 30, 15, 250000)
+
+
+def make_author():
+    return UserRecord.from_doc({
+        "_id": ObjectId(), "username": "ana", "avatar": None, "karma": Int64(12), "joinDate": CREATED,
+    })
+
+
+def make_post(**overrides):
+    doc = {
+        "_id": ObjectId(), "title": 'Quotes " and \\ and ünïcode ✓', "mediaType": "image",
+        "mediaUrl": "https://example.com/a.png", "category": "funny", "tags": ["cats"], "upvotes": 3,
+        "downvotes": 1, "score": 2, "commentCount": 0, "views": 10, "nsfw": False, "createdAt": CREATED,
+        "repostOf": ObjectId(),
+        **overrides,
+    }
+    return PostRecord.from_doc(doc, make_author())
+
+
+@pytest.mark.parametrize("value", [
+    None, True, False, 0, -7, 2 ** 70, 1.5, -0.25, 1e300, "", "tab\tnewline\n ", "ünï ✓",
+    [1, "a", None, [True]], (1, 2), {"nested": {"list": [1.0, {"k": "v"}]}},
+])
+def test_plain_values_match_json_dumps(value):
+    assert json.loads(dumps(value)) == json.loads(json.dumps(value))
+
+
+def test_int_subclasses_and_datetimes():
+    assert dumps(Int64(5)) == b"5"
+    assert dumps(CREATED) == b'"2024-05-01T12:30:15.250000"'
+    assert dumps(ObjectId("0123456789abcdef01234567")) == b'"0123456789abcdef01234567"'
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf])
+def test_non_finite_floats_are_refused(value):
+    with pytest.raises(ValueError):
+        dumps({"rate": value})
+
+
+def test_post_record_matches_the_response_model():
+    post = make_post()
+    encoded = json.loads(dumps(post))
+    expected = PostResponse.model_validate({name: getattr(post, name) for name in PostRecord.__slots__} | {
+        "author": {name: getattr(post.author, name) for name in UserRecord.__slots__},
+    }).model_dump(mode="json")
+    assert encoded == expected
+    assert list(encoded) == list(PostRecord.__slots__)
+
+
+def test_comment_record_nests_replies():
+    author = make_author()
+    doc = {"_id": ObjectId(), "postId": ObjectId(), "text": "hi", "createdAt": CREATED}
+    comment = CommentRecord.from_doc(doc, author)
+    reply = CommentRecord.from_doc({**doc, "_id": ObjectId(), "parentId": doc["_id"]}, author)
+    comment.replies.append(reply)
+    encoded = json.loads(dumps(comment))
+    CommentResponse.model_validate(encoded)
+    assert encoded["parentId"] is None
+    assert encoded["replies"][0]["parentId"] == str(doc["_id"])
+    assert encoded["user"]["email"] is None
+
+
+def test_records_read_like_documents():
+    post = make_post()
+    assert post["title"] == post.title
+    assert post.get("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        post["missing"]
+    assert dict(post.items())["category"] == "funny"
+
+
+def test_record_response_renders_pages():
+    page = RecordResponse({"posts": [make_post()], "hasMore": False, "total": None})
+    assert page.media_type == "application/json"
+    body = json.loads(page.body)
+    assert body["hasMore"] is False
+    assert body["total"] is None
+    assert body["posts"][0]["author"]["username"] == "ana"
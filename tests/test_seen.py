@@ -0,0 +1,79 @@
+import asyncio
+
+from bson import ObjectId
+
+from seen import SeenFilter, SeenPostsStore, generation_capacity
+
+
+class FakeSeenCollection:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            update = request._doc["$set"]
+            self.docs.setdefault(request._filter["_id"], {}).update(update)
+
+
+def test_full_generation_rotates():
+    seen = SeenFilter.empty(num_bytes=64, error_rate=0.01)
+    assert seen.capacity == generation_capacity(32, 0.01)
+    posts = [f"p{i}" for i in range(seen.capacity + 1)]
+    for post_id in posts:
+        seen.add(post_id)
+    assert seen.previous is not None
+    assert seen.current.count == 1
+    assert posts[0] in seen and posts[-1] in seen
+
+
+def test_merge_reports_whether_a_write_back_is_needed():
+    local, remote = SeenFilter.empty(), SeenFilter.empty()
+    remote.add("a")
+    # Taking in the other copy's posts alone needs no write-back
+    assert not local.merge(SeenFilter.from_doc(remote.to_doc()))
+    assert "a" in local
+    # Now both hold the same posts
+    assert not local.merge(SeenFilter.from_doc(remote.to_doc()))
+    local.add("b")
+    assert local.merge(SeenFilter.from_doc(remote.to_doc()))
+
+
+def test_merge_takes_over_the_previous_generation():
+    local = SeenFilter.empty(num_bytes=64)
+    remote = SeenFilter.empty(num_bytes=64)
+    for i in range(remote.capacity + 1):
+        remote.add(f"p{i}")
+    local.merge(remote)
+    # A copy, so later adds on one side do not leak into the other
+    assert local.previous is not None and local.previous is not remote.previous
+    assert "p0" in local
+
+
+def test_filters_with_another_budget_start_over():
+    small = SeenFilter.empty(num_bytes=64)
+    small.add("a")
+    restored = SeenFilter.from_doc(small.to_doc())
+    assert "a" not in restored
+
+
+def test_store_flushes_dirty_filters_and_reloads_them():
+    async def scenario():
+        collection = FakeSeenCollection()
+        store = SeenPostsStore(collection, interval=3600)
+        user_id = str(ObjectId())
+        await store.mark_seen(user_id, ["p1", "p2"])
+        assert await store.flush() == 1
+        assert await store.flush() == 0
+        store._task.cancel()
+
+        fresh = SeenPostsStore(collection, interval=3600)
+        seen = await fresh.get(user_id)
+        assert "p1" in seen and "p2" in seen
+
+        fresh.forget_clean()
+        assert not fresh.filters
+
+    asyncio.run(scenario())
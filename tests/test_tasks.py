@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+
+import tasks
+from tasks import TaskRunner
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(tasks, "TASK_RETRY_BACKOFF", 0.001)
+    monkeypatch.setattr(tasks, "TASK_ENQUEUE_TIMEOUT", 0.01)
+
+
+class Flaky:
+    """Fails the first `failures` calls, then records its arguments"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+        self.done = []
+
+    async def __call__(self, value):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("transient")
+        self.done.append(value)
+
+
+def test_failed_tasks_are_retried_with_backoff(monkeypatch):
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(tasks.asyncio, "sleep", sleep)
+
+    async def scenario():
+        runner = TaskRunner(workers=1)
+        func = Flaky(failures=2)
+        await runner.enqueue("flaky", func, 1)
+        assert func.done == [1]
+        assert sleeps == [0.001, 0.002]
+        assert runner.metrics["flaky"]["retried"] == 2
+        assert runner.metrics["flaky"]["completed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_retries_give_up_after_the_limit(monkeypatch):
+    monkeypatch.setattr(tasks, "TASK_MAX_RETRIES", 2)
+
+    async def scenario():
+        runner = TaskRunner(workers=1)
+        func = Flaky(failures=10)
+        await runner.enqueue("flaky", func, 1)
+        assert func.calls == 3
+        assert runner.metrics["flaky"]["failed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_retry_false_runs_once():
+    async def scenario():
+        runner = TaskRunner(workers=1)
+        func = Flaky(failures=1)
+        await runner.enqueue("inc", func, 1, retry=False)
+        assert func.calls == 1
+        assert func.done == []
+        assert runner.metrics["inc"]["failed"] == 1
+        assert runner.metrics["inc"]["retried"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_queued_tasks_with_the_same_key_coalesce():
+    async def scenario():
+        runner = TaskRunner(workers=1)
+        runner.start()
+        gate = asyncio.Event()
+        func = Flaky()
+
+        async def blocked():
+            await gate.wait()
+
+        # Keep the only worker busy so the keyed tasks stay queued
+        await runner.enqueue("block", blocked)
+        await asyncio.sleep(0)
+        for value in range(3):
+            await runner.enqueue("recount", func, value, key="post:1")
+        await runner.enqueue("recount", func, "other", key="post:2")
+        gate.set()
+        await runner.stop()
+        assert func.done == [0, "other"]
+        assert runner.metrics["recount"]["coalesced"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_key_is_free_again_once_the_task_starts():
+    async def scenario():
+        runner = TaskRunner(workers=1)
+        runner.start()
+        func = Flaky()
+        await runner.enqueue("recount", func, 0, key="post:1")
+        await asyncio.sleep(0.01)
+        await runner.enqueue("recount", func, 1, key="post:1")
+        await runner.stop()
+        assert func.done == [0, 1]
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_runs_the_task_in_the_caller():
+    async def scenario():
+        runner = TaskRunner(workers=1, queue_size=1)
+        runner.start()
+        gate = asyncio.Event()
+        func = Flaky()
+
+        async def blocked():
+            await gate.wait()
+
+        await runner.enqueue("block", blocked)
+        await asyncio.sleep(0)
+        # Fills the queue, then finds no room and runs inline
+        await runner.enqueue("work", func, "queued")
+        await runner.enqueue("work", func, "inline")
+        assert func.done == ["inline"]
+        assert runner.metrics["work"]["inline"] == 1
+        gate.set()
+        await runner.stop()
+        assert func.done == ["inline", "queued"]
+
+    asyncio.run(scenario())
+
+
+def test_stop_drains_the_queue():
+    async def scenario():
+        runner = TaskRunner(workers=2)
+        runner.start()
+        func = Flaky()
+
+        async def slow(value):
+            await asyncio.sleep(0.01)
+            await func(value)
+
+        for value in range(10):
+            await runner.enqueue("slow", slow, value)
+        await runner.stop()
+        assert sorted(func.done) == list(range(10))
+        assert not runner.running
+        assert runner.snapshot()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stop_gives_up_after_the_timeout():
+    async def scenario():
+        runner = TaskRunner(workers=1)
+        runner.start()
+        started = asyncio.Event()
+
+        async def stuck():
+            started.set()
+            await asyncio.Event().wait()
+
+        await runner.enqueue("stuck", stuck)
+        await started.wait()
+        await runner.stop(timeout=0.01)
+        assert not runner.running
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import random
+from collections import Counter
+
+from topk import SpaceSaving
+
+
+def test_exact_while_under_capacity():
+    sketch = SpaceSaving(capacity=10)
+    for tag, weight in [("a", 1), ("b", 2), ("a", 3)]:
+        sketch.add(tag, weight)
+    assert sketch.top(5) == [("a", 4, 0), ("b", 2, 0)]
+    assert sketch.total == 6
+
+
+def test_heavy_hitters_are_kept_with_bounded_error():
+    rng = random.Random(3)
+    stream = ["hot"] * 500 + ["warm"] * 200 + [f"tail{rng.randrange(5000)}" for _ in range(2000)]
+    rng.shuffle(stream)
+    sketch = SpaceSaving(capacity=50)
+    for item in stream:
+        sketch.add(item)
+    truth = Counter(stream)
+    top = {item: (count, error) for item, count, error in sketch.top(2)}
+    assert set(top) == {"hot", "warm"}
+    for item, (count, error) in top.items():
+        # Counts overestimate by at most their error, itself at most total / capacity
+        assert count - error <= truth[item] <= count
+        assert error <= len(stream) / 50
+    assert len(sketch) == 50
+
+
+def test_eviction_replaces_the_smallest_count():
+    sketch = SpaceSaving(capacity=2)
+    sketch.add("a", 5)
+    sketch.add("b", 1)
+    sketch.add("c", 1)
+    assert sketch.top(2) == [("a", 5, 0), ("c", 2, 1)]
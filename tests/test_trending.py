@@ -0,0 +1,49 @@
+import pytest
+
+import trending
+from trending import TrendingTags
+
+
+class Clock:
+    def __init__(self):
+        self.now = 5000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(trending.time, "monotonic", clock)
+    return clock
+
+
+def test_posts_weigh_more_than_votes(clock):
+    tags = TrendingTags(window=60, capacity=10)
+    tags.record(["cats"])
+    tags.record(["cats"])
+    tags.record_post(["dogs"])
+    tags.record(["ignored"], weight=0)
+    assert [entry["tag"] for entry in tags.top(5)] == ["dogs", "cats"]
+    assert tags.top(1) == [{"tag": "dogs", "score": trending.TRENDING_POST_WEIGHT}]
+
+
+def test_previous_window_fades_out(clock):
+    tags = TrendingTags(window=100, capacity=10)
+    tags.record(["old"], weight=10)
+    clock.now += 100
+    tags.record(["new"], weight=1)
+    assert tags.top(2) == [{"tag": "old", "score": 10}, {"tag": "new", "score": 1}]
+    clock.now += 50
+    assert tags.top(2) == [{"tag": "old", "score": 5}, {"tag": "new", "score": 1}]
+    clock.now += 50
+    # The next rotation drops the old window altogether
+    assert tags.top(2) == [{"tag": "new", "score": 1}]
+
+
+def test_idle_windows_forget_everything(clock):
+    tags = TrendingTags(window=100, capacity=10)
+    tags.record(["old"], weight=10)
+    clock.now += 250
+    assert tags.top(5) == []
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from user_stats import UserStatsBuffer
+
+
+class FakeUsers:
+    """bulk_write applying $incs, failing the given indexes (or everything) once"""
+
+    def __init__(self, failed_indexes=(), error=None):
+        self.failed_indexes = set(failed_indexes)
+        self.error = error
+        self.stats = {}
+
+    async def bulk_write(self, requests, ordered=True):
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
+        failed, self.failed_indexes = self.failed_indexes, set()
+        for i, request in enumerate(requests):
+            if i in failed:
+                continue
+            stats = self.stats.setdefault(request._filter["_id"], {})
+            for field, value in request._doc["$inc"].items():
+                stats[field] = stats.get(field, 0) + value
+        if failed:
+            raise BulkWriteError({"writeErrors": [{"index": i, "code": 112, "errmsg": "conflict"} for i in sorted(failed)]})
+
+
+def buffered(users):
+    buffer = UserStatsBuffer(users, interval=3600)
+    a, b, c = ObjectId(), ObjectId(), ObjectId()
+    return buffer, a, b, c
+
+
+def test_deltas_are_summed_per_user():
+    async def scenario():
+        users = FakeUsers()
+        buffer, a, b, _ = buffered(users)
+        await buffer.add(a, karma=1, postCount=1)
+        await buffer.add(a, karma=2)
+        await buffer.add(b, karma=0)
+        buffer._task.cancel()
+        assert await buffer.flush() == 1
+        assert users.stats == {a: {"karma": 3, "postCount": 1}}
+
+    asyncio.run(scenario())
+
+
+def test_partial_bulk_write_error_requeues_only_the_failed_updates():
+    async def scenario():
+        users = FakeUsers(failed_indexes={1})
+        buffer, a, b, c = buffered(users)
+        for user_id in (a, b, c):
+            await buffer.add(user_id, karma=1)
+        buffer._task.cancel()
+        with pytest.raises(BulkWriteError):
+            await buffer.flush()
+        assert buffer.pending == {b: {"karma": 1}}
+        assert await buffer.flush() == 1
+        # Every delta applied exactly once
+        assert users.stats == {a: {"karma": 1}, b: {"karma": 1}, c: {"karma": 1}}
+
+    asyncio.run(scenario())
+
+
+def test_deltas_added_during_a_failed_flush_are_merged():
+    async def scenario():
+        users = FakeUsers(failed_indexes={0})
+        buffer, a, _, _ = buffered(users)
+        await buffer.add(a, karma=1)
+        buffer._task.cancel()
+        with pytest.raises(BulkWriteError):
+            await buffer.flush()
+        await buffer.add(a, karma=2)
+        buffer._task.cancel()
+        assert buffer.pending == {a: {"karma": 3}}
+
+    asyncio.run(scenario())
+
+
+def test_ambiguous_errors_drop_the_deltas():
+    async def scenario():
+        users = FakeUsers(error=ConnectionError("lost"))
+        buffer, a, _, _ = buffered(users)
+        await buffer.add(a, karma=1)
+        buffer._task.cancel()
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        # The batch may have been applied; the reconciler repairs it if not
+        assert not buffer.pending
+
+    asyncio.run(scenario())